@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Columnar export of ``runs`` and ``snapshots`` for season queries.
+
+New rows (by id) are materialized into Parquet files partitioned by kind and
+NFL week::
+
+    out/analytics/runs/kind=head_coach/week=3/part-<first id>-<last id>.parquet
+
+Each file has typed base columns (``id``, ``ts``, ``week``, ``kind``), the
+fields ``EXTRACT`` pulls out for that kind and the raw payload as a JSON
+string.  Some kinds explode into one row per item (a row per team for
+``season``, per claim for ``waiver``).  Dashboards use ``load``/``trend``,
+which prune partitions by path and read only the requested columns,
+memory-mapped.
+
+    python analytics_export.py            # export new rows
+    python analytics_export.py --rebuild  # re-export everything
+"""
+
+import os, re, json, shutil, argparse, logging
+from datetime import timezone
+
+import numpy as np
+import pandas as pd
+
+import metrics, retention, utils_core
+
+EXPORT_DIR = os.path.join("out", "analytics")
+STATE_FILE = os.path.join(EXPORT_DIR, "_state.json")
+TABLES = ("runs", "snapshots")
+FETCH_ROWS = 1000
+MAX_PARTS = 8  # files per partition before they are merged into one
+PART = re.compile(r"^part-(\d+)-(\d+)\.parquet$")
+
+log = logging.getLogger(__name__)
+
+
+# ------------------ extraction ------------------
+def _head_coach(p):
+    logic = p.get("logic") or {}
+    return [{k: logic.get(k) for k in ("win_prob", "floor", "ceiling")}]
+
+
+def _waiver(p):
+    recs = [r for r in p.get("waiver_recs") or [] if r.get("add")]
+    base = {"mode": p.get("mode"), "lineup_points": p.get("lineup_points")}
+    return [
+        {
+            **base,
+            **{k: r.get(k) for k in ("priority", "player", "position", "add", "drop")},
+            **{k: r.get(k) for k in ("bid", "gain", "win_prob")},
+        }
+        for r in recs
+    ] or [base]
+
+
+def _season(p):
+    teams = p.get("teams") or []
+    return [{k: t.get(k) for k in FIELDS["season"]} for t in teams] or [{}]
+
+
+def _decree(p):
+    hc = ((p.get("bundle") or {}).get("head_coach") or {}).get("logic") or {}
+    return [{"win_prob": hc.get("win_prob")}]
+
+
+def _learning(p):
+    return [{"win_rate": p.get("win_rate"), "history_len": p.get("history_len")}]
+
+
+def _snapshot(p):
+    return [{"errors": ",".join(sorted(k for k in p if k.endswith("_error")))}]
+
+
+EXTRACT = {
+    "head_coach": _head_coach,
+    "waiver": _waiver,
+    "season": _season,
+    "decree": _decree,
+    "learning": _learning,
+    "snapshot": _snapshot,
+}
+# Column dtypes per kind, so every part of a partition has the same schema.
+FIELDS = {
+    "head_coach": {"win_prob": "float64", "floor": "float64", "ceiling": "float64"},
+    "waiver": {
+        "mode": "string",
+        "lineup_points": "float64",
+        "priority": "Int16",
+        "player": "string",
+        "position": "string",
+        "add": "string",
+        "drop": "string",
+        "bid": "float64",
+        "gain": "float64",
+        "win_prob": "float64",
+    },
+    "season": {
+        "team": "string",
+        "mean_wins": "float64",
+        "mean_points_for": "float64",
+        "playoff_odds": "float64",
+        "bye_odds": "float64",
+        "title_odds": "float64",
+    },
+    "decree": {"win_prob": "float64"},
+    "learning": {"win_rate": "float64", "history_len": "Int32"},
+    "snapshot": {"errors": "string"},
+}
+
+
+def frame(kind, rows):
+    """Typed DataFrame for ``[(id, ts, week, payload)]`` rows of one kind."""
+    extract = EXTRACT.get(kind)
+    records = []
+    for rid, ts, week, payload in rows:
+        base = {
+            "id": rid,
+            "ts": ts,
+            "week": week,
+            "kind": kind,
+            "payload": json.dumps(payload, default=str),
+        }
+        items = extract(payload) if extract and isinstance(payload, dict) else [{}]
+        records.extend({**base, **item} for item in items)
+    df = pd.DataFrame.from_records(records)
+    dtypes = {"id": "int64", "week": "int16", "kind": "string", "payload": "string"}
+    dtypes.update(FIELDS.get(kind, {}))
+    for col, dtype in dtypes.items():
+        if col not in df:
+            df[col] = pd.Series(pd.NA, index=df.index)
+        if dtype in ("float64", "Int16", "Int32"):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        df[col] = df[col].astype(dtype)
+    df["ts"] = pd.to_datetime(df["ts"], utc=True)
+    return df[["id", "ts", "week", "kind", *FIELDS.get(kind, {}), "payload"]]
+
+
+# ------------------ files ------------------
+def _kind_dir(table, kind):
+    return os.path.join(EXPORT_DIR, table, "kind=" + re.sub(r"[^\w-]", "_", kind))
+
+
+def _partition(table, kind, week):
+    return os.path.join(_kind_dir(table, kind), f"week={int(week)}")
+
+
+def _write(df, folder):
+    os.makedirs(folder, exist_ok=True)
+    name = f"part-{int(df['id'].min())}-{int(df['id'].max())}.parquet"
+    tmp = os.path.join(folder, f".{name}.tmp")
+    df.to_parquet(tmp, index=False, compression="zstd")
+    os.replace(tmp, os.path.join(folder, name))
+
+
+def _parts(folder):
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    return sorted(
+        (int(m[1]), int(m[2]), os.path.join(folder, n))
+        for n in names
+        if (m := PART.match(n))
+    )
+
+
+def _merge(folder):
+    parts = _parts(folder)
+    if len(parts) <= MAX_PARTS:
+        return
+    df = pd.concat([pd.read_parquet(p) for _, _, p in parts], ignore_index=True)
+    _write(df.sort_values("id", kind="stable"), folder)
+    for _, _, path in parts:
+        os.remove(path)
+
+
+def _drop_orphans(table, after):
+    """Remove parts written past the watermark by an interrupted export."""
+    for dirpath, _, _ in os.walk(os.path.join(EXPORT_DIR, table)):
+        for first, _, path in _parts(dirpath):
+            if first > after:
+                os.remove(path)
+
+
+def _load_state():
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    tmp = f"{STATE_FILE}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, STATE_FILE)
+
+
+# ------------------ export ------------------
+def _select(cols, table):
+    ts = retention.time_column(cols)
+    payload = next((c for c in ("payload", "json", "data") if c in cols), None)
+    if ts is None or payload is None:
+        return None
+    kind = next((c for c in ("kind", "source") if c in cols), None)
+    default_kind = "snapshot" if table == "snapshots" else "run"
+    kind = f"COALESCE({kind}, '{default_kind}')" if kind else f"'{default_kind}'"
+    week = "week" if "week" in cols else "NULL"
+    return (
+        f"SELECT id, {ts}, {kind}, {week}, {payload} FROM {table} "
+        f"WHERE id > %s ORDER BY id LIMIT %s"
+    )
+
+
+def _group(rows):
+    groups = {}
+    for rid, ts, kind, week, payload in rows:
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        if week is None and isinstance(payload, dict):
+            week = payload.get("week")
+        week = int(week) if isinstance(week, (int, float)) else utils_core.nfl_week(ts)
+        groups.setdefault((kind, week), []).append((rid, ts, week, payload))
+    return groups
+
+
+def export(rebuild=False):
+    """Append rows added since the last export; returns rows exported per table."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        return {}
+    import psycopg2
+
+    if rebuild:
+        shutil.rmtree(EXPORT_DIR, ignore_errors=True)
+    state = _load_state()
+    exported = {}
+    conn = psycopg2.connect(url)
+    try:
+        cur = conn.cursor()
+        for table in TABLES:
+            sql = _select(retention.table_columns(cur, table), table)
+            if sql is None:
+                continue
+            last = state.get(table, 0)
+            _drop_orphans(table, last)
+            touched, count = set(), 0
+            while True:
+                cur.execute(sql, (last, FETCH_ROWS))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                for (kind, week), group in _group(rows).items():
+                    folder = _partition(table, kind, week)
+                    _write(frame(kind, group), folder)
+                    touched.add(folder)
+                last, count = rows[-1][0], count + len(rows)
+                state[table] = last
+                _save_state(state)
+            for folder in touched:
+                _merge(folder)
+            exported[table] = count
+            metrics.inc("analytics_rows_exported_total", count, table=table)
+        cur.close()
+    except Exception as e:
+        metrics.inc("db_errors_total", op="export")
+        log.warning("Analytics export failed: %s", e)
+    finally:
+        conn.close()
+    return exported
+
+
+# ------------------ query ------------------
+def partitions(kind, table="runs", weeks=None):
+    """Part files for ``kind``, optionally only for some weeks."""
+    root = _kind_dir(table, kind)
+    try:
+        dirs = os.listdir(root)
+    except OSError:
+        return []
+    wanted = set(weeks) if weeks is not None else None
+    paths = []
+    for d in sorted(dirs, key=lambda d: int(d.partition("=")[2] or 0)):
+        if wanted is None or int(d.partition("=")[2]) in wanted:
+            paths.extend(p for _, _, p in _parts(os.path.join(root, d)))
+    return paths
+
+
+def load(kind, table="runs", weeks=None, columns=None):
+    """Exported rows of one kind as a DataFrame, reading only ``columns``."""
+    if columns is not None:
+        columns = list(dict.fromkeys(["id", "week", *columns]))
+    frames = [
+        pd.read_parquet(p, columns=columns, memory_map=True)
+        for p in partitions(kind, table, weeks)
+    ]
+    if not frames:
+        return pd.DataFrame(columns=columns or ["id", "ts", "week", "kind"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def trend(kind, column, table="runs", agg="mean", by=None):
+    """``column`` aggregated per week (and per ``by``), e.g. win prob by week."""
+    known = {"id", "ts", "week", "kind", *FIELDS.get(kind, ())}
+    for col in (column, by):
+        if col and kind in FIELDS and col not in known:
+            raise KeyError(f"{kind} has no column {col}")
+    df = load(kind, table, columns=[column] + ([by] if by else []))
+    if df.empty or column not in df:
+        return []
+    keys = ["week", by] if by else ["week"]
+    out = df.groupby(keys, observed=True)[column].agg(agg).reset_index()
+    out[column] = out[column].astype("float64").replace({np.nan: None})
+    return out.to_dict(orient="records")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export runs/snapshots to Parquet")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+    print(json.dumps(export(rebuild=args.rebuild), indent=2))
+
+
+if __name__ == "__main__":
+    main()
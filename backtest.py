@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""Replay stored snapshots through the roles and score their decisions.
+
+Snapshots come from ``out/cron_logs/``, the retention archives and, when
+``DATABASE_URL`` is set, the ``snapshots`` table.  For each NFL week the
+last snapshot before Sunday's kickoffs is the decision input and the week's
+last snapshot is the outcome.  Every role runs on the decision input exactly
+as ``role_graph`` would run it.  Its choices are then scored against the
+points players actually scored:
+
+* head_coach: chosen lineup vs the hindsight-best lineup, and the Brier
+  score of its win probability
+* waiver, trade, gm: actual points of players brought in minus players let go
+
+Outcome points come from the weekly player stats cron stores with each
+snapshot: this team's roster, every league roster and the free agents.
+
+Weeks and parameter sweeps run in parallel on a process pool.  Each worker
+is offline (any upstream request fails at once) and replays with the NFL
+week pinned to the snapshot's and the news index limited to the stories the
+decision snapshot held.  ``--set`` overrides module constants and
+``--param`` role keyword arguments; every combination is one configuration.
+``--role`` swaps in another implementation of a role.
+
+    python backtest.py --weeks 1-8 --roles waiver,trade \\
+        --set waiver_logic.DEFAULT_INTEREST=0.3,0.5,0.7 --workers 8
+    python backtest.py --role trade=trade_logic_v2:run_trade_logic
+"""
+
+import os, json, time, argparse, itertools, importlib, logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import requests
+
+import metrics, retention, utils_core, yahoo_parse, waiver_logic, news
+from draft_engine import _norm
+
+SNAPSHOT_DIR = os.path.join("out", "cron_logs")
+OUT_DIR = os.path.join("out", "backtest")
+# Decisions must be made by Sunday's early kickoffs (weeks start Tuesday).
+DECISION_CUTOFF = timedelta(days=4, hours=17)
+SCORED = ("head_coach", "waiver", "trade", "gm")
+
+log = logging.getLogger(__name__)
+
+
+# ------------------ snapshots ------------------
+def _file_snapshots(folder=SNAPSHOT_DIR):
+    for kind, ts, path in retention.stamped_files((folder,)):
+        if kind != "snapshot":
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                yield ts, json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Skipping unreadable %s: %s", path, e)
+    for entry in retention.history("snapshot"):
+        if entry.get("data"):
+            yield datetime.fromisoformat(entry["ts"]), entry["data"]
+
+
+def _db_snapshots(db_url):
+    import psycopg2
+
+    with psycopg2.connect(db_url) as conn, conn.cursor() as cur:
+        cols = retention.table_columns(cur, "snapshots")
+        ts = retention.time_column(cols)
+        payload = next((c for c in ("data", "payload", "json") if c in cols), None)
+        if ts is None or payload is None:
+            return
+        cur.execute(f"SELECT {ts}, {payload} FROM snapshots ORDER BY 1")
+        for when, data in cur:
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            yield when, data if isinstance(data, dict) else json.loads(data)
+
+
+def load_snapshots(source="files", db_url=None):
+    """``[(utc datetime, snapshot)]`` oldest first, deduplicated by time."""
+    found = {}
+    if source in ("files", "all"):
+        found.update(_file_snapshots())
+    if source in ("db", "all") and (db_url or os.getenv("DATABASE_URL")):
+        found.update(_db_snapshots(db_url or os.getenv("DATABASE_URL")))
+    return sorted(found.items(), key=lambda e: e[0])
+
+
+def weekly(snapshots, weeks=None):
+    """``{week: (decision snapshot, outcome snapshot)}`` for weeks that have both.
+
+    Snapshots are grouped by the league week cron stored with them.
+    """
+    by_week = {}
+    for ts, snap in snapshots:
+        week = snap.get("week") or utils_core.nfl_week(ts)
+        by_week.setdefault(week, []).append((ts, snap))
+    out = {}
+    for week, entries in sorted(by_week.items()):
+        if week < 1 or (weeks and week not in weeks):
+            continue
+        # The stored week may lag the calendar (byes, late rollovers), so the
+        # cutoff follows the game week the week's first snapshot falls in.
+        days = (entries[0][0] - utils_core.SEASON_START).days // 7 * 7
+        cutoff = utils_core.SEASON_START + timedelta(days=days) + DECISION_CUTOFF
+        before = [snap for ts, snap in entries if ts < cutoff]
+        after = [snap for ts, snap in entries if ts >= cutoff]
+        if before and after:
+            out[week] = (before[-1], after[-1])
+    return out
+
+
+# ------------------ outcomes ------------------
+def actual_points(outcome):
+    """``{player id or normalized name: points}`` from an outcome snapshot.
+
+    Reads the weekly stats cron stores: this team's roster, every league
+    roster (opponents) and the free agents.
+    """
+    players = list(yahoo_parse.roster(outcome.get("roster") or {}) or ())
+    players.extend(yahoo_parse.players(outcome.get("free_agents") or {}) or ())
+    for t in yahoo_parse.teams(outcome.get("league_rosters") or {}) or ():
+        players.extend(t.players)
+    for m in yahoo_parse.matchups(outcome.get("matchup") or {}) or ():
+        for t in m.teams:
+            players.extend(t.players)
+    points = {}
+    for p in players:
+        if p.points:
+            points[yahoo_parse.player_id(p)] = points[_norm(p.name)] = p.points
+    return points
+
+
+def _pts(points, player):
+    if isinstance(player, dict):
+        return points.get(player.get("id"), points.get(_norm(player.get("name"))))
+    return points.get(player, points.get(_norm(player)))
+
+
+def _won(decision, outcome):
+    me = yahoo_parse.team(decision.get("roster") or {})
+    for m in yahoo_parse.matchups(outcome.get("matchup") or {}) or ():
+        keys = {t.key: t.points for t in m.teams}
+        if me and me.key in keys and len(keys) == 2 and any(keys.values()):
+            theirs = next(v for k, v in keys.items() if k != me.key)
+            return keys[me.key] > theirs
+    return None
+
+
+def _swaps(pairs, points):
+    """Actual points gained by each (brought in, let go) pair both sides of which scored."""
+    gains = []
+    for got, gave in pairs:
+        a, b = _pts(points, got), (_pts(points, gave) if gave else 0.0)
+        if a is not None and b is not None:
+            gains.append(a - b)
+    if not gains:
+        return {"scored": 0, "of": len(pairs)}
+    return {
+        "scored": len(gains),
+        "of": len(pairs),
+        "gain": round(float(np.mean(gains)), 2),
+        "hit_rate": round(float(np.mean([g > 0 for g in gains])), 3),
+    }
+
+
+def score(role, result, decision, outcome, points):
+    """Decision quality of one role result; ``{}`` for roles without a scorer."""
+    if not isinstance(result, dict) or "error" in result:
+        return {"error": (result or {}).get("error", "no result")}
+    if role == "head_coach":
+        players = [
+            {**p, "projection": _pts(points, p) or 0.0}
+            for p in yahoo_parse.player_dicts(decision.get("roster") or {})
+        ]
+        slots, _, _ = waiver_logic.league()
+        best, _ = waiver_logic.best_lineup(players, waiver_logic.starting_slots(slots))
+        chosen = sum(_pts(points, name) or 0.0 for name in result.get("lineup") or [])
+        out = {"points": round(chosen, 2), "optimal": round(best, 2)}
+        if best:
+            out["efficiency"] = round(chosen / best, 3)
+        won, p = _won(decision, outcome), (result.get("logic") or {}).get("win_prob")
+        if won is not None and p is not None:
+            out["brier"] = round((p - float(won)) ** 2, 4)
+        return out
+    if role == "waiver":
+        recs = [r for r in result.get("waiver_recs") or [] if r.get("add")]
+        return _swaps([(r["add"], r.get("drop")) for r in recs], points)
+    if role == "trade":
+        props = result.get("trade_proposals") or []
+        return _swaps([(p["get"], p["give"]) for p in props], points)
+    if role == "gm":
+        moves = (result.get("horizon") or {}).get("moves") or []
+        return _swaps(
+            [(m["player"], m.get("give") or m.get("drop")) for m in moves], points
+        )
+    return {}
+
+
+# ------------------ replay ------------------
+_config = None  # label of the configuration this worker last applied
+
+
+def _offline():
+    """Worker initializer: upstream calls fail at once instead of going out.
+
+    Replayed matrices stay private instead of replacing the live ones in the
+    data plane.
+    """
+    import projections
+
+    def blocked(self, method, url, *args, **kwargs):
+        raise requests.ConnectionError(f"backtest is offline: {method} {url}")
+
+    requests.Session.request = blocked
+    projections.PLANE = None
+
+
+def _decided_at(snap):
+    try:
+        ts = datetime.strptime(snap["timestamp"], retention.TS_FORMAT)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return ts.replace(tzinfo=timezone.utc).timestamp()
+
+
+@contextmanager
+def _replaying(week, overrides, decision=None):
+    """Pin the NFL week, the news and ``module.ATTR`` overrides, restoring all.
+
+    Roles see only the stories stored with the decision snapshot, aged as
+    of its timestamp, never the live store's later news.
+    """
+    real_week, real_current, saved = utils_core.nfl_week, utils_core.current_week, []
+    utils_core.nfl_week = lambda ts=None, league_key=None: (
+        real_week(ts, league_key) if ts else week
+    )
+    utils_core.current_week = utils_core.nfl_week
+    index, decided = news.Index((decision or {}).get("news") or ()), _decided_at(
+        decision or {}
+    )
+    saved.append((news, "for_players", news.for_players))
+    news.for_players = lambda names, hours=24, now=None: index.for_players(
+        names, hours, now or decided
+    )
+    try:
+        for name, value in overrides.items():
+            module, attr = name.rsplit(".", 1)
+            module = importlib.import_module(module)
+            saved.append((module, attr, getattr(module, attr)))
+            setattr(module, attr, value)
+        yield
+    finally:
+        utils_core.nfl_week, utils_core.current_week = real_week, real_current
+        for module, attr, value in reversed(saved):
+            setattr(module, attr, value)
+
+
+def _inputs(snap):
+    return {
+        "roster": snap.get("roster") or {},
+        "odds": snap.get("vegas_odds") or {},
+        "weather": snap.get("weather") or {},
+        "free_agents": snap.get("free_agents") or {"error": "not in snapshot"},
+        "transactions": snap.get("yahoo_transactions") or {},
+        "opponents": snap.get("matchup") or {},
+        "history": [],
+        "news": {},
+    }
+
+
+def _resolve(spec):
+    module, fn = spec.split(":", 1)
+    return getattr(importlib.import_module(module), fn)
+
+
+def replay(task):
+    """Run one (configuration, week) task; returns its scored rows."""
+    global _config
+    import role_graph, general_manager_logic, projections
+
+    config, week, decision, outcome, roles, impls = task
+    if config["label"] != _config:
+        # Memoized plans and matrices may depend on the overridden constants.
+        general_manager_logic._memo.clear()
+        projections._current = None
+        _config = config["label"]
+    values, points, rows = _inputs(decision), actual_points(outcome), []
+    with _replaying(week, config["set"], decision):
+        for role in roles:
+            deps, fn = role_graph.ROLES[role]
+            fn = _resolve(impls[role]) if role in impls else fn
+            start = time.perf_counter()
+            try:
+                result = fn(
+                    **{d: values[d] for d in deps}, **config["params"].get(role, {})
+                )
+            except Exception as e:
+                result = {"error": str(e)}
+            rows.append(
+                {
+                    "config": config["label"],
+                    "week": week,
+                    "role": role,
+                    "seconds": round(time.perf_counter() - start, 3),
+                    **score(role, result, decision, outcome, points),
+                }
+            )
+    return rows
+
+
+# ------------------ sweeps ------------------
+def _value(raw):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def _axis(spec):
+    name, _, values = spec.partition("=")
+    return name.strip(), [_value(v.strip()) for v in values.split(",") if v.strip()]
+
+
+def configs(sets=(), params=()):
+    """Every combination of ``--set`` and ``--param`` values."""
+    axes = [("set", *_axis(s)) for s in sets] + [("param", *_axis(p)) for p in params]
+    out = []
+    for combo in itertools.product(*(values for _, _, values in axes)):
+        config = {"set": {}, "params": {}, "label": ""}
+        for (kind, name, _), value in zip(axes, combo):
+            if kind == "set":
+                config["set"][name] = value
+            else:
+                role, kwarg = name.split(".", 1)
+                config["params"].setdefault(role, {})[kwarg] = value
+        config["label"] = (
+            ",".join(f"{n.rsplit('.', 1)[-1]}={v}" for (_, n, _), v in zip(axes, combo))
+            or "baseline"
+        )
+        out.append(config)
+    return out
+
+
+def summarize(rows):
+    """Mean of every numeric metric per configuration and role."""
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["config"], row["role"]), []).append(row)
+    summary = {}
+    for (config, role), group in sorted(groups.items()):
+        keys = {
+            k
+            for r in group
+            for k, v in r.items()
+            if isinstance(v, (int, float)) and k != "week"
+        }
+        stats = {
+            k: round(float(np.mean([r[k] for r in group if k in r])), 4)
+            for k in sorted(keys)
+        }
+        stats["weeks"] = len(group)
+        stats["errors"] = sum(1 for r in group if "error" in r)
+        summary.setdefault(config, {})[role] = stats
+    return summary
+
+
+@metrics.timed("backtest")
+def run(weeks, roles, configurations, impls=None, workers=None):
+    """Replay every (configuration, week) on a process pool."""
+    impls = impls or {}
+    tasks = [
+        (config, week, decision, outcome, roles, impls)
+        for config in configurations
+        for week, (decision, outcome) in sorted(weeks.items())
+    ]
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_offline) as pool:
+        for fut in as_completed([pool.submit(replay, t) for t in tasks]):
+            rows.extend(fut.result())
+    rows.sort(key=lambda r: (r["config"], r["week"], r["role"]))
+    return {"rows": rows, "summary": summarize(rows)}
+
+
+def _weeks(spec):
+    if not spec:
+        return None
+    first, _, last = spec.partition("-")
+    return set(range(int(first), int(last or first) + 1))
+
+
+def main():
+    import role_graph
+
+    parser = argparse.ArgumentParser(description="Backtest roles on stored snapshots")
+    parser.add_argument("--weeks", help="e.g. 1-8 (default: every replayable week)")
+    parser.add_argument("--roles", default=",".join(SCORED))
+    parser.add_argument("--source", choices=("files", "db", "all"), default="all")
+    parser.add_argument("--set", action="append", default=[], metavar="MOD.ATTR=V,V")
+    parser.add_argument("--param", action="append", default=[], metavar="ROLE.KW=V,V")
+    parser.add_argument("--role", action="append", default=[], metavar="ROLE=MOD:FN")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    roles = [r for r in args.roles.split(",") if r]
+    unknown = [r for r in roles if r not in role_graph.ROLES]
+    if unknown:
+        parser.error(f"unknown roles: {', '.join(unknown)}")
+    impls = dict(spec.split("=", 1) for spec in args.role)
+    weeks = weekly(load_snapshots(args.source), _weeks(args.weeks))
+    if not weeks:
+        parser.error("no week has both a decision and an outcome snapshot")
+    configurations = configs(args.set, args.param)
+    start = time.perf_counter()
+    report = run(weeks, roles, configurations, impls, args.workers)
+    report["weeks"] = sorted(weeks)
+    report["seconds"] = round(time.perf_counter() - start, 2)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    path = os.path.join(
+        OUT_DIR, f"backtest_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.json"
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for config, by_role in report["summary"].items():
+        print(config)
+        for role, stats in by_role.items():
+            print(f"  {role:<12} {json.dumps(stats)}")
+    print(
+        f"{len(report['rows'])} replays of {len(weeks)} weeks x "
+        f"{len(configurations)} configs in {report['seconds']}s -> {path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Offline benchmark suite.
+
+Replays the recorded ``out/*.json`` artifacts through ``stub_server`` (with
+configurable upstream latency) and times every API endpoint and role end to
+end, plus the hot paths: ``simulate_matchup``, the trade search and alert
+matching.  Results are written as JSON so two commits can be compared:
+
+    python bench.py --latency-ms 40 --repeat 10
+    python bench.py --compare out/bench/bench_<a>.json out/bench/bench_<b>.json
+"""
+import os, sys, json, time, random, argparse, tempfile, subprocess
+from datetime import datetime
+
+import stub_server
+
+BENCH_DIR = os.path.join("out", "bench")
+ENDPOINTS = [
+    "/api/run/head_coach",
+    "/api/run/gm",
+    "/api/run/waiver",
+    "/api/run/scout",
+    "/api/run/trade",
+    "/api/run/learning",
+    "/api/decree",
+    "/api/data_ingest",
+]
+
+
+def percentile(samples, q):
+    s = sorted(samples)
+    if not s:
+        return 0.0
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def summarize(samples):
+    ms = [x * 1000.0 for x in samples]
+    return {
+        "n": len(ms),
+        "mean_ms": sum(ms) / len(ms) if ms else 0.0,
+        "p50_ms": percentile(ms, 0.50),
+        "p95_ms": percentile(ms, 0.95),
+        "min_ms": min(ms) if ms else 0.0,
+        "max_ms": max(ms) if ms else 0.0,
+    }
+
+
+def time_call(fn, repeat, setup=None, warmup=1):
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def _git_rev():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        )
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def _synthetic_players(seed=7):
+    """Deterministic trade-search inputs built from the recorded draft pool."""
+    rng = random.Random(seed)
+    pool = stub_server._load("draft_pool_master.json")
+    pool = [p for p in pool if p.get("pos") in ("QB", "RB", "WR", "TE")]
+    players = [
+        {
+            "id": f"{p['pos']}_{i}",
+            "name": p["name"],
+            "projection": max(0.0, 22.0 - i * 0.02 + rng.gauss(0, 2)),
+            "opponent": p.get("team") or "",
+            "status": rng.choice(["", "", "", "QUESTIONABLE", "OUT"]),
+        }
+        for i, p in enumerate(pool)
+    ]
+    rng.shuffle(players)
+    roster, fa = players[:15], players[15:215]
+    opps = [
+        {"team": f"team_{t}", "roster": players[215 + t * 15 : 230 + t * 15]}
+        for t in range(11)
+    ]
+    return players, roster, fa, opps
+
+
+def bench_micro(repeat):
+    import team_logic, trade_logic, notifications, news, whatif
+
+    roster = stub_server._load("roster.json")
+    odds = {"provider": "bench", "data": stub_server._load("odds_cache.json")["games"]}
+    weather = {"temp": 55.0, "wind": 22.0}
+    players, my_roster, fa, opps = _synthetic_players()
+    rng = random.Random(11)
+    index = news.Index(
+        {"title": f"{rng.choice(players)['name']} limited at practice", "url": f"n/{i}"}
+        for i in range(500)
+    )
+    # 20 start/sit and trade scenarios, evaluated as one batch.
+    scenarios = [{"sit": [p["name"]]} for p in my_roster[:10]] + [
+        {"give": [my_roster[i]["id"]], "get": [fa[i]["id"]]} for i in range(10)
+    ]
+    return {
+        "micro:simulate_matchup:500": time_call(
+            lambda: team_logic.simulate_matchup(roster, odds, weather, 500), repeat
+        ),
+        "micro:simulate_matchup:5000": time_call(
+            lambda: team_logic.simulate_matchup(roster, odds, weather, 5000), repeat
+        ),
+        "micro:trade_search": time_call(
+            lambda: trade_logic.run_trade_logic(my_roster, {}, {}, fa, opps), repeat
+        ),
+        "micro:alert_matching": time_call(
+            lambda: notifications.match_alerts(my_roster, index), repeat
+        ),
+        "micro:whatif:20x2000": time_call(
+            lambda: whatif.evaluate(my_roster, {}, {}, scenarios, fa, 2000), repeat
+        ),
+    }
+
+
+def bench_app(repeat):
+    import thanos, role_graph, utils_core
+
+    def cold():
+        role_graph.clear_cache()
+        utils_core.fetch_weather_data.cache_clear()
+
+    client = thanos.app.test_client()
+    results = {}
+    for path in ENDPOINTS:
+        results[f"endpoint:{path}:cold"] = time_call(
+            lambda: client.get(path), repeat, setup=cold
+        )
+        results[f"endpoint:{path}:warm"] = time_call(lambda: client.get(path), repeat)
+    for role in role_graph.ROLES:
+        results[f"role:{role}"] = time_call(
+            lambda: role_graph.run([role]), repeat, setup=cold
+        )
+    results["role:all"] = time_call(lambda: role_graph.run(), repeat, setup=cold)
+    return results
+
+
+def run_bench(latency_ms=0.0, jitter_ms=0.0, repeat=5):
+    stub = stub_server.StubServer(latency_ms=latency_ms, jitter_ms=jitter_ms).start()
+    tmp = tempfile.mkdtemp(prefix="fantasycpu_bench_")
+    os.environ.update(stub.env(os.path.join(tmp, "yahoo_token.json")))
+    os.environ.setdefault("METRICS_DIR", os.path.join(tmp, "metrics"))
+    import role_graph
+
+    role_graph.CACHE_DIR = os.path.join(tmp, "role_cache")
+    try:
+        results = bench_micro(repeat)
+        results.update(bench_app(repeat))
+    finally:
+        stub.stop()
+    return {
+        "commit": _git_rev(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "config": {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "repeat": repeat},
+        "upstream_hits": stub.hits,
+        "results": results,
+    }
+
+
+def compare(base, head, threshold=0.10):
+    """Print p50 deltas; returns the names that regressed beyond threshold."""
+    regressions = []
+    print(f"{'benchmark':<42}{'base p50':>11}{'head p50':>11}{'delta':>9}")
+    for name in sorted(set(base["results"]) | set(head["results"])):
+        b = base["results"].get(name, {}).get("p50_ms")
+        h = head["results"].get(name, {}).get("p50_ms")
+        if b is None or h is None:
+            print(f"{name:<42}{'only in head' if b is None else 'only in base':>22}")
+            continue
+        delta = (h - b) / b if b else 0.0
+        flag = ""
+        if delta > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<42}{b:>11.2f}{h:>11.2f}{delta:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thanos offline benchmark suite")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--out", help="Result file (default out/bench/bench_<commit>.json)"
+    )
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"))
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            head = json.load(f)
+        sys.exit(1 if compare(base, head, args.threshold) else 0)
+
+    result = run_bench(args.latency_ms, args.jitter_ms, args.repeat)
+    path = args.out or os.path.join(BENCH_DIR, f"bench_{result['commit']}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    for name, r in result["results"].items():
+        print(f"{name:<42}{r['p50_ms']:>10.2f}ms p50 {r['p95_ms']:>10.2f}ms p95")
+    print(f" Saved benchmark -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,17 +5,25 @@ from pathlib import Path
 import psycopg2  # PostgreSQL
 from psycopg2.extras import Json
 
+import scout_logic, season_sim, log_config, retention, analytics_export, quota
+
 # Import your existing utility functions
 from utils_core import (
+    current_week,
     load_roster,
     load_matchup,
+    fetch_scoreboard,
+    load_league_rosters,
+    fetch_free_agents,
     fetch_odds,
     fetch_weather_data,
     fetch_sleeper_players,
-    fetch_yahoo_players,
     fetch_yahoo_transactions,
+    fetch_news,
 )
 
+log = log_config.setup("cron")
+
 
 def run_data_collection():
     # Prepare output folder
@@ -23,19 +31,36 @@ def run_data_collection():
     out_dir.mkdir(parents=True, exist_ok=True)
 
     timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    snapshot = {"timestamp": timestamp}
+    week = current_week()
+    snapshot = {"timestamp": timestamp, "week": week}
 
     # 🔹 Collect data from each API
     try:
-        snapshot["roster"] = load_roster()
+        # Weekly player points make the week's last snapshot an outcome
+        # backtest.py can score decisions against.
+        snapshot["roster"] = load_roster(week=week, stats=True)
     except Exception as e:
         snapshot["roster_error"] = str(e)
 
+    try:
+        # Kept so backtest.py can replay the waiver and trade roles.
+        snapshot["free_agents"] = fetch_free_agents(week=week, stats=True)
+    except Exception as e:
+        snapshot["free_agents_error"] = str(e)
+
     try:
         snapshot["matchup"] = load_matchup()
     except Exception as e:
         snapshot["matchup_error"] = str(e)
 
+    try:
+        # Final weeks feed the season outlook's incremental update.
+        snapshot["scoreboards_fetched"] = season_sim.sync_scoreboards(
+            week, fetch_scoreboard
+        )
+    except Exception as e:
+        snapshot["scoreboards_error"] = str(e)
+
     try:
         snapshot["vegas_odds"] = fetch_odds()
     except Exception as e:
@@ -52,21 +77,46 @@ def run_data_collection():
         snapshot["sleeper_error"] = str(e)
 
     try:
-        snapshot["yahoo_players"] = fetch_yahoo_players()
+        snapshot["yahoo_transactions"] = fetch_yahoo_transactions()
     except Exception as e:
-        snapshot["yahoo_players_error"] = str(e)
+        snapshot["yahoo_transactions_error"] = str(e)
 
     try:
-        snapshot["yahoo_transactions"] = fetch_yahoo_transactions()
+        snapshot["news"] = fetch_news()
     except Exception as e:
-        snapshot["yahoo_transactions_error"] = str(e)
+        snapshot["news_error"] = str(e)
+
+    try:
+        # Every team's roster with this week's points (opponents' outcomes).
+        snapshot["league_rosters"] = load_league_rosters(week, stats=True)
+    except Exception as e:
+        snapshot["league_rosters_error"] = str(e)
+
+    try:
+        # Last week's final lineups (with points) for every team; the teams'
+        # names and managers ride along, so scout lookups by either resolve.
+        if week > 1:
+            snapshot["final_rosters"] = load_league_rosters(week - 1, stats=True)
+    except Exception as e:
+        snapshot["final_rosters_error"] = str(e)
+
+    # 🔹 Fold new league activity into the opponent profiles
+    try:
+        scout_logic.ingest(
+            transactions=snapshot.get("yahoo_transactions"),
+            rosters=(
+                [snapshot["final_rosters"]] if "final_rosters" in snapshot else ()
+            ),
+        )
+    except Exception as e:
+        snapshot["scout_error"] = str(e)
 
     # 🔹 Save JSON snapshot to file
     file_path = out_dir / f"snapshot_{timestamp}.json"
     with open(file_path, "w") as f:
         json.dump(snapshot, f, indent=2)
 
-    print(f"[Cron Job] JSON snapshot saved → {file_path}")
+    log.info("JSON snapshot saved", extra={"path": str(file_path)})
 
     # 🔹 Also save snapshot to Postgres (if DATABASE_URL is set)
     db_url = os.getenv("DATABASE_URL")
@@ -90,12 +140,26 @@ def run_data_collection():
             conn.commit()
             cur.close()
             conn.close()
-            print("[Cron Job] Snapshot inserted into Postgres ✅")
+            log.info("Snapshot inserted into Postgres")
         except Exception as e:
-            print(f"[Cron Job] Postgres insert failed ❌: {e}")
+            log.error("Postgres insert failed", extra={"error": str(e)})
     else:
-        print("[Cron Job] Skipped Postgres (DATABASE_URL not set)")
+        log.info("Skipped Postgres (DATABASE_URL not set)")
+
+    # 🔹 Export new runs/snapshots rows before retention downsamples them
+    try:
+        log.info("Analytics export", extra={"exported": analytics_export.export()})
+    except Exception as e:
+        log.error("Analytics export failed", extra={"error": str(e)})
+
+    # 🔹 Downsample outputs and rows older than the retention window
+    try:
+        log.info("Retention pass", extra=retention.compact())
+    except Exception as e:
+        log.error("Retention pass failed", extra={"error": str(e)})
 
 
 if __name__ == "__main__":
-    run_data_collection()
+    # Background collection yields upstream quota to interactive requests.
+    with quota.priority("low"):
+        run_data_collection()
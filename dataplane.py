@@ -0,0 +1,205 @@
+"""Read-only reference data shared by every worker through memory-mapped files.
+
+A dataset is a set of NumPy arrays plus a small JSON ``meta`` document,
+published as one immutable version directory::
+
+    out/dataplane/<name>/<version>/{<array>.npy, meta.json}
+    out/dataplane/<name>/CURRENT        # the live version
+
+``publish`` writes the version under a temporary name, renames it into
+place and then swaps ``CURRENT`` with ``os.replace``, so readers see either
+the old version or the new one and never a partial write.  ``load`` maps
+the arrays copy-on-write (``mmap_mode="c"``): every worker shares the same
+page-cache pages and only pages a worker writes to become private.  A
+worker checks ``CURRENT`` with one ``stat`` per call and remaps only when
+the version changed.  Old versions are kept for ``KEEP`` publishes; a
+worker still holding one keeps valid pages after it is deleted.
+"""
+
+import os, json, time, shutil, hashlib, logging, threading
+from dataclasses import dataclass
+
+import numpy as np
+
+import metrics
+
+DATA_DIR = os.getenv("DATAPLANE_DIR", os.path.join("out", "dataplane"))
+KEEP = 3  # versions kept per dataset
+META = "meta.json"
+CURRENT = "CURRENT"
+
+log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_mapped = {}  # (name, version) -> Dataset
+_pointers = {}  # name -> ((CURRENT inode, mtime_ns), version)
+
+
+@dataclass(frozen=True)
+class Dataset:
+    name: str
+    version: str
+    arrays: dict
+    meta: dict
+
+
+def _folder(name, version=None):
+    base = os.path.join(DATA_DIR, name)
+    return os.path.join(base, version) if version else base
+
+
+def _digest(arrays, meta):
+    h = hashlib.sha1(json.dumps(meta, sort_keys=True, default=str).encode())
+    for key in sorted(arrays):
+        h.update(key.encode())
+        h.update(np.ascontiguousarray(arrays[key]).tobytes())
+    return h.hexdigest()[:16]
+
+
+def _point(name, version):
+    tmp = os.path.join(
+        _folder(name), f".{CURRENT}.{os.getpid()}.{threading.get_ident()}"
+    )
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(_folder(name), CURRENT))
+
+
+def _gc(name, keep=KEEP):
+    base = _folder(name)
+    current = current_version(name)
+    versions = sorted(
+        (e for e in os.scandir(base) if e.is_dir() and not e.name.startswith(".")),
+        key=lambda e: e.stat().st_mtime_ns,
+        reverse=True,
+    )
+    for entry in versions[keep:]:
+        if entry.name != current:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def publish(name, arrays, meta=None, version=None):
+    """Write a dataset version and make it current; returns the version.
+
+    ``arrays`` must have fixed-size dtypes (numbers, ``U``/``S`` strings) so
+    they can be mapped.  Publishing a version that already exists only
+    moves ``CURRENT``.
+    """
+    meta = meta or {}
+    version = version or _digest(arrays, meta)
+    target = _folder(name, version)
+    os.makedirs(_folder(name), exist_ok=True)
+    if not os.path.isdir(target):
+        tmp = os.path.join(
+            _folder(name), f".{version}.{os.getpid()}.{threading.get_ident()}"
+        )
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        try:
+            for key, arr in arrays.items():
+                np.save(os.path.join(tmp, f"{key}.npy"), np.asarray(arr))
+            with open(os.path.join(tmp, META), "w", encoding="utf-8") as f:
+                json.dump(meta, f, default=str)
+            os.replace(tmp, target)
+        except OSError:
+            # Another worker published the same version first.
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+    _point(name, version)
+    metrics.inc("dataplane_publish_total", dataset=name)
+    _gc(name)
+    return version
+
+
+def current_version(name):
+    """The current version of ``name``, or None; one ``stat`` when unchanged."""
+    path = os.path.join(_folder(name), CURRENT)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cached = _pointers.get(name)
+    # Each swap is a new inode, so coarse mtimes cannot hide one.
+    stamp = (st.st_ino, st.st_mtime_ns)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            current = f.read().strip()
+    except OSError:
+        return None
+    _pointers[name] = (stamp, current)
+    return current
+
+
+def load(name, version=None):
+    """The current (or given) version of a dataset, mapped; None if absent."""
+    version = version or current_version(name)
+    if not version:
+        return None
+    key = (name, version)
+    with _lock:
+        ds = _mapped.get(key)
+        if ds is not None:
+            return ds
+        folder = _folder(name, version)
+        if not os.path.isdir(folder):
+            return None
+        try:
+            with open(os.path.join(folder, META), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {
+                e.name[:-4]: np.load(e.path, mmap_mode="c", allow_pickle=False)
+                for e in os.scandir(folder)
+                if e.name.endswith(".npy")
+            }
+        except (OSError, ValueError) as e:
+            log.warning("Could not map %s/%s: %s", name, version, e)
+            return None
+        ds = Dataset(name, version, arrays, meta)
+        # Keep the current mapping and the one it replaces, per dataset.
+        for old in [k for k in _mapped if k[0] == name][:-1]:
+            del _mapped[old]
+        _mapped[key] = ds
+        metrics.inc("dataplane_map_total", dataset=name)
+        return ds
+
+
+def publish_value(name, value):
+    """Publish a JSON document (odds, weather) as an array-less dataset."""
+    return publish(name, {}, {"value": value})
+
+
+def age(name):
+    """Seconds since ``name`` was last published; None if it never was."""
+    try:
+        return time.time() - os.stat(os.path.join(_folder(name), CURRENT)).st_mtime
+    except OSError:
+        return None
+
+
+def load_value(name, max_age=None):
+    """A value from ``publish_value`` if published within ``max_age`` seconds."""
+    since = age(name)
+    if since is None or (max_age is not None and since > max_age):
+        return None
+    ds = load(name)
+    return None if ds is None else ds.meta.get("value")
+
+
+def status():
+    """Current version and age of every published dataset."""
+    try:
+        names = sorted(e.name for e in os.scandir(DATA_DIR) if e.is_dir())
+    except OSError:
+        return {}
+    out = {}
+    for name in names:
+        ds = load(name)
+        if ds is not None:
+            out[name] = {
+                "version": ds.version,
+                "age_s": round(age(name) or 0.0, 1),
+                "arrays": {k: list(v.shape) for k, v in ds.arrays.items()},
+            }
+    return out
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""Live draft engine: value over replacement with incremental board updates.
+
+The ECR export (``draft_results_clean.csv``, or ``ecr.csv`` without tiers) and
+``draft_pool_master.json`` are loaded once into numpy arrays.  Replacement
+level per position comes from the league's starting lineup in
+``settings_raw.json`` (dedicated slots first, then flex slots filled greedily),
+so VORP is fixed for the draft.  The per-position ``(tier, -vorp, idx)``
+lists, the rank list and the best-available heap are built once and never
+shifted: a pick clears the player's ``available`` flag and updates the
+scarcity and tier counters in O(1), and views skip drafted entries lazily,
+dropping each index's drafted prefix for good.  ``lookahead`` simulates the
+opponents' picks until our next slot, vectorized across simulations.
+
+    python draft_engine.py --slot 5 --picks out/picks_1_192.csv --upto 40
+"""
+
+import os, re, csv, json, heapq, bisect, argparse, itertools
+import numpy as np
+
+import metrics
+
+OUT_DIR = "out"
+BOARD_FILE = os.path.join(OUT_DIR, "draft", "board.json")
+POSITIONS = ("QB", "RB", "WR", "TE", "K", "DEF")
+FLEX = {"W/R/T": ("RB", "WR", "TE"), "Q/W/R/T": ("QB", "RB", "WR", "TE")}
+# Season points for the position's top player and the per-rank decay.  ECR
+# exports carry ranks but no projections, so projections follow a positional
+# rank curve unless real ones are passed in.
+CURVES = {
+    "QB": (380.0, 0.035),
+    "RB": (330.0, 0.045),
+    "WR": (320.0, 0.035),
+    "TE": (230.0, 0.060),
+    "K": (150.0, 0.015),
+    "DEF": (140.0, 0.030),
+}
+INJURY_DISCOUNT = {"questionable": 0.95, "doubtful": 0.85, "out": 0.75, "ir": 0.5}
+N_SIMS = int(os.getenv("DRAFT_SIMS", "2000"))
+TEMPERATURE = 6.0  # ranks; how far opponents stray from consensus
+CANDIDATES = 3  # candidate pool per simulated pick
+DEFAULT_ROSTER = {
+    "QB": 1,
+    "WR": 2,
+    "RB": 2,
+    "TE": 1,
+    "W/R/T": 1,
+    "Q/W/R/T": 1,
+    "K": 1,
+    "DEF": 1,
+    "BN": 6,
+    "IR": 1,
+}
+
+
+def _norm(name):
+    name = re.sub(r"\b(jr|sr|ii|iii|iv|v)\b\.?", "", (name or "").lower())
+    return re.sub(r"[^a-z0-9]", "", name)
+
+
+def _pos(value):
+    pos = re.sub(r"\d", "", value or "").upper()
+    return "DEF" if pos in ("DST", "D/ST") else pos
+
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _read_csv(name):
+    try:
+        with open(os.path.join(OUT_DIR, name), newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    except Exception:
+        return []
+
+
+def _load(name):
+    try:
+        with open(os.path.join(OUT_DIR, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def league_roster(settings_payload):
+    """``({slot: count}, num_teams)`` from Yahoo league settings."""
+    league = (settings_payload or {}).get("fantasy_content", {}).get("league", [])
+    if len(league) < 2:
+        return dict(DEFAULT_ROSTER), 12
+    settings = (league[1].get("settings") or [{}])[0]
+    slots = {}
+    for rp in settings.get("roster_positions") or []:
+        rp = rp.get("roster_position", rp)
+        slots[rp["position"]] = int(rp.get("count") or 0)
+    return slots or dict(DEFAULT_ROSTER), int(
+        league[0].get("num_teams") or settings.get("max_teams") or 12
+    )
+
+
+def parse_pick(text):
+    """``"Bijan Robinson (Atl - RB)"`` -> ``("Bijan Robinson", "ATL", "RB")``."""
+    m = re.match(r"\s*(.*?)\s*\((\w+)\s*-\s*([\w/]+)\)\s*$", text or "")
+    if not m:
+        return (text or "").strip(), "", ""
+    return m.group(1), m.group(2).upper(), _pos(m.group(3))
+
+
+# ------------------ board ------------------
+class DraftBoard:
+    def __init__(self, players, roster=None, num_teams=12, projections=None):
+        self.roster = dict(roster or DEFAULT_ROSTER)
+        self.num_teams = num_teams
+        self.rounds = sum(c for s, c in self.roster.items() if s != "IR")
+        n = len(players)
+        self.names = [p["name"] for p in players]
+        self.teams = [p.get("team") or "" for p in players]
+        self.pos = [p["pos"] for p in players]
+        self.injury = [p.get("injury") or "" for p in players]
+        self.bye = np.array([_int(p.get("bye")) for p in players], dtype=np.int64)
+        self.pos_code = np.array([POSITIONS.index(p) for p in self.pos], dtype=np.int8)
+        self.rank = np.array([p["rank"] for p in players], dtype=np.int64)
+        self.tier = np.array([p.get("tier") or 99 for p in players], dtype=np.int64)
+        self.pos_rank = np.zeros(n, dtype=np.int64)
+        for code in range(len(POSITIONS)):
+            idx = np.flatnonzero(self.pos_code == code)
+            self.pos_rank[idx[np.argsort(self.rank[idx], kind="stable")]] = np.arange(
+                1, len(idx) + 1
+            )
+        self.proj = self._projections(projections or {})
+        self.replacement = self._replacement_levels()
+        self.vorp = self.proj - np.array([self.replacement[p] for p in self.pos])
+
+        self._index = {}
+        for i in np.argsort(self.rank, kind="stable"):
+            self._index.setdefault(_norm(self.names[i]), int(i))
+        self._def_by_team = {
+            self.teams[i]: i for i in range(n) if self.pos[i] == "DEF" and self.teams[i]
+        }
+        self.available = np.ones(n, dtype=bool)
+        self._by_pos = {p: [] for p in POSITIONS}
+        for i in range(n):
+            self._by_pos[self.pos[i]].append(self._pos_key(i))
+        for lst in self._by_pos.values():
+            lst.sort()
+        self._tier_left = {}
+        for i in range(n):
+            key = (self.pos[i], int(self.tier[i]))
+            self._tier_left[key] = self._tier_left.get(key, 0) + 1
+        self._heads = {}  # index name -> first entry not yet drafted
+        self._by_rank = sorted((int(self.rank[i]), i) for i in range(n))
+        self._by_value = [(-float(self.vorp[i]), i) for i in range(n)]
+        heapq.heapify(self._by_value)
+        self.starters_total = {
+            p: int(((self.pos_code == k) & (self.vorp > 0)).sum())
+            for k, p in enumerate(POSITIONS)
+        }
+        self.starters_left = dict(self.starters_total)
+        self.picks = []  # (pick_no, player idx, team slot)
+        self.team_counts = np.zeros((num_teams, len(POSITIONS)), dtype=np.int64)
+
+    @classmethod
+    def load(cls, projections=None):
+        """Board from the recorded ECR export, player pool and league settings."""
+        rows = _read_csv("draft_results_clean.csv")
+        if rows:
+            rows = [
+                {
+                    "name": r["PLAYER NAME"],
+                    "team": r["TEAM"],
+                    "pos": _pos(r["POS"]),
+                    "rank": int(r["RK"]),
+                    "tier": int(r["TIERS"] or 99),
+                    "bye": r.get("BYE"),
+                }
+                for r in rows
+            ]
+        else:
+            rows = [
+                {
+                    "name": r["Player"],
+                    "team": r["Team"],
+                    "pos": _pos(r["Pos"]),
+                    "rank": int(r["Rank"]),
+                    "bye": r.get("Bye"),
+                }
+                for r in _read_csv("ecr.csv")
+            ]
+        rows = [r for r in rows if r["pos"] in POSITIONS]
+        seen = {_norm(r["name"]): r for r in rows}
+        # Pool-only players rank after everyone in the ECR, in pool order;
+        # the pool's team defenses use nicknames and are covered by the ECR.
+        for p in _load("draft_pool_master.json") or []:
+            key = _norm(p.get("name"))
+            if key in seen:
+                seen[key].setdefault("injury", p.get("injury"))
+                continue
+            if p.get("pos") not in POSITIONS or p.get("pos") == "DEF":
+                continue
+            seen[key] = row = {**p, "rank": len(rows) + 1}
+            rows.append(row)
+        roster, num_teams = league_roster(_load("settings_raw.json"))
+        return cls(rows, roster, num_teams, projections)
+
+    def _projections(self, given):
+        proj = np.empty(len(self.names), dtype=np.float64)
+        for i, name in enumerate(self.names):
+            if name in given:
+                proj[i] = given[name]
+                continue
+            top, decay = CURVES[self.pos[i]]
+            proj[i] = top * np.exp(-decay * (self.pos_rank[i] - 1))
+            proj[i] *= INJURY_DISCOUNT.get(self.injury[i].lower(), 1.0)
+        return proj
+
+    def _replacement_levels(self):
+        """Projection of the first non-starter at each position, league-wide."""
+        ordered = {
+            p: sorted(self.proj[self.pos_code == k].tolist(), reverse=True)
+            for k, p in enumerate(POSITIONS)
+        }
+        used = {p: self.roster.get(p, 0) * self.num_teams for p in POSITIONS}
+        for slot, eligible in FLEX.items():
+            for _ in range(self.roster.get(slot, 0) * self.num_teams):
+                best = max(
+                    eligible,
+                    key=lambda p: (
+                        ordered[p][used[p]] if used[p] < len(ordered[p]) else -1
+                    ),
+                )
+                used[best] += 1
+        return {
+            p: ordered[p][used[p]] if used[p] < len(ordered[p]) else 0.0
+            for p in POSITIONS
+        }
+
+    def _pos_key(self, i):
+        return (int(self.tier[i]), -float(self.vorp[i]), i)
+
+    # ---------- picks ----------
+    def find(self, name, team="", pos=""):
+        if pos == "DEF" and team in self._def_by_team:
+            return self._def_by_team[team]
+        return self._index.get(_norm(name))
+
+    def owner(self, pick_no):
+        """Draft slot (0-based) on the clock for a 1-based snake pick number."""
+        rnd, k = divmod(pick_no - 1, self.num_teams)
+        return k if rnd % 2 == 0 else self.num_teams - 1 - k
+
+    def next_pick(self, slot, after=None):
+        """First pick number after ``after`` that belongs to ``slot``."""
+        pick = (len(self.picks) if after is None else after) + 1
+        while pick <= self.rounds * self.num_teams:
+            if self.owner(pick) == slot:
+                return pick
+            pick += 1
+        return None
+
+    def pick(self, idx):
+        """Remove player ``idx`` from the board in O(1).
+
+        Only the ``available`` flag and counters change; the sorted indexes
+        skip the player lazily the next time they are read.
+        """
+        if idx is None or not self.available[idx]:
+            return False
+        self.available[idx] = False
+        pos = self.pos[idx]
+        self._tier_left[(pos, int(self.tier[idx]))] -= 1
+        if self.vorp[idx] > 0:
+            self.starters_left[pos] -= 1
+        slot = self.owner(len(self.picks) + 1)
+        self.team_counts[slot, self.pos_code[idx]] += 1
+        self.picks.append((len(self.picks) + 1, idx, slot))
+        return True
+
+    def pick_name(self, text):
+        return self.pick(self.find(*parse_pick(text)))
+
+    # ---------- views ----------
+    def _live(self, name, start=None):
+        """Undrafted entries of a sorted index (``"rank"`` or a position).
+
+        Reading from the head advances it past drafted entries for good, so
+        over a draft each entry is skipped there at most once.
+        """
+        lst = self._by_rank if name == "rank" else self._by_pos[name]
+        if start is None:
+            start = self._heads.get(name, 0)
+            while start < len(lst) and not self.available[lst[start][-1]]:
+                start += 1
+            self._heads[name] = start
+        return (e for e in itertools.islice(lst, start, None) if self.available[e[-1]])
+
+    def best(self, n=10):
+        """Top ``n`` available by VORP; drafted entries are dropped lazily.
+
+        Walks the heap as a tree from the root, so drafted entries below the
+        root are stepped over instead of taking a slot in the top ``n``.
+        """
+        heap = self._by_value
+        while heap and not self.available[heap[0][1]]:
+            heapq.heappop(heap)
+        out, frontier = [], [(heap[0], 0)] if heap else []
+        while frontier and len(out) < n:
+            (_, i), j = heapq.heappop(frontier)
+            if self.available[i]:
+                out.append(i)
+            for child in (2 * j + 1, 2 * j + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return out
+
+    def cliff(self, pos):
+        """Players left in the position's top tier and the VORP drop after it."""
+        first = next(self._live(pos), None)
+        if first is None:
+            return {"tier": None, "left_in_tier": 0, "drop": 0.0}
+        tier, neg_vorp, _ = first
+        j = bisect.bisect_left(self._by_pos[pos], (tier + 1,))
+        after = next(self._live(pos, j), None)
+        nxt = -after[1] if after else 0.0
+        return {
+            "tier": tier,
+            "left_in_tier": self._tier_left[(pos, tier)],
+            "drop": -neg_vorp - nxt,
+        }
+
+    def scarcity(self, pos):
+        """Share of the position's starter-quality players already drafted."""
+        total = self.starters_total[pos]
+        return 1.0 - self.starters_left[pos] / total if total else 0.0
+
+    def caps(self):
+        """Per-team ceiling on each position, used to model opponents' needs."""
+        bench = self.roster.get("BN", 0)
+        caps = []
+        for p in POSITIONS:
+            flex = sum(self.roster.get(s, 0) for s, e in FLEX.items() if p in e)
+            extra = bench // 2 if p in ("RB", "WR") else (1 if p in ("QB", "TE") else 0)
+            caps.append(self.roster.get(p, 0) + flex + extra)
+        return np.array(caps, dtype=np.int64)
+
+    # ---------- lookahead ----------
+    @metrics.timed("draft_lookahead")
+    def lookahead(self, slot, n_sims=N_SIMS, seed=None):
+        """Simulate opponents' picks until ``slot`` is next on the clock.
+
+        Opponents pick Plackett-Luce style around consensus rank (Gumbel noise
+        on ``-rank / TEMPERATURE``) and skip positions they have filled.
+        Returns survival probability per candidate and the expected best VORP
+        left at each position when our pick arrives.
+        """
+        now = len(self.picks) + 1
+        target = self.next_pick(slot, after=now - 1)
+        if target is None:
+            return {"next_pick": None, "picks_before": 0, "survive": {}, "expected": {}}
+        pickers = [self.owner(p) for p in range(now, target)]
+        m = CANDIDATES * len(pickers) + 12
+        top = itertools.islice(self._live("rank"), m)
+        cands = np.array([i for _, i in top], dtype=np.int64)
+        if not pickers or not len(cands):
+            return {
+                "next_pick": target,
+                "picks_before": 0,
+                "survive": {int(i): 1.0 for i in cands},
+                "expected": {
+                    p: float(-first[1]) if first else 0.0
+                    for p in POSITIONS
+                    for first in [next(self._live(p), None)]
+                },
+            }
+
+        rng = np.random.default_rng(seed)
+        logits = -self.rank[cands] / TEMPERATURE
+        cand_pos = self.pos_code[cands]
+        caps = self.caps()
+        late = target > (self.rounds - 2) * self.num_teams
+        taken = np.zeros((n_sims, len(cands)), dtype=bool)
+        counts = np.broadcast_to(
+            self.team_counts, (n_sims,) + self.team_counts.shape
+        ).copy()
+        rows = np.arange(n_sims)
+        for team in pickers:
+            score = logits + rng.gumbel(size=taken.shape)
+            full = counts[:, team, :][:, cand_pos] >= caps[cand_pos]
+            score[full | taken] = -np.inf
+            if not late:
+                score[:, np.isin(cand_pos, (4, 5))] -= 50.0  # K/DEF wait
+            choice = score.argmax(axis=1)
+            taken[rows, choice] = True
+            counts[rows, team, cand_pos[choice]] += 1
+
+        survive = 1.0 - taken.mean(axis=0)
+        expected, in_pool = {}, set(cands.tolist())
+        for k, p in enumerate(POSITIONS):
+            mask = cand_pos == k
+            # First available outside the candidate pool bounds the fallback.
+            rest = next((i for _, _, i in self._live(p) if i not in in_pool), None)
+            floor = float(self.vorp[rest]) if rest is not None else 0.0
+            if mask.any():
+                vals = np.where(taken[:, mask], -np.inf, self.vorp[cands[mask]])
+                expected[p] = float(np.maximum(vals.max(axis=1), floor).mean())
+            else:
+                expected[p] = floor
+        return {
+            "next_pick": target,
+            "picks_before": len(pickers),
+            "survive": {int(i): float(s) for i, s in zip(cands, survive)},
+            "expected": expected,
+        }
+
+    def recommend(self, slot=None, n=15, n_sims=N_SIMS, seed=None):
+        """Best available with urgency: VORP plus what waiting would cost."""
+        ahead = self.lookahead(slot, n_sims, seed) if slot is not None else None
+        pool = set(self.best(n * 2))
+        if ahead:
+            pool |= {i for i in ahead["survive"] if self.available[i]}
+        rows = []
+        for i in pool:
+            pos, vorp = self.pos[i], float(self.vorp[i])
+            survive = ahead["survive"].get(i, 1.0) if ahead else 1.0
+            loss = max(0.0, vorp - ahead["expected"].get(pos, 0.0)) if ahead else 0.0
+            rows.append(
+                {
+                    "id": f"{self.names[i]}-{pos}{self.pos_rank[i]}",
+                    "name": self.names[i],
+                    "pos": f"{pos}{self.pos_rank[i]}",
+                    "team": self.teams[i],
+                    "rank": int(self.rank[i]),
+                    "tier": int(self.tier[i]),
+                    "proj": round(float(self.proj[i]), 1),
+                    "vorp": round(vorp, 1),
+                    "score": round(vorp + loss * (1.0 - survive), 2),
+                    "survive_to_you": round(100.0 * survive, 1),
+                }
+            )
+        rows.sort(key=lambda r: -r["score"])
+        return rows[:n], ahead
+
+    def board(self, slot=None, n=15, n_sims=N_SIMS, seed=None):
+        """Snapshot in the ``out/draft_board.json`` shape the UI reads."""
+        top, ahead = self.recommend(slot, n, n_sims, seed)
+        made = len(self.picks)
+        return {
+            "picks_so_far": made,
+            "current_round": made // self.num_teams + 1,
+            "your_slot": None if slot is None else slot + 1,
+            "on_clock": self.owner(made + 1) + 1,
+            "next_pick": ahead["next_pick"] if ahead else None,
+            "top": top,
+            "replacement": {p: round(v, 1) for p, v in self.replacement.items()},
+            "cliffs": {p: self.cliff(p) for p in POSITIONS},
+            "scarcity": {p: round(self.scarcity(p), 3) for p in POSITIONS},
+            "waivers": [],
+            "trades": [],
+            "bench_notes": [],
+            "legend_flags": {},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VORP draft engine")
+    parser.add_argument("--slot", type=int, help="Our 1-based draft slot")
+    parser.add_argument("--picks", help="Picks CSV to replay (Pick,Player,...)")
+    parser.add_argument("--upto", type=int, help="Replay only the first N picks")
+    parser.add_argument("--sims", type=int, default=N_SIMS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out", default=BOARD_FILE)
+    args = parser.parse_args()
+
+    board = DraftBoard.load()
+    missed = []
+    if args.picks:
+        with open(args.picks, newline="", encoding="utf-8") as f:
+            for row in list(csv.DictReader(f))[: args.upto]:
+                if not board.pick_name(row["Player"]):
+                    missed.append(row["Player"])
+                    # Keep the snake order aligned even for unknown players.
+                    board.picks.append((len(board.picks) + 1, None, None))
+    slot = args.slot - 1 if args.slot else None
+    snapshot = board.board(slot, args.top, args.sims)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(snapshot, f, indent=2)
+    for r in snapshot["top"]:
+        print(
+            f"{r['rank']:>4} {r['name']:<26}{r['pos']:<6}vorp {r['vorp']:>6.1f}  "
+            f"survive {r['survive_to_you']:>5.1f}%  score {r['score']:>6.1f}"
+        )
+    if missed:
+        print(f" Unmatched picks: {', '.join(missed)}")
+    print(f" Saved draft board -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,261 @@
-import utils_core, random
-
-
-def run_general_manager_logic(roster, odds, weather):
-    ideas = []
-    if odds and "data" in odds:
-        ideas.append("Exploit team totals for trade leverage")
-    if weather and weather.get("temp") and weather["temp"] < 40:
-        ideas.append("Acquire dome players")
-    horizon = {"bye_weeks": ["RB1 wk9", "WR2 wk10"], "depth_gaps": ["TE", "DST"]}
-    targets = ["FA_SleeperRB", "FA_BoomWR"]
-    trades = ["Trade BenchWR for RB2", "Float QB for WR swap"]
-    rune_score = random.uniform(0.4, 0.8)
+import os, json, hashlib, threading, itertools
+import numpy as np
+from collections import OrderedDict
+
+import metrics, yahoo_parse, projections, waiver_logic
+
+SCHEDULE_FILE = os.path.join("out", "season_schedule.json")
+WEAK_WEEK = 0.9  # a week projected below this share of the median is weak
+PER_POSITION = 2  # pickup/trade candidates considered per hole position
+MAX_CANDIDATES = 8  # candidates the DP plans over
+MAX_MOVES = 3  # candidates held at once (bench spots the plan may use)
+# Lineup points a move has to beat: an add costs waiver priority or FAAB and
+# a roster spot, a trade also the overpay a partner asks for.
+ADD_COST = 2.0
+TRADE_COST = 12.0
+# A partner only takes a bench player for someone of similar value.
+TRADE_PREMIUM = 1.15
+MEMO_SIZE = 32
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def remaining_weeks(current_week):
+    """Weeks left to plan for: the recorded schedule, else the rest of the season."""
+    try:
+        with open(SCHEDULE_FILE, "r", encoding="utf-8") as f:
+            weeks = sorted({int(w["week"]) for w in json.load(f).get("weeks") or []})
+    except Exception:
+        weeks = []
+    weeks = [w for w in weeks if w >= current_week]
+    return weeks or list(range(current_week, projections.WEEKS + 1))
+
+
+def _with_week(players, points, w):
+    return [{**p, "projection": float(v)} for p, v in zip(players, points[:, w - 1])]
+
+
+def holes(players, points, weeks, starting, replacement):
+    """``{week: [positions]}`` where the best lineup starts someone below replacement."""
+    found = {}
+    for w in weeks:
+        _, lineup = waiver_logic.best_lineup(_with_week(players, points, w), starting)
+        short = []
+        for k, (slot, eligible) in enumerate(starting):
+            floor = min(replacement.get(p, 0.0) for p in eligible)
+            if k not in lineup or lineup[k]["projection"] < floor:
+                short.append(slot)
+        if short:
+            found[w] = short
+    return found
+
+
+def _candidates(pool, hole_positions, owned, kind):
+    """Best ``PER_POSITION`` players per hole position from ``pool``."""
+    out = []
+    for pos in sorted(hole_positions):
+        fits = [
+            p
+            for p in pool
+            if p["id"] not in owned and pos in waiver_logic._positions(p)
+        ]
+        fits.sort(key=lambda p: p["ros"], reverse=True)
+        out.extend({**p, "kind": kind, "fills": pos} for p in fits[:PER_POSITION])
+    return out
+
+
+def plan(players, bench, candidates, points, cand_points, weeks, starting):
+    """Dynamic program over weeks x held candidates.
+
+    A state is the set of candidates on the roster.  Holding ``k`` of them
+    means the ``k`` weakest bench players (``bench`` is sorted by
+    rest-of-season points) were dropped, so a state never shrinks: a held
+    candidate can only be swapped for another.  Each week pays its
+    best-lineup points, and each candidate brought in costs
+    ``ADD_COST``/``TRADE_COST``.  Returns the do-nothing points, the plan's
+    net points and its ``[(week, state)]`` path.
+    """
+    limit = min(MAX_MOVES, len(bench), len(candidates))
+    states = [
+        frozenset(c)
+        for k in range(limit + 1)
+        for c in itertools.combinations(range(len(candidates)), k)
+    ]
+    cost = [ADD_COST if c["kind"] == "add" else TRADE_COST for c in candidates]
+    rank = {i: r for r, i in enumerate(bench)}  # starters are never dropped
+
+    def reward(week_players, week_cands, state):
+        kept = [
+            p
+            for i, p in enumerate(week_players)
+            if rank.get(i, len(bench)) >= len(state)
+        ]
+        return waiver_logic.best_lineup(
+            kept + [week_cands[j] for j in state], starting
+        )[0]
+
+    # value[s]: best net points from this week to the end, entering in state s
+    value = {s: 0.0 for s in states}
+    choice, baseline = {}, 0.0
+    for w in reversed(weeks):
+        week_players = _with_week(players, points, w)
+        week_cands = _with_week(candidates, cand_points, w)
+        pay = {s: reward(week_players, week_cands, s) + value[s] for s in states}
+        baseline += reward(week_players, week_cands, frozenset())
+        nxt = {}
+        for s in states:
+            best, arg = -np.inf, s
+            for t in states:
+                if len(t) < len(s):
+                    continue
+                v = pay[t] - sum(cost[j] for j in t - s)
+                if v > best:
+                    best, arg = v, t
+            nxt[s], choice[(w, s)] = best, arg
+        value = nxt
+    path, state = [], frozenset()
+    for w in weeks:
+        state = choice[(w, state)]
+        path.append((w, state))
+    return baseline, value[frozenset()], path
+
+
+def _moves(path, candidates, players, bench):
+    """Adds, drops and trades along the plan's path, in week order."""
+    moves, held = [], frozenset()
+    for w, state in path:
+        released = [candidates[j] for j in sorted(held - state)]
+        for k, j in enumerate(sorted(state - held)):
+            c = candidates[j]
+            if released:
+                out = released.pop()
+            else:
+                out = players[bench[len(held) + k - len(held - state)]]
+            move = {
+                "week": w,
+                "action": c["kind"],
+                "player": c.get("name") or c["id"],
+                "position": c["fills"],
+            }
+            move["give" if c["kind"] == "trade" else "drop"] = (
+                out.get("name") or out["id"]
+            )
+            moves.append(move)
+        held = state
+    return moves
+
+
+def _roster_hash(*parts):
+    return hashlib.sha1(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def horizon_plan(roster, odds, weather, free_agents=None, opponents=None):
+    """Rest-of-season holes and the cheapest moves to cover them, memoized."""
+    proj = projections.current(odds, weather)
+    players = proj.annotate(yahoo_parse.player_dicts(roster))
+    owned = {p["id"] for p in players}
+    fa = proj.annotate(yahoo_parse.player_dicts(free_agents) if free_agents else [])
+    others = [
+        p
+        for o in (yahoo_parse.opponent_rosters(opponents) if opponents else [])
+        for p in proj.annotate(o["roster"])
+    ]
+    weeks = remaining_weeks(proj.current_week)
+    key = _roster_hash(
+        proj.key,
+        weeks,
+        sorted((p["id"], p.get("status")) for p in players),
+        sorted(p["id"] for p in fa),
+        sorted(p["id"] for p in others),
+    )
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            metrics.inc("gm_plan_memo_total", result="hit")
+            return _memo[key]
+    metrics.inc("gm_plan_memo_total", result="miss")
+
+    slots, _, _ = waiver_logic.league()
+    starting = waiver_logic.starting_slots(slots)
+    points = proj.weekly(players)
+    found = holes(players, points, weeks, starting, proj.replacement)
+    positions = {
+        pos
+        for slots_short in found.values()
+        for slot in slots_short
+        for pos in dict(starting).get(slot, {slot})
+    }
+    _, lineup = waiver_logic.best_lineup(players, starting)
+    starters = {p["id"] for p in lineup.values()}
+    bench = sorted(
+        (i for i, p in enumerate(players) if p["id"] not in starters),
+        key=lambda i: players[i]["ros"],
+    )
+    budget = TRADE_PREMIUM * max((players[i]["ros"] for i in bench), default=0.0)
+    candidates = _candidates(fa, positions, owned, "add")
+    candidates += _candidates(
+        [p for p in others if p["ros"] <= budget], positions, owned, "trade"
+    )
+    # Keep the DP small: the candidates with the most rest-of-season points.
+    candidates = sorted(candidates, key=lambda c: c["ros"], reverse=True)[
+        :MAX_CANDIDATES
+    ]
+    cand_points = proj.weekly(candidates)
+    baseline, best, path = plan(
+        players, bench, candidates, points, cand_points, weeks, starting
+    )
+    totals = {
+        w: round(
+            waiver_logic.best_lineup(_with_week(players, points, w), starting)[0], 2
+        )
+        for w in weeks
+    }
+    median = float(np.median(list(totals.values()))) if totals else 0.0
+    result = {
+        "weeks": weeks,
+        "weekly_points": totals,
+        "weak_weeks": [w for w, v in totals.items() if v < WEAK_WEEK * median],
+        "bye_weeks": [
+            f"{p['name']} wk{p['bye']}"
+            for p in sorted(lineup.values(), key=lambda p: p.get("bye") or 0)
+            if (p.get("bye") or 0) in totals
+        ],
+        "holes": {w: slots_short for w, slots_short in found.items()},
+        "depth_gaps": sorted(positions),
+        "moves": _moves(path, candidates, players, bench),
+        "plan_gain": round(best - baseline, 2),
+    }
+    with _memo_lock:
+        _memo[key] = result
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return result
+
+
+@metrics.timed("gm")
+def run_general_manager_logic(roster, odds, weather, free_agents=None, opponents=None):
+    horizon = horizon_plan(roster, odds, weather, free_agents, opponents)
+    moves = horizon["moves"]
+    targets = list(dict.fromkeys(m["player"] for m in moves if m["action"] == "add"))
+    trades = [
+        f"Week {m['week']}: trade {m['give']} for {m['player']} ({m['position']})"
+        for m in moves
+        if m["action"] == "trade"
+    ]
+    first = horizon["holes"] and min(horizon["holes"])
     return {
         "role": "gm",
         "horizon": horizon,
         "waiver_targets": targets,
         "trade_ideas": trades,
-        "logic": {"rune_score": rune_score},
-        "rationale": "Rune horizon scan of depth, bye weeks, and inefficiencies",
+        "logic": {"plan_gain": horizon["plan_gain"]},
+        "rationale": (
+            f"First lineup hole in week {first}; {len(moves)} moves add "
+            f"{horizon['plan_gain']:.1f} net points over {len(horizon['weeks'])} weeks"
+            if first
+            else f"No lineup holes over the remaining {len(horizon['weeks'])} weeks"
+        ),
     }
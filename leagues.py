@@ -0,0 +1,63 @@
+"""Configured Yahoo teams, so one deployment can serve several leagues.
+
+``YAHOO_TEAM_KEYS`` is a comma-separated list of team keys
+(``461.l.881883.t.4,461.l.90210.t.1``); it defaults to ``YAHOO_TEAM_KEY``.
+The first team is the default for requests that do not name one.  Only
+configured teams can be requested, so a query parameter can never point the
+service at an arbitrary Yahoo resource.
+"""
+
+import os, re
+from dataclasses import dataclass
+
+import utils_core
+
+
+@dataclass(frozen=True, slots=True)
+class Team:
+    key: str
+    league: str
+
+    @property
+    def slug(self):
+        """Filesystem-safe form of the key, for cache and output names."""
+        return re.sub(r"[^\w.-]", "_", self.key)
+
+
+def _league_of(key):
+    return key.rsplit(".t.", 1)[0]
+
+
+def configured():
+    """Every configured team, the default first."""
+    raw = os.getenv("YAHOO_TEAM_KEYS") or utils_core.YAHOO_TEAM_KEY or ""
+    keys = list(dict.fromkeys(k.strip() for k in raw.split(",") if k.strip()))
+    teams = [Team(k, _league_of(k)) for k in keys]
+    if teams and utils_core.YAHOO_LEAGUE_ID and not os.getenv("YAHOO_TEAM_KEYS"):
+        # Single-team setups may still name the league explicitly.
+        teams[0] = Team(teams[0].key, utils_core.YAHOO_LEAGUE_ID)
+    return teams
+
+
+def default():
+    teams = configured()
+    return teams[0] if teams else None
+
+
+def resolve(team=None, league=None):
+    """The configured team for a ``team`` key or ``league`` key, else None.
+
+    With neither, the default team.  A league alone picks the first
+    configured team in it.
+    """
+    teams = configured()
+    if not team and not league:
+        return teams[0] if teams else None
+    for t in teams:
+        if (not team or t.key == team) and (not league or t.league == league):
+            return t
+    return None
+
+
+def is_default(team):
+    return team is None or team == default()
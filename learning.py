@@ -1,23 +1,29 @@
-import numpy as np, random
+import numpy as np, random, metrics
 
 history_memory = []
 
 
-def refine_strategy():
+def load_history():
     global history_memory
     if not history_memory:
         history_memory = [
             {"week": 1, "decision": "safe", "win": True},
             {"week": 2, "decision": "boom", "win": False},
         ]
-    win_rate = np.mean([1 if h["win"] else 0 for h in history_memory])
-    boom_bias = sum(1 for h in history_memory if h["decision"] == "boom")
-    safe_bias = sum(1 for h in history_memory if h["decision"] == "safe")
+    return history_memory
+
+
+@metrics.timed("learning")
+def refine_strategy(history=None):
+    history = history if history is not None else load_history()
+    win_rate = np.mean([1 if h["win"] else 0 for h in history]) if history else 0.0
+    boom_bias = sum(1 for h in history if h["decision"] == "boom")
+    safe_bias = sum(1 for h in history if h["decision"] == "safe")
     adjust = "Shift to boom" if win_rate < 0.5 else "Stay balanced"
     rune_memory = random.uniform(0.4, 0.9)
     return {
         "role": "learning",
-        "history_len": len(history_memory),
+        "history_len": len(history),
         "win_rate": win_rate,
         "bias": {"boom": boom_bias, "safe": safe_bias},
         "logic": {"rune_memory": rune_memory},
@@ -0,0 +1,427 @@
+"""Game-day live scoring: an adaptive poller that pushes deltas over SSE.
+
+One gunicorn worker holds ``out/live/poller.lock`` and polls each configured
+team's matchup and both rosters' weekly player points.  Requests are
+conditional (ETag, else a hash of the body), so unchanged payloads are never
+parsed.  Changed player and team points go out as numbered events appended to
+``out/live/events.ndjson``; every worker streams that file to its SSE
+clients, resuming from ``Last-Event-ID``.  Each open stream holds a worker
+thread, so a worker serves at most ``MAX_STREAMS`` of them and answers 503
+past that; keep it below gunicorn's ``--threads`` so the API stays up.
+
+The interval follows the clock: ``LIVE_INTERVAL`` while an NFL game on the
+slate is in progress (backing off while nothing changes), the time to the
+next kickoff before it, ``IDLE_INTERVAL`` otherwise.  Win probability is
+updated per changed player from what is left of each game: started players
+keep their points plus their projection times the share of their game still
+to play, and only that remaining share carries variance.
+"""
+
+import os, json, math, time, fcntl, logging, threading
+from datetime import datetime, timedelta, timezone
+
+import metrics, quota, utils_core, yahoo_parse, leagues, season_sim, role_graph
+
+LIVE_DIR = os.path.join("out", "live")
+EVENTS_FILE = os.path.join(LIVE_DIR, "events.ndjson")
+STATE_FILE = os.path.join(LIVE_DIR, "state.json")
+LOCK_FILE = os.path.join(LIVE_DIR, "poller.lock")
+LIVE_INTERVAL = float(os.getenv("LIVE_POLL_SECONDS", "20"))
+WARM_INTERVAL = 120.0  # ceiling while games are live but nothing changes
+IDLE_INTERVAL = float(os.getenv("LIVE_IDLE_SECONDS", "900"))
+GAME = timedelta(hours=3, minutes=15)  # kickoff to final whistle, roughly
+MAX_EVENTS_BYTES = 1 << 20  # events file size past which the oldest half is dropped
+STREAM_SECONDS = 300  # SSE response lifetime before the client reconnects
+MAX_STREAMS = int(os.getenv("LIVE_MAX_STREAMS", "4"))  # per worker
+HEARTBEAT = 15.0
+BENCH = {"BN", "IR"}
+
+log = logging.getLogger(__name__)
+_leader = None  # lock file held by this process's poller
+_leader_lock = threading.Lock()
+_streams = threading.BoundedSemaphore(MAX_STREAMS)
+
+
+# ------------------ game clock ------------------
+def _parse_time(value):
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def kickoffs(odds):
+    """``{team abbr: kickoff (UTC)}`` from whichever odds feed is configured."""
+    if not isinstance(odds, dict) or "error" in odds:
+        return {}
+    rows = odds.get("games") or odds.get("data") or []
+    if isinstance(rows, dict):
+        rows = rows.get("data") or rows.get("games") or []
+    found = {}
+    for g in rows if isinstance(rows, list) else []:
+        if not isinstance(g, dict):
+            continue
+        ts = _parse_time(g.get("commence_time") or g.get("DateTimeUTC") or "")
+        if ts is None:
+            continue
+        for side in ("home_team", "away_team", "HomeTeamName", "AwayTeamName"):
+            if g.get(side):
+                found[utils_core.team_abbr(g[side])] = ts
+    return found
+
+
+def remaining(kickoff, now, points=0.0, projection=0.0):
+    """Share of a player's game still to play (1 before kickoff, 0 after)."""
+    if kickoff is not None:
+        return min(1.0, max(0.0, 1.0 - (now - kickoff) / GAME))
+    # No schedule for this team: assume points accrue in step with the clock.
+    if projection <= 0:
+        return 0.0 if points else 1.0
+    return min(1.0, max(0.0, 1.0 - points / projection))
+
+
+# ------------------ win probability ------------------
+class WinProb:
+    """Live win probability of side 0 over side 1, kept up to date per player.
+
+    Each starter contributes its points so far plus ``projection *
+    remaining`` to its side's expected final score.  Variance is the weekly
+    ``season_sim.SCORE_SD`` scaled by the projected share still to play, so
+    the spread collapses as games finish.  ``update`` only touches one
+    player's terms in the running sums.
+    """
+
+    def __init__(self, sd=season_sim.SCORE_SD):
+        self.sd = sd
+        self._players = {}  # key -> (side, points, projection, remaining)
+        self._sums = [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]]  # points, to come, full
+
+    def _apply(self, entry, sign):
+        side, points, projection, frac = entry
+        s = self._sums[side]
+        s[0] += sign * points
+        s[1] += sign * projection * frac
+        s[2] += sign * projection
+
+    def update(self, key, side, points, projection, frac):
+        """Set one player's terms; returns whether anything changed."""
+        entry = (side, float(points), max(0.0, float(projection)), float(frac))
+        old = self._players.get(key)
+        if old == entry:
+            return False
+        if old is not None:
+            self._apply(old, -1.0)
+        self._players[key] = entry
+        self._apply(entry, 1.0)
+        return True
+
+    def keys(self, side):
+        return [k for k, entry in self._players.items() if entry[0] == side]
+
+    def remove(self, key):
+        old = self._players.pop(key, None)
+        if old is not None:
+            self._apply(old, -1.0)
+
+    def expected(self, side):
+        s = self._sums[side]
+        return s[0] + s[1]
+
+    def probability(self):
+        share = sum(s[1] / s[2] for s in self._sums if s[2] > 0)
+        margin = self.expected(0) - self.expected(1)
+        var = self.sd**2 * share
+        if var <= 1e-9:
+            return 1.0 if margin > 0 else 0.0 if margin < 0 else 0.5
+        return 0.5 * (1.0 + math.erf(margin / math.sqrt(2.0 * var)))
+
+
+# ------------------ events ------------------
+def _read_events():
+    try:
+        with open(EVENTS_FILE, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return []
+
+
+def events_since(seq, team=None):
+    """Stored events after ``seq``, optionally for one team only."""
+    return [
+        e
+        for e in _read_events()
+        if e["seq"] > seq and (team is None or e.get("team") == team)
+    ]
+
+
+def _append(events):
+    os.makedirs(LIVE_DIR, exist_ok=True)
+    with open(EVENTS_FILE, "a", encoding="utf-8") as f:
+        for e in events:
+            f.write(json.dumps(e, separators=(",", ":")) + "\n")
+    if os.path.getsize(EVENTS_FILE) > MAX_EVENTS_BYTES:
+        events = _read_events()
+        kept = events[len(events) // 2 :]
+        tmp = f"{EVENTS_FILE}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(e, separators=(",", ":")) + "\n" for e in kept)
+        os.replace(tmp, EVENTS_FILE)
+
+
+def state():
+    """Latest full scoreboard per team, as written by the poller."""
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(snapshot):
+    os.makedirs(LIVE_DIR, exist_ok=True)
+    tmp = f"{STATE_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, STATE_FILE)
+
+
+# ------------------ poller ------------------
+def _roster_path(team_key, week):
+    return f"team/{team_key}/roster;week={week}/players/stats;type=week;week={week}"
+
+
+class Poller:
+    def __init__(self, teams=None):
+        self.teams = teams or leagues.configured()
+        self.seq = max((e["seq"] for e in _read_events()), default=0)
+        self._tags = {}  # path -> (etag, digest)
+        self._rosters = {}  # team key -> players, from the last changed payload
+        self._matchups = {}  # our team key -> (opponent key, status, team points)
+        self._points = {}  # (team key, player key) -> points already pushed
+        self._win = {}  # our team key -> WinProb
+        self._quiet = 0  # live polls in a row without a change
+
+    def _get(self, path):
+        """Payload if it changed since the last poll, else None."""
+        etag, digest = self._tags.get(path, (None, None))
+        payload, etag, digest = utils_core.yahoo_get_if_changed(path, etag, digest)
+        self._tags[path] = (etag, digest)
+        metrics.inc("live_fetch_total", result="changed" if payload else "unchanged")
+        return payload
+
+    def _matchup(self, team, week):
+        payload = self._get(f"team/{team.key}/matchups;week={week}")
+        if payload is not None:
+            for m in yahoo_parse.matchups(payload):
+                keys = [t.key for t in m.teams]
+                if m.week == week and team.key in keys and len(keys) == 2:
+                    opp = keys[1 - keys.index(team.key)]
+                    points = {t.key: t.points for t in m.teams}
+                    self._matchups[team.key] = (opp, m.status, points)
+        return self._matchups.get(team.key)
+
+    def _poll_team(self, team, week, kicks, now):
+        matchup = self._matchup(team, week)
+        if matchup is None:
+            return None
+        opp, status, team_points = matchup
+        win = self._win.setdefault(team.key, WinProb())
+        changed = {}
+        for side, key in enumerate((team.key, opp)):
+            payload = self._get(_roster_path(key, week))
+            if payload is not None:
+                self._rosters[key] = yahoo_parse.roster(payload)
+                present = {p.key for p in self._rosters[key]}
+                for gone in set(win.keys(side)) - present:
+                    win.remove(gone)
+            for p in self._rosters.get(key, ()):
+                if p.selected_position in BENCH:
+                    win.remove(p.key)
+                    continue
+                frac = remaining(kicks.get(p.team), now, p.points, p.projection)
+                win.update(p.key, side, p.points, p.projection, frac)
+                before = self._points.get((key, p.key))
+                if before != p.points:
+                    self._points[(key, p.key)] = p.points
+                    changed[p.key] = {
+                        "team": key,
+                        "name": p.name,
+                        "points": p.points,
+                        "delta": round(p.points - (before or 0.0), 2),
+                    }
+        scores = {
+            k: round(win.expected(0 if k == team.key else 1), 2)
+            for k in (team.key, opp)
+        }
+        return {
+            "team": team.key,
+            "opponent": opp,
+            "week": week,
+            "status": status,
+            "points": team_points,
+            "expected": scores,
+            "win_prob": round(win.probability(), 4),
+            "players": changed,
+        }
+
+    def poll_once(self, now=None, week=None):
+        """Poll every team once; returns the new events (already stored)."""
+        now = now or datetime.now(timezone.utc)
+        kicks = kickoffs(role_graph.shared_input("odds"))
+        previous, snapshot, events = state(), {}, []
+        for team in self.teams:
+            try:
+                team_week = week or utils_core.current_week(league_key=team.league)
+                board = self._poll_team(team, team_week, kicks, now)
+            except Exception as e:
+                metrics.inc("live_poll_errors_total")
+                log.warning(
+                    "Live poll failed", extra={"team": team.key, "error": str(e)}
+                )
+                continue
+            if board is None:
+                continue
+            last = previous.get(team.key) or {}
+            snapshot[team.key] = {k: v for k, v in board.items() if k != "players"}
+            moved = (
+                board["players"]
+                or board["points"] != last.get("points")
+                or abs(board["win_prob"] - (last.get("win_prob") or 0.0)) >= 0.001
+            )
+            if moved:
+                self.seq += 1
+                events.append({"seq": self.seq, "ts": now.isoformat(), **board})
+        if snapshot:
+            _save_state({**previous, **snapshot})
+        if events:
+            _append(events)
+            metrics.inc("live_events_total", len(events))
+        return events
+
+    def interval(self, now, kicks, changed):
+        """Seconds to the next poll, from the slate and whether this one moved."""
+        live = any(k <= now <= k + GAME for k in kicks.values())
+        if live:
+            self._quiet = 0 if changed else self._quiet + 1
+            return min(WARM_INTERVAL, LIVE_INTERVAL * 2 ** min(self._quiet // 3, 3))
+        self._quiet = 0
+        upcoming = [(k - now).total_seconds() for k in kicks.values() if k > now]
+        if upcoming:
+            return max(LIVE_INTERVAL, min(IDLE_INTERVAL, min(upcoming)))
+        return IDLE_INTERVAL
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        with quota.priority("critical"):
+            self._loop(stop)
+
+    def _loop(self, stop):
+        while not stop.is_set():
+            now = datetime.now(timezone.utc)
+            events = self.poll_once(now)
+            kicks = kickoffs(role_graph.shared_input("odds"))
+            wait = self.interval(now, kicks, bool(events))
+            metrics.observe("live_poll_interval_seconds", wait)
+            stop.wait(wait)
+
+
+def ensure_poller():
+    """Start the poller in this process unless another worker already runs it."""
+    global _leader
+    with _leader_lock:
+        if _leader is not None:
+            return True
+        os.makedirs(LIVE_DIR, exist_ok=True)
+        f = open(LOCK_FILE, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        _leader = f
+    threading.Thread(target=Poller().run, name="live-poller", daemon=True).start()
+    log.info("Live poller started", extra={"pid": os.getpid()})
+    return True
+
+
+# ------------------ SSE ------------------
+def _tail(offset, inode):
+    """Events appended after byte ``offset``: ``(events, offset, inode)``.
+
+    Only whole lines are consumed.  A file trimmed by ``_append`` (a new
+    inode) or truncated is read again from the start.
+    """
+    try:
+        with open(EVENTS_FILE, "rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_ino != inode or st.st_size < offset:
+                offset, inode = 0, st.st_ino
+            if st.st_size == offset:
+                return [], offset, inode
+            f.seek(offset)
+            chunk = f.read()
+    except OSError:
+        return [], 0, None
+    end = chunk.rfind(b"\n") + 1
+    events = []
+    for line in chunk[:end].splitlines():
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue
+    return events, offset + end, inode
+
+
+def stream(last_id=0, team=None, seconds=None):
+    """Server-sent events after ``last_id`` for ``seconds``, then a reconnect hint.
+
+    The events file is read once, then only from the last byte offset.
+    """
+    yield f"retry: {int(LIVE_INTERVAL * 1000)}\n\n"
+    deadline = time.monotonic() + (seconds or STREAM_SECONDS)
+    beat = time.monotonic()
+    offset, inode = 0, None
+    while time.monotonic() < deadline:
+        events, offset, inode = _tail(offset, inode)
+        for e in events:
+            if e["seq"] <= last_id or (team is not None and e.get("team") != team):
+                continue
+            last_id = e["seq"]
+            yield f"id: {e['seq']}\nevent: delta\ndata: {json.dumps(e)}\n\n"
+            beat = time.monotonic()
+        if time.monotonic() - beat >= HEARTBEAT:
+            yield ": keepalive\n\n"
+            beat = time.monotonic()
+        time.sleep(1.0)
+
+
+class _Held:
+    """An event stream that gives back its slot once closed or exhausted."""
+
+    def __init__(self, events, release):
+        self._events, self._release = events, release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._events)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        release, self._release = self._release, None
+        if release:
+            self._events.close()
+            release()
+
+
+def open_stream(last_id=0, team=None, seconds=None):
+    """``stream`` holding one of ``MAX_STREAMS`` slots; None when all are taken."""
+    if not _streams.acquire(blocking=False):
+        metrics.inc("live_streams_rejected_total")
+        return None
+    return _Held(stream(last_id, team, seconds), _streams.release)
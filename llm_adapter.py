@@ -2,13 +2,22 @@ import os, httpx
 from anthropic import Anthropic
 from openai import OpenAI
 
+import quota
+
 claude = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 
 
+def _quota(provider, prompt, max_tokens):
+    # Over budget: raise so the next provider in the chain is tried.
+    if not quota.acquire(provider, len(prompt) / 4 + max_tokens):
+        raise RuntimeError(f"quota_exhausted:{provider}")
+
+
 def llm_generate(prompt: str, max_tokens: int = 250) -> str:
     try:
+        _quota("claude", prompt, max_tokens)
         r = claude.messages.create(
             model="claude-3-haiku-20240307",
             max_tokens=max_tokens,
@@ -17,6 +26,7 @@ def llm_generate(prompt: str, max_tokens: int = 250) -> str:
         return r.content[0].text.strip()
     except Exception:
         try:
+            _quota("openai", prompt, max_tokens)
             r = openai.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Load-test the Flask API under gunicorn against stubbed upstreams.
+
+For each worker class (sync, gthread, gevent when installed) a gunicorn
+server is started with the same worker count, then driven open-loop at a
+fixed request rate: latency is measured from each request's scheduled send
+time, so client-side queueing shows up in the percentiles instead of being
+hidden.  Worker saturation comes from the server's own /metrics (busy
+seconds over available worker-slot seconds).  Routes that need Postgres are
+dropped from the mix without ``DATABASE_URL``; skipped routes and worker
+classes are listed in the result file.
+
+    python loadtest.py --rps 20 --concurrency 32 --duration 30 --latency-ms 80
+"""
+import os, sys, json, time, random, argparse, tempfile, threading, subprocess
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+import stub_server
+from bench import percentile, _git_rev, BENCH_DIR
+
+DEFAULT_MIX = {
+    "/api/run/head_coach": 2,
+    "/api/run/gm": 1,
+    "/api/run/waiver": 1,
+    "/api/run/scout": 1,
+    "/api/run/trade": 1,
+    "/api/run/learning": 1,
+    "/api/decree": 1,
+    "/api/history": 2,
+    "/api/alerts": 2,
+}
+# Routes that need Postgres; without DATABASE_URL they only measure a 500.
+DB_ROUTES = ("/api/history",)
+WORKER_CLASSES = ["sync", "gthread", "gevent"]
+
+
+def available(worker_class):
+    if worker_class == "gevent":
+        return importlib.util.find_spec("gevent") is not None
+    return True
+
+
+def start_gunicorn(worker_class, workers, threads, port, env):
+    cmd = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "-w",
+        str(workers),
+        "-k",
+        worker_class,
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--timeout",
+        "120",
+    ]
+    if worker_class == "gthread":
+        cmd += ["--threads", str(threads)]
+    if worker_class == "gevent":
+        cmd += ["--worker-connections", str(threads * 50)]
+    cmd.append("thanos:app")
+    proc = subprocess.Popen(
+        cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"{base}/metrics", timeout=2)
+            return proc, base
+        except Exception:
+            time.sleep(0.25)
+    proc.kill()
+    raise RuntimeError(f"gunicorn ({worker_class}) did not start")
+
+
+def busy_seconds(base):
+    """Sum of server-side request time across all workers, from /metrics."""
+    total = 0.0
+    text = requests.get(f"{base}/metrics", timeout=10).text
+    for line in text.splitlines():
+        if (
+            line.startswith("fantasycpu_http_request_seconds_sum")
+            and "/metrics" not in line
+        ):
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+def drive(base, mix, rps, concurrency, duration, seed=3):
+    rng = random.Random(seed)
+    paths = [p for p, w in mix.items() for _ in range(w)]
+    local = threading.local()
+    samples, lock = [], threading.Lock()
+
+    def one(path, scheduled):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        ok = False
+        try:
+            r = session.get(base + path, timeout=60)
+            ok = r.status_code < 500
+        except Exception:
+            pass
+        with lock:
+            samples.append((path, time.perf_counter() - scheduled, ok))
+
+    start = time.perf_counter()
+    n = int(rps * duration)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(n):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one, rng.choice(paths), scheduled)
+    return samples, time.perf_counter() - start
+
+
+def report(samples, elapsed):
+    def stats(rows):
+        lat = [r[1] * 1000.0 for r in rows]
+        errors = sum(1 for r in rows if not r[2])
+        return {
+            "requests": len(rows),
+            "p50_ms": percentile(lat, 0.50),
+            "p95_ms": percentile(lat, 0.95),
+            "p99_ms": percentile(lat, 0.99),
+            "error_rate": errors / len(rows) if rows else 0.0,
+        }
+
+    out = stats(samples)
+    out["throughput_rps"] = len(samples) / elapsed if elapsed else 0.0
+    out["routes"] = {
+        p: stats([r for r in samples if r[0] == p])
+        for p in sorted({r[0] for r in samples})
+    }
+    return out
+
+
+def run_profile(worker_class, args, env, port):
+    proc, base = start_gunicorn(worker_class, args.workers, args.threads, port, env)
+    try:
+        busy_before = busy_seconds(base)
+        samples, elapsed = drive(
+            base, args.mix, args.rps, args.concurrency, args.duration
+        )
+        busy = busy_seconds(base) - busy_before
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    result = report(samples, elapsed)
+    slots = args.workers * (args.threads if worker_class == "gthread" else 1)
+    result["workers"] = args.workers
+    result["slots"] = slots
+    result["busy_seconds"] = busy
+    # Share of worker time spent serving; near 1.0 means requests are queueing.
+    result["saturation"] = busy / (elapsed * slots) if elapsed else 0.0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thanos API load test")
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--worker-classes", default=",".join(WORKER_CLASSES))
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--endpoints", help="Comma-separated paths (default: mix)")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument(
+        "--out", help="Result file (default out/bench/loadtest_<commit>.json)"
+    )
+    args = parser.parse_args()
+    args.mix = (
+        {p: 1 for p in args.endpoints.split(",")}
+        if args.endpoints
+        else dict(DEFAULT_MIX)
+    )
+    skipped = {}
+    if not os.getenv("DATABASE_URL"):
+        for path in DB_ROUTES:
+            if args.mix.pop(path, None) is not None:
+                skipped[path] = "DATABASE_URL not set"
+                print(f" Skipping {path}: DATABASE_URL not set")
+    if not args.mix:
+        parser.error("no endpoints left to drive")
+
+    stub = stub_server.StubServer(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms
+    ).start()
+    tmp = tempfile.mkdtemp(prefix="fantasycpu_load_")
+    env = dict(os.environ)
+    env.update(stub.env(os.path.join(tmp, "yahoo_token.json")))
+
+    results = {}
+    try:
+        for i, wc in enumerate(args.worker_classes.split(",")):
+            if not available(wc):
+                skipped[wc] = "worker class not installed"
+                print(f" Skipping {wc}: not installed (pip install gevent)")
+                continue
+            env["METRICS_DIR"] = os.path.join(tmp, f"metrics_{wc}")
+            env["ROLE_CACHE_DIR"] = os.path.join(tmp, f"role_cache_{wc}")
+            results[wc] = run_profile(wc, args, env, args.port + i)
+            r = results[wc]
+            print(
+                f"{wc:<8} {r['throughput_rps']:>7.1f} rps  p50 {r['p50_ms']:>8.1f}ms  "
+                f"p95 {r['p95_ms']:>8.1f}ms  p99 {r['p99_ms']:>8.1f}ms  "
+                f"err {r['error_rate']:>6.1%}  saturation {r['saturation']:>5.1%}"
+            )
+    finally:
+        stub.stop()
+
+    payload = {
+        "commit": _git_rev(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            k: getattr(args, k)
+            for k in (
+                "rps",
+                "concurrency",
+                "duration",
+                "workers",
+                "threads",
+                "latency_ms",
+                "jitter_ms",
+            )
+        },
+        "mix": args.mix,
+        "skipped": skipped,
+        "results": results,
+    }
+    path = args.out or os.path.join(BENCH_DIR, f"loadtest_{payload['commit']}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f" Saved load test -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Structured, bounded logging for the API and cron jobs.
+
+``setup(name)`` routes the root logger through a ``QueueHandler`` on a
+bounded queue: the calling thread only filters and enqueues (and drops the
+record, counting it, if the queue is full), while a ``QueueListener`` thread
+formats JSON lines and writes them to ``LOG_DIR/<name>.jsonl``.  Files rotate
+by size or age and rotated files are gzipped, so disk use is capped at about
+``LOG_MAX_BYTES * (LOG_BACKUPS + 1)`` before compression.  Repeats of the
+same rendered message are rate-limited per window and the next record that
+gets through carries the ``suppressed`` count; access loggers (``<name>.access``)
+are exempt, since every request line is wanted.
+"""
+
+import os, sys, json, time, gzip, queue, fcntl, atexit, shutil, logging, threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import metrics
+
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+MAX_AGE_SECS = float(os.getenv("LOG_MAX_AGE_SECS", "86400"))
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+DEDUPE_WINDOW = float(os.getenv("LOG_DEDUPE_WINDOW", "60"))
+DEDUPE_BURST = int(os.getenv("LOG_DEDUPE_BURST", "5"))
+TO_STDERR = os.getenv("LOG_STDERR", "1") == "1"
+ACCESS_SUFFIX = ".access"  # loggers the dedupe filter lets through untouched
+
+# LogRecord attributes that are not user-supplied ``extra`` fields.
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        for k, v in vars(record).items():
+            if k not in _RESERVED and not k.startswith("_"):
+                entry[k] = v
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DedupeFilter(logging.Filter):
+    """Let ``burst`` copies of a message through per window, then count.
+
+    Messages are keyed as rendered, so one template logged with different
+    arguments is not folded together.
+    """
+
+    def __init__(self, window=DEDUPE_WINDOW, burst=DEDUPE_BURST):
+        super().__init__()
+        self.window, self.burst = window, burst
+        self._seen = {}  # (logger, level, message) -> [window start, count]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.name.endswith(ACCESS_SUFFIX):
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = record.created
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = max(0, entry[1] - self.burst) if entry else 0
+                self._seen[key] = [now, 1]
+                if suppressed:
+                    record.suppressed = suppressed
+                if len(self._seen) > 10000:
+                    self._seen.clear()
+                return True
+            entry[1] += 1
+            return entry[1] <= self.burst
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks: a full queue drops the record and counts it."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_dropped_total")
+
+    def prepare(self, record):
+        # Render the message and traceback now, while args are still valid,
+        # but leave JSON formatting to the listener thread.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RotatingJsonFileHandler(RotatingFileHandler):
+    """Size- or age-based rotation with gzip, safe across worker processes.
+
+    Every gunicorn worker writes the same file.  Rotation happens under an
+    ``flock``, and a worker whose file was already rotated by a peer just
+    reopens the new one instead of rotating again.
+    """
+
+    def __init__(
+        self, filename, max_bytes=MAX_BYTES, backups=BACKUPS, max_age=MAX_AGE_SECS
+    ):
+        super().__init__(
+            filename, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+        )
+        self.max_age = max_age
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotate
+
+    def _open(self):
+        self._opened = time.time()
+        return super()._open()
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            return False
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except OSError:
+            current = None
+        if current != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = self._open()
+            return False
+        self.stream.seek(0, 2)
+        if self.maxBytes and self.stream.tell() >= self.maxBytes:
+            return True
+        return bool(self.max_age) and time.time() - self._opened >= self.max_age
+
+    def doRollover(self):
+        with open(self.baseFilename + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # A peer may have rotated while we waited for the lock.
+                if (
+                    os.path.exists(self.baseFilename)
+                    and os.stat(self.baseFilename).st_ino
+                    == os.fstat(self.stream.fileno()).st_ino
+                ):
+                    super().doRollover()
+                else:
+                    self.stream.close()
+                    self.stream = self._open()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _gzip_rotate(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+_listener = None
+
+
+def setup(name, level=LOG_LEVEL):
+    """Install the queue-backed JSON logging for this process (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return logging.getLogger(name)
+    os.makedirs(LOG_DIR, exist_ok=True)
+    formatter = JsonFormatter()
+    handlers = [RotatingJsonFileHandler(os.path.join(LOG_DIR, f"{name}.jsonl"))]
+    if TO_STDERR:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    for h in handlers:
+        h.setFormatter(formatter)
+
+    q = queue.Queue(maxsize=QUEUE_SIZE)
+    qh = DroppingQueueHandler(q)
+    qh.addFilter(DedupeFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [qh]
+    root.setLevel(level)
+    _listener = QueueListener(q, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return logging.getLogger(name)
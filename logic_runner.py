@@ -2,17 +2,19 @@
 import argparse, sys, os, json
 from datetime import datetime
 
-import utils_core, team_logic, general_manager_logic, waiver_logic, scout_logic, learning
-from trade_logic import run_trade_logic
+import role_graph, leagues
 
 OUT_DIR = "out"
+TEAMS_DIR = os.path.join(OUT_DIR, "teams")  # outputs of non-default teams
 os.makedirs(OUT_DIR, exist_ok=True)
 
 
-def save_results(role: str, results: dict):
+def save_results(role: str, results: dict, team=None):
     ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = os.path.join(OUT_DIR, f"{role}_{ts}.json")
+    folder = OUT_DIR if leagues.is_default(team) else os.path.join(TEAMS_DIR, team.slug)
+    filename = os.path.join(folder, f"{role}_{ts}.json")
     try:
+        os.makedirs(folder, exist_ok=True)
         with open(filename, "w", encoding="utf-8") as f:
             json.dump(results, f, indent=2)
         print(f" Saved {role} results -> {filename}")
@@ -20,75 +22,59 @@ def save_results(role: str, results: dict):
         print(f" Could not save {role} results:", e)
 
 
-def run_head_coach():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    results = team_logic.run_head_coach_logic(roster, odds, weather, None)
-    save_results("head_coach", results)
-    return results
+SAVE_AS = {"gm": "general_manager"}
 
 
-def run_general_manager():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    results = general_manager_logic.run_general_manager_logic(roster, odds, weather)
-    save_results("general_manager", results)
-    return results
+def _save(role, results, team=None):
+    save_results(SAVE_AS.get(role, role), results, team)
 
 
-def run_waiver():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    results = waiver_logic.run_waiver_logic(roster, odds, weather)
-    save_results("waiver", results)
-    return results
+def _saver(team):
+    return lambda role, results: _save(role, results, team)
 
 
-def run_scout():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    results = scout_logic.run_scout_logic(roster, odds, weather)
-    save_results("scout", results)
-    return results
+def _run_one(role, team=None):
+    results, _ = role_graph.run([role], on_result=_saver(team), team=team)
+    return results[role]
 
 
-def run_trade():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    results = run_trade_logic(roster, odds, weather)
-    save_results("trade", results)
-    return results
+def run_head_coach(team=None):
+    return _run_one("head_coach", team)
+
+
+def run_general_manager(team=None):
+    return _run_one("gm", team)
+
+
+def run_waiver(team=None):
+    return _run_one("waiver", team)
 
 
-def run_learning():
-    results = learning.refine_strategy()
-    save_results("learning", results)
-    return results
+def run_scout(team=None):
+    return _run_one("scout", team)
 
 
-def run_all():
+def run_trade(team=None):
+    return _run_one("trade", team)
+
+
+def run_learning(team=None):
+    return _run_one("learning", team)
+
+
+def run_all(with_timings=False, team=None):
+    results, timings = role_graph.run(on_result=_saver(team), team=team)
+    return (results, timings) if with_timings else results
+
+
+def run_teams(with_timings=False):
+    """All roles for every configured team, fanned out concurrently."""
+    runs = role_graph.run_teams(
+        on_result=lambda team, role, results: _save(role, results, team)
+    )
     return {
-        "head_coach": run_head_coach(),
-        "gm": run_general_manager(),
-        "waiver": run_waiver(),
-        "scout": run_scout(),
-        "trade": run_trade(),
-        "learning": run_learning(),
+        key: (results, timings) if with_timings else results
+        for key, (results, timings) in runs.items()
     }
 
 
@@ -101,25 +87,41 @@ def main():
     parser.add_argument("--trade", action="store_true", help="Run Trade only")
     parser.add_argument("--learning", action="store_true", help="Run Learning only")
     parser.add_argument("--all", action="store_true", help="Run all roles")
+    parser.add_argument("--team", help="Team key (default: first configured team)")
+    parser.add_argument(
+        "--all-teams", action="store_true", help="Run all roles for every team"
+    )
     args = parser.parse_args()
 
-    if args.hc:
-        run_head_coach()
+    team = None
+    if args.team:
+        team = leagues.resolve(args.team)
+        if team is None:
+            sys.exit(f" Unknown team {args.team}; configure it in YAHOO_TEAM_KEYS")
+
+    if args.all_teams:
+        for key, (_, timings) in run_teams(with_timings=True).items():
+            print(f"== {key}")
+            print(role_graph.format_timings(timings))
+    elif args.hc:
+        run_head_coach(team)
     elif args.gm:
-        run_general_manager()
+        run_general_manager(team)
     elif args.waiver:
-        run_waiver()
+        run_waiver(team)
     elif args.scout:
-        run_scout()
+        run_scout(team)
     elif args.trade:
-        run_trade()
+        run_trade(team)
     elif args.learning:
-        run_learning()
+        run_learning(team)
     elif args.all:
-        run_all()
+        _, timings = run_all(with_timings=True, team=team)
+        print(role_graph.format_timings(timings))
     else:
         print(
-            " Please provide one of: --hc, --gm, --waiver, --scout, --trade, --learning, --all"
+            " Please provide one of: --hc, --gm, --waiver, --scout, --trade, --learning,"
+            " --all, --all-teams"
         )
         sys.exit(1)
 
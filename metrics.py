@@ -0,0 +1,312 @@
+import os, json, time, fcntl, atexit, logging, tempfile, threading, functools
+from contextlib import contextmanager
+from collections import defaultdict
+
+# Each process (gunicorn worker, cron job) keeps its own counters in memory and
+# periodically dumps them to METRICS_DIR/<pid>-<start>.json; /metrics merges
+# the files of live processes and folds those of dead ones into ARCHIVE, so
+# totals never go backwards when a worker is recycled.
+METRICS_DIR = os.getenv(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "fantasycpu_metrics")
+)
+FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_SECS", "2"))
+PREFIX = "fantasycpu_"
+ARCHIVE = "archived.json"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_hists = {}
+_last_flush = 0.0
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1.0, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+    _maybe_flush()
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        h = _hists.get(key)
+        if h is None:
+            h = _hists[key] = {
+                "buckets": [0] * (len(BUCKETS) + 1),
+                "sum": 0.0,
+                "count": 0,
+            }
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                h["buckets"][i] += 1
+                break
+        else:
+            h["buckets"][-1] += 1
+        h["sum"] += value
+        h["count"] += 1
+    _maybe_flush()
+
+
+@contextmanager
+def span(stage, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+
+def timed(stage):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+def timed_upstream(provider):
+    """Record latency and errors of an upstream fetch.
+
+    Errors are exceptions or ``{"error": ...}`` results; unconfigured
+    providers (``missing_*`` errors) never hit the network and are skipped.
+    """
+
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                observe(
+                    "upstream_seconds", time.perf_counter() - start, provider=provider
+                )
+                inc("upstream_errors_total", provider=provider)
+                raise
+            err = result.get("error") if isinstance(result, dict) else None
+            if err and str(err).startswith("missing_"):
+                return result
+            observe("upstream_seconds", time.perf_counter() - start, provider=provider)
+            if err:
+                inc("upstream_errors_total", provider=provider)
+            return result
+
+        return wrapper
+
+    return deco
+
+
+def observe_llm(provider, seconds, tokens_in=0, tokens_out=0, error=False):
+    observe("llm_seconds", seconds, provider=provider)
+    if tokens_in:
+        inc("llm_tokens_total", tokens_in, provider=provider, direction="in")
+    if tokens_out:
+        inc("llm_tokens_total", tokens_out, provider=provider, direction="out")
+    if error:
+        inc("llm_errors_total", provider=provider)
+
+
+def _snapshot():
+    with _lock:
+        return {
+            "counters": [[n, list(l), v] for (n, l), v in _counters.items()],
+            "hists": [
+                [n, list(l), dict(h, buckets=list(h["buckets"]))]
+                for (n, l), h in _hists.items()
+            ],
+        }
+
+
+def _started(pid):
+    """Start time of ``pid`` in clock ticks (Linux); None if it is not running.
+
+    A pid the kernel hands to a new process gets a new start time, so a
+    recycled pid never inherits a dead worker's file.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the parenthesized command name; starttime is field 22.
+            return int(f.read().rsplit(")", 1)[1].split()[19])
+    except FileNotFoundError:
+        return None
+    except OSError:
+        pass  # no procfs: fall back to a liveness check
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except OSError:
+        pass
+    return 0
+
+
+def _file_name(pid=None):
+    pid = pid or os.getpid()
+    return f"{pid}-{_started(pid) or 0}.json"
+
+
+def _alive(name):
+    """Whether a metrics file belongs to a process that is still running."""
+    try:
+        pid, start = map(int, name[: -len(".json")].split("-"))
+    except ValueError:
+        return False  # files from before the start time was recorded
+    started = _started(pid)
+    return started is not None and (started == start or not started or not start)
+
+
+def flush():
+    global _last_flush
+    _last_flush = time.monotonic()
+    path = os.path.join(METRICS_DIR, _file_name())
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump(_snapshot(), f)
+        os.replace(tmp, path)
+    except Exception as e:
+        log.warning("metrics flush failed: %s", e)
+
+
+def _maybe_flush():
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+atexit.register(flush)
+
+
+def _fold(counters, hists, data):
+    for n, labels, v in data.get("counters", []):
+        counters[(n, tuple(map(tuple, labels)))] += v
+    for n, labels, h in data.get("hists", []):
+        key = (n, tuple(map(tuple, labels)))
+        agg = hists.setdefault(
+            key, {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+        )
+        agg["buckets"] = [a + b for a, b in zip(agg["buckets"], h["buckets"])]
+        agg["sum"] += h["sum"]
+        agg["count"] += h["count"]
+
+
+def _read(name):
+    try:
+        with open(os.path.join(METRICS_DIR, name)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        log.warning("unreadable metrics file %s: %s", name, e)
+        return None
+
+
+def _archive(dead):
+    """Fold dead processes' files into ARCHIVE, then delete them; True if done.
+
+    Every metric here is a counter or a histogram, which must keep growing
+    after the process that counted it exits (as in prometheus_client's
+    multiprocess mode); only the per-process file goes away.
+    """
+    counters, hists = defaultdict(float), {}
+    archived = _read(ARCHIVE)
+    if archived is None:
+        return False  # never overwrite an archive we could not read
+    _fold(counters, hists, archived)
+    folded = []
+    for name in dead:
+        data = _read(name)
+        if data is not None:
+            _fold(counters, hists, data)
+        folded.append(name)
+    path = os.path.join(METRICS_DIR, ARCHIVE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(
+            {
+                "counters": [[n, list(l), v] for (n, l), v in counters.items()],
+                "hists": [[n, list(l), h] for (n, l), h in hists.items()],
+            },
+            f,
+        )
+    os.replace(tmp, path)
+    for name in folded:
+        try:
+            os.remove(os.path.join(METRICS_DIR, name))
+        except OSError:
+            pass
+    return True
+
+
+def collect():
+    """Merge the metric files of every process, live or archived, into one snapshot.
+
+    The merge holds an exclusive ``flock``, so a dead worker's file is
+    counted either on its own or in ARCHIVE, never both or neither.
+    """
+    flush()
+    counters, hists = defaultdict(float), {}
+    try:
+        lock = open(os.path.join(METRICS_DIR, ".lock"), "a")
+    except OSError:
+        return counters, hists
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        names = [
+            n for n in os.listdir(METRICS_DIR) if n.endswith(".json") and n != ARCHIVE
+        ]
+        dead = [n for n in names if not _alive(n)]
+        try:
+            if dead and _archive(dead):
+                names = [n for n in names if n not in dead]
+        except OSError as e:
+            log.warning("metrics archive failed: %s", e)
+        for name in [ARCHIVE] + names:
+            data = _read(name)
+            if data:
+                _fold(counters, hists, data)
+    return counters, hists
+
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in items
+    )
+    return "{" + body + "}"
+
+
+def render():
+    """Prometheus text exposition of the merged metrics."""
+    counters, hists = collect()
+    lines, typed = [], set()
+    for (name, labels), v in sorted(counters.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            typed.add(name)
+        lines.append(f"{PREFIX}{name}{_fmt_labels(labels)} {v}")
+    for (name, labels), h in sorted(hists.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            typed.add(name)
+        cum = 0
+        for bound, n in zip(list(BUCKETS) + ["+Inf"], h["buckets"]):
+            cum += n
+            lines.append(
+                f"{PREFIX}{name}_bucket{_fmt_labels(labels, [('le', bound)])} {cum}"
+            )
+        lines.append(f"{PREFIX}{name}_sum{_fmt_labels(labels)} {h['sum']}")
+        lines.append(f"{PREFIX}{name}_count{_fmt_labels(labels)} {h['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,397 @@
+"""Player news: concurrent feed ingestion, near-duplicate folding, player index.
+
+``refresh()`` pulls every feed in ``FEEDS`` (RSS, Atom or JSON Feed, by URL
+or local path) in parallel with conditional GETs, so an unchanged feed costs
+one 304.  Near-identical stories (the same wire item on three sites) are
+folded together when their word shingles overlap by ``NEAR_DUP_JACCARD``;
+MinHash signatures banded for LSH find the candidates.  Every story is
+indexed under each 1-3 word run of its title and summary, which covers every
+player name without a name list.  ``for_players(names, hours)`` therefore
+costs a dict lookup and a bisect per name, however many stories are held.
+
+Stories and per-feed validators persist in ``out/news/store.json`` so a
+restart keeps the window and still sends conditional requests.
+"""
+
+import os, re, json, time, bisect, hashlib, logging, threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import numpy as np
+import requests
+
+import metrics
+from draft_engine import _norm
+
+DEFAULT_FEEDS = (
+    "https://www.espn.com/espn/rss/nfl/news,"
+    "https://www.rotowire.com/rss/news.php?sport=NFL"
+)
+FEEDS = [
+    f.strip() for f in os.getenv("NEWS_FEEDS", DEFAULT_FEEDS).split(",") if f.strip()
+]
+STORE_FILE = os.getenv("NEWS_STORE", os.path.join("out", "news", "store.json"))
+REFRESH_SECS = float(os.getenv("NEWS_TTL", "300"))
+WINDOW_HOURS = 72  # stories older than this are dropped
+FETCH_WORKERS = 8
+TIMEOUT = 8
+SHINGLE = 3  # words per shingle
+# Shingle Jaccard still treated as the same story.  On the paired items in
+# tests/fixtures, syndicated copies (a word inserted, a sentence trimmed, a
+# rewritten headline) score 0.53-0.88 and separate stories about the same
+# player under 0.1.
+NEAR_DUP_JACCARD = 0.4
+NUM_HASHES = 64  # MinHash signature length
+BANDS = 32  # LSH bands of two rows: a 0.4 Jaccard pair shares one 99.6% of the time
+_PRIME = (1 << 31) - 1
+_SEEDS = np.random.default_rng(20250907)
+_A = _SEEDS.integers(1, _PRIME, NUM_HASHES, dtype=np.uint64)
+_B = _SEEDS.integers(0, _PRIME, NUM_HASHES, dtype=np.uint64)
+MAX_NGRAM = 3  # longest name indexed ("Amon-Ra St. Brown" -> 3 words)
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+log = logging.getLogger(__name__)
+_TAGS = re.compile(r"<[^>]+>")
+_WORDS = re.compile(r"[A-Za-z0-9'.-]+")
+
+
+# ------------------ parsing ------------------
+def _when(value):
+    """Epoch seconds for an RFC 822 or ISO 8601 date; None if unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        ts = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def _text(node, *tags):
+    for tag in tags:
+        found = node.find(tag)
+        if found is not None and (found.text or found.get("href")):
+            return (found.text or found.get("href")).strip()
+    return ""
+
+
+def _story(title, url, summary, published, source):
+    summary = _TAGS.sub(" ", summary or "")
+    return {
+        "title": " ".join((title or "").split()),
+        "url": url or "",
+        "summary": " ".join(summary.split())[:500],
+        "published": published,
+        "source": source,
+    }
+
+
+def parse_feed(body, source=""):
+    """Stories from an RSS, Atom or JSON Feed document (bytes or str)."""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    body = body.lstrip("﻿ \t\r\n")
+    if body.startswith(("{", "[")):
+        doc = json.loads(body)
+        items = doc.get("items", []) if isinstance(doc, dict) else doc
+        return [
+            _story(
+                i.get("title"),
+                i.get("url") or i.get("link"),
+                i.get("content_text") or i.get("summary") or i.get("content_html"),
+                _when(i.get("date_published") or i.get("published")),
+                source,
+            )
+            for i in items
+            if isinstance(i, dict)
+        ]
+    root = ET.fromstring(body)
+    if root.tag == f"{ATOM}feed":
+        return [
+            _story(
+                _text(e, f"{ATOM}title"),
+                _text(e, f"{ATOM}link"),
+                _text(e, f"{ATOM}summary", f"{ATOM}content"),
+                _when(_text(e, f"{ATOM}published", f"{ATOM}updated")),
+                source,
+            )
+            for e in root.iter(f"{ATOM}entry")
+        ]
+    return [
+        _story(
+            _text(i, "title"),
+            _text(i, "link", "guid"),
+            _text(i, "description"),
+            _when(_text(i, "pubDate")),
+            source,
+        )
+        for i in root.iter("item")
+    ]
+
+
+# ------------------ similarity ------------------
+def _tokens(text):
+    return [t for t in (_norm(w) for w in _WORDS.findall(text or "")) if t]
+
+
+def shingles(text):
+    """``text``'s ``SHINGLE``-word shingles, hashed to ints below ``_PRIME``."""
+    words = _tokens(text)
+    return frozenset(
+        int.from_bytes(
+            hashlib.blake2b(
+                " ".join(words[i : i + SHINGLE]).encode("utf-8"), digest_size=4
+            ).digest(),
+            "big",
+        )
+        % _PRIME
+        for i in range(max(1, len(words) - SHINGLE + 1))
+    )
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def minhash(shingle_set):
+    """``NUM_HASHES`` minimums of ``(a * x + b) mod p`` over the shingles."""
+    x = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    return ((np.outer(x, _A) + _B) % _PRIME).min(axis=0)
+
+
+def _bands(signature):
+    rows = NUM_HASHES // BANDS
+    return [(b, signature[b * rows : (b + 1) * rows].tobytes()) for b in range(BANDS)]
+
+
+def _keys(text):
+    """Index keys for every 1..MAX_NGRAM word run, normalized like player names."""
+    words = _tokens(text)
+    return {
+        "".join(words[i : i + n])
+        for n in range(1, MAX_NGRAM + 1)
+        for i in range(len(words) - n + 1)
+    }
+
+
+# ------------------ index ------------------
+class Index:
+    """Recent stories, folded by shingle overlap and indexed by name n-grams."""
+
+    def __init__(self, stories=()):
+        self.stories = {}  # id -> story
+        self._shingles = {}  # id -> shingles
+        self._story_bands = {}  # id -> LSH bands of its signature
+        self._bands = {}  # (band, value) -> {id}
+        self._by_key = {}  # key -> [(published, id)] ascending
+        for s in stories:
+            self.add(s)
+
+    @staticmethod
+    def story_id(story):
+        raw = story.get("url") or story.get("title") or ""
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    def _near(self, shingle_set, bands):
+        checked = set()
+        for band in bands:
+            for sid in self._bands.get(band, ()):
+                if sid in checked:
+                    continue
+                checked.add(sid)
+                if jaccard(shingle_set, self._shingles[sid]) >= NEAR_DUP_JACCARD:
+                    return sid
+        return None
+
+    def add(self, story):
+        """Index a story; returns False if it is a copy of one already held."""
+        sid = story.get("id") or self.story_id(story)
+        if sid in self.stories:
+            return False
+        text = f"{story.get('title', '')} {story.get('summary', '')}"
+        shingle_set = shingles(text)
+        bands = _bands(minhash(shingle_set))
+        dup = self._near(shingle_set, bands)
+        if dup is not None:
+            sources = self.stories[dup].setdefault("sources", [])
+            if story.get("source") and story["source"] not in sources:
+                sources.append(story["source"])
+            metrics.inc("news_stories_total", result="duplicate")
+            return False
+        story = {**story, "id": sid, "published": story.get("published") or time.time()}
+        self.stories[sid], self._shingles[sid] = story, shingle_set
+        self._story_bands[sid] = bands
+        for band in bands:
+            self._bands.setdefault(band, set()).add(sid)
+        for key in _keys(text):
+            bisect.insort(self._by_key.setdefault(key, []), (story["published"], sid))
+        metrics.inc("news_stories_total", result="new")
+        return True
+
+    def expire(self, cutoff):
+        """Drop stories published before ``cutoff`` (epoch seconds)."""
+        old = {sid for sid, s in self.stories.items() if s["published"] < cutoff}
+        if not old:
+            return 0
+        for sid in old:
+            for band in self._story_bands.pop(sid):
+                self._bands[band].discard(sid)
+                if not self._bands[band]:
+                    del self._bands[band]
+            del self.stories[sid], self._shingles[sid]
+        for key in list(self._by_key):
+            entries = self._by_key[key]
+            del entries[: bisect.bisect_left(entries, (cutoff, ""))]
+            if not entries:
+                del self._by_key[key]
+        return len(old)
+
+    def for_players(self, names, hours=24, now=None):
+        """``{name: [stories newest first]}`` from the last ``hours``."""
+        cutoff = (now or time.time()) - hours * 3600
+        found = {}
+        for name in names:
+            entries = self._by_key.get(_norm(name)) if name else None
+            if not entries:
+                continue
+            recent = entries[bisect.bisect_left(entries, (cutoff, "")) :]
+            if recent:
+                found[name] = [self.stories[sid] for _, sid in reversed(recent)]
+        return found
+
+    def recent(self, hours=24, now=None):
+        cutoff = (now or time.time()) - hours * 3600
+        out = [s for s in self.stories.values() if s["published"] >= cutoff]
+        return sorted(out, key=lambda s: s["published"], reverse=True)
+
+    def version(self):
+        return hashlib.sha1("".join(sorted(self.stories)).encode()).hexdigest()[:12]
+
+
+# ------------------ ingestion ------------------
+_index = Index()
+_feeds = {}  # feed -> {"etag", "modified", "status", "checked"}
+_state_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_loaded = False
+_refreshed = 0.0
+
+
+@metrics.timed_upstream("news_feed")
+def _fetch(feed, state):
+    """``(stories or None if unchanged, new validator state)`` for one feed."""
+    if "://" not in feed or feed.startswith("file://"):
+        path = feed[len("file://") :] if feed.startswith("file://") else feed
+        mtime = str(os.stat(path).st_mtime_ns)
+        if mtime == state.get("modified"):
+            return None, {**state, "status": 304}
+        with open(path, "rb") as f:
+            return parse_feed(f.read(), feed), {"modified": mtime, "status": 200}
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("modified"):
+        headers["If-Modified-Since"] = state["modified"]
+    resp = requests.get(feed, headers=headers, timeout=TIMEOUT)
+    if resp.status_code == 304:
+        return None, {**state, "status": 304}
+    resp.raise_for_status()
+    return parse_feed(resp.content, feed), {
+        "etag": resp.headers.get("ETag"),
+        "modified": resp.headers.get("Last-Modified"),
+        "status": resp.status_code,
+    }
+
+
+def _fetch_feed(feed, state):
+    try:
+        return feed, *_fetch(feed, state)
+    except Exception as e:
+        log.warning("News feed %s failed: %s", feed, e)
+        return feed, None, {**state, "status": "error", "error": str(e)}
+
+
+def _load():
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    try:
+        with open(STORE_FILE, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except Exception:
+        return
+    _feeds.update(saved.get("feeds") or {})
+    for story in saved.get("stories") or []:
+        _index.add(story)
+
+
+def _persist():
+    os.makedirs(os.path.dirname(STORE_FILE) or ".", exist_ok=True)
+    tmp = f"{STORE_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"feeds": _feeds, "stories": list(_index.stories.values())},
+                f,
+                default=str,
+            )
+        os.replace(tmp, STORE_FILE)
+    except Exception as e:
+        log.warning("Could not save news store: %s", e)
+
+
+def refresh(force=False, feeds=None):
+    """Fetch every feed at most once per ``REFRESH_SECS``; returns a summary.
+
+    Concurrent callers wait for the one refresh in flight.
+    """
+    global _refreshed
+    feeds = feeds or FEEDS
+    with _refresh_lock:
+        with _state_lock:
+            _load()
+        if force or time.monotonic() - _refreshed >= REFRESH_SECS or not _refreshed:
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+                results = list(
+                    pool.map(lambda f: _fetch_feed(f, _feeds.get(f, {})), feeds)
+                )
+            with _state_lock:
+                for feed, stories, state in results:
+                    _feeds[feed] = {**state, "checked": time.time()}
+                    for story in stories or ():
+                        _index.add(story)
+                _index.expire(time.time() - WINDOW_HOURS * 3600)
+                _persist()  # validators change even when no story does
+            _refreshed = time.monotonic()
+    return summary()
+
+
+def summary():
+    with _state_lock:
+        return {
+            "version": _index.version(),
+            "stories": len(_index.stories),
+            "feeds": {f: s.get("error") or s.get("status") for f, s in _feeds.items()},
+        }
+
+
+def for_players(names, hours=24, now=None):
+    """Recent stories per player name, from the last refresh."""
+    with _state_lock:
+        _load()
+        return _index.for_players(names, hours, now)
+
+
+def recent(hours=24, now=None):
+    with _state_lock:
+        _load()
+        return _index.recent(hours, now)
@@ -1,20 +1,33 @@
-import utils_core
+import utils_core, yahoo_parse, news
 
+# Long forms plus Yahoo's status codes (O, D, Q).
+ALERT_STATUSES = ["OUT", "DOUBTFUL", "QUESTIONABLE", "IR", "O", "D", "Q"]
+NEWS_HOURS = 24
 
-def get_alerts():
-    roster = utils_core.load_roster()
-    news = utils_core.fetch_news()
+
+def get_alerts(team_key=None):
+    roster = utils_core.load_roster(team_key=team_key)
+    news.refresh()
+    return match_alerts(yahoo_parse.player_dicts(roster))
+
+
+def match_alerts(players, index=None, hours=NEWS_HOURS):
+    """Status and news alerts for ``players``.
+
+    Headlines come from ``index`` (a ``news.Index``), default the shared one.
+    """
+    names = [p.get("name") for p in players if p.get("name")]
+    found = (index or news).for_players(names, hours)
     alerts = []
 
-    for player in roster.get("players", []):
+    for player in players:
         name, status = player.get("name"), player.get("status", "")
-        if status in ["OUT", "DOUBTFUL", "QUESTIONABLE", "IR"]:
+        if status in ALERT_STATUSES:
             alerts.append({"player": name, "status": status})
 
-        for n in news:
-            if name and name in n.get("title", ""):
-                alerts.append(
-                    {"player": name, "headline": n.get("title"), "link": n.get("url")}
-                )
+        for n in found.get(name, ()):
+            alerts.append(
+                {"player": name, "headline": n.get("title"), "link": n.get("url")}
+            )
 
     return {"alerts": alerts, "count": len(alerts)}
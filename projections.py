@@ -0,0 +1,519 @@
+"""Player x week projection matrix shared by every role.
+
+One ``Matrix`` is built per data refresh and holds weekly fantasy points for
+the whole player universe (the draft board plus any Yahoo player a role has
+seen) as a ``(players, weeks)`` array:
+
+    points = baseline * environment * weather * injury * (week != bye)
+
+* baseline: the draft board's rank-curve season projection over
+  ``GAMES`` (or Yahoo's own weekly projection for players off the board);
+* environment: the team's implied total (or, for defenses, the implied total
+  allowed) relative to the league mean, from the recorded season lines
+  (``odds_cache.json`` / ``stats_hub.json``) overlaid with live odds, scaled
+  per position by ``ELASTICITY``;
+* weather: the stats hub's per-team penalty/bonus and live wind, for the
+  current week and the passing game only;
+* injury: the Yahoo status factor, recovering geometrically week over week.
+
+Every factor is a vectorized operation over all players at once.  Roles
+call ``current(odds, weather)`` and read slices: ``week``, ``rest_of_season``
+or ``annotate``, which fills ``projection``/``ros`` on player dicts.
+
+The first worker to build a matrix for a set of inputs publishes it to the
+data plane (``dataplane``) under the input fingerprint; every other worker
+maps those pages instead of rebuilding it.
+"""
+
+import os, json, logging, threading
+from datetime import datetime
+import numpy as np
+
+import metrics, utils_core, sleeper_mirror, dataplane
+from draft_engine import DraftBoard, POSITIONS, _norm
+
+OUT_DIR = "out"
+WEEKS = 18
+GAMES = 17
+# Share of a team's scoring environment swing a position picks up.  Defenses
+# move against the implied total allowed.
+ELASTICITY = {"QB": 1.0, "WR": 0.9, "TE": 0.8, "RB": 0.7, "K": 0.6, "DEF": -0.8}
+# Passing-game share of a weather penalty; backs benefit slightly.
+WEATHER_SHARE = {"QB": 1.0, "WR": 1.0, "TE": 0.8, "RB": -0.3, "K": 1.2, "DEF": -0.5}
+WIND_MPH = 15.0  # wind above this starts costing the passing game
+WIND_PENALTY = 0.01  # per mph above WIND_MPH
+# Yahoo status -> (share of projection this week, share of the gap left the next)
+STATUS = {
+    "Q": (0.85, 0.3),
+    "D": (0.25, 0.5),
+    "O": (0.0, 0.5),
+    "SUSP": (0.0, 0.0),
+    "PUP-R": (0.0, 0.8),
+    "IR": (0.0, 0.85),
+}
+FLOOR_SHARE = 0.8  # off-board players without a projection: share of replacement
+# Files the matrix is built from; a change to any of them forces a rebuild.
+SOURCES = (
+    "stats_hub.json",
+    "odds_cache.json",
+    "draft_results_clean.csv",
+    "ecr.csv",
+    "draft_pool_master.json",
+)
+
+# Data plane dataset the built matrix is shared through; None keeps every
+# matrix private to its process (backtests).
+PLANE = "projections"
+# Fixed-width text columns published with the matrix.
+TEXT = ("names", "pos", "team", "status")
+
+log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_current = None
+
+
+def _load(name):
+    try:
+        with open(os.path.join(OUT_DIR, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _mtime(name):
+    try:
+        return os.stat(os.path.join(OUT_DIR, name)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+# ------------------ odds ------------------
+def _median_point(bookmakers, market, name=None):
+    points = [
+        o.get("point")
+        for b in bookmakers or []
+        for m in b.get("markets") or []
+        if m.get("key") == market
+        for o in m.get("outcomes") or []
+        if o.get("point") is not None and (name is None or o.get("name") == name)
+    ]
+    return float(np.median(points)) if points else None
+
+
+def game_lines(odds):
+    """``[(home, away, total, home spread, week or None)]`` from any odds feed."""
+    if not isinstance(odds, dict) or "error" in odds:
+        return []
+    rows = odds.get("games") or odds.get("data") or []
+    if isinstance(rows, dict):
+        rows = rows.get("data") or rows.get("games") or []
+    lines = []
+    for g in rows if isinstance(rows, list) else []:
+        if not isinstance(g, dict):
+            continue
+        home = g.get("home") or g.get("home_team") or g.get("HomeTeamName")
+        away = g.get("away") or g.get("away_team") or g.get("AwayTeamName")
+        total = g.get("total", g.get("OverUnder"))
+        spread = g.get("spread_home", g.get("HomePointSpread"))
+        if "bookmakers" in g:
+            total = _median_point(g["bookmakers"], "totals", "Over")
+            spread = _median_point(g["bookmakers"], "spreads", home)
+        pregame = g.get("PregameOdds")
+        if total is None and pregame:
+            total = pregame[0].get("OverUnder")
+            spread = pregame[0].get("HomePointSpread")
+        if not home or not away or total is None:
+            continue
+        week = g.get("week") or g.get("Week")
+        if week is None and g.get("commence_time"):
+            try:
+                ts = datetime.fromisoformat(g["commence_time"].replace("Z", "+00:00"))
+                week = utils_core.nfl_week(ts)
+            except ValueError:
+                week = None
+        lines.append(
+            (
+                utils_core.team_abbr(home),
+                utils_core.team_abbr(away),
+                float(total),
+                float(spread or 0.0),
+                int(week) if week else None,
+            )
+        )
+    return lines
+
+
+def environment(teams, season_lines, live_lines, current_week, weeks=WEEKS):
+    """``(own, allowed)`` implied points per (team, week), relative to the mean.
+
+    Season lines set every week's baseline (a team's average across its
+    games); live lines overwrite the week they are for, or the current week
+    when undated.  Teams without lines stay at 1.0.
+    """
+    t_index = {t: i for i, t in enumerate(teams)}
+    own = np.full((len(teams), weeks), np.nan)
+    allowed = np.full((len(teams), weeks), np.nan)
+
+    def implied(lines):
+        rows = []
+        for home, away, total, spread, week in lines:
+            h, a = (total - spread) / 2.0, (total + spread) / 2.0
+            rows.append((home, h, a, week))
+            rows.append((away, a, h, week))
+        return rows
+
+    sums = {}
+    for team, scored, conceded, _ in implied(season_lines):
+        s = sums.setdefault(team, [0.0, 0.0, 0])
+        s[0], s[1], s[2] = s[0] + scored, s[1] + conceded, s[2] + 1
+    for team, (scored, conceded, n) in sums.items():
+        if team in t_index:
+            own[t_index[team]] = scored / n
+            allowed[t_index[team]] = conceded / n
+    for team, scored, conceded, week in implied(live_lines):
+        w = (week or current_week) - 1
+        if team in t_index and 0 <= w < weeks:
+            own[t_index[team], w] = scored
+            allowed[t_index[team], w] = conceded
+
+    mean = np.nanmean(own) if np.isfinite(own).any() else np.nan
+    if not np.isfinite(mean) or mean <= 0:
+        return np.ones_like(own), np.ones_like(allowed)
+    return np.nan_to_num(own / mean, nan=1.0), np.nan_to_num(allowed / mean, nan=1.0)
+
+
+def weather_penalty(teams, hub_weather, live_weather):
+    """Fractional scoring penalty per team for the current week (<0 is a bonus)."""
+    penalty = np.zeros(len(teams))
+    t_index = {t: i for i, t in enumerate(teams)}
+    for team, w in ((hub_weather or {}).get("team_weather") or {}).items():
+        i = t_index.get(utils_core.team_abbr(team))
+        if i is not None and isinstance(w, dict):
+            penalty[i] = float(w.get("penalty") or 0.0) - float(w.get("bonus") or 0.0)
+    if isinstance(live_weather, dict) and "error" not in live_weather:
+        i = t_index.get(utils_core.team_abbr(live_weather.get("team")))
+        wind = live_weather.get("wind")
+        if i is not None and isinstance(wind, (int, float)):
+            penalty[i] = max(penalty[i], WIND_PENALTY * max(0.0, wind - WIND_MPH))
+    return penalty
+
+
+# ------------------ matrix ------------------
+class Matrix:
+    """Weekly projections for every known player; rows never move once added."""
+
+    def __init__(self, board, own, allowed, wx, teams, current_week, hub=None):
+        self._setup(own, allowed, wx, teams, current_week)
+        self.names, self.pos, self.team, self.ids = [], [], [], []
+        self._pos_code = np.zeros(0, dtype=np.int8)
+        self._team_idx = np.zeros(0, dtype=np.int64)
+        self.baseline = np.zeros(0)
+        self.bye = np.zeros(0, dtype=np.int64)
+        self.status = np.zeros(0, dtype=object)
+        self.points = np.zeros((0, WEEKS))
+
+        injuries = ((hub or {}).get("injuries") or {}).get("players") or {}
+        status = {}
+        for name, info in injuries.items():
+            s = info.get("status") if isinstance(info, dict) else info
+            status[_norm(name)] = (s or "").upper()
+        weekly = board.proj / GAMES
+        # Weekly points of a replacement-level starter at each position.
+        self.replacement = {p: board.replacement.get(p, 0.0) / GAMES for p in POSITIONS}
+        self._append(
+            [
+                {
+                    "name": board.names[i],
+                    "pos": board.pos[i],
+                    "team": board.teams[i],
+                    "bye": int(board.bye[i]),
+                    "baseline": float(weekly[i]),
+                    "status": status.get(_norm(board.names[i]), ""),
+                }
+                for i in range(len(board.names))
+            ]
+        )
+
+    def _setup(self, own, allowed, wx, teams, current_week):
+        self.current_week = max(1, min(current_week or 1, WEEKS))
+        self._lock = threading.RLock()  # roles share the matrix across threads
+        self.key = None  # input fingerprint, set by current()
+        self.weeks = np.arange(1, WEEKS + 1)
+        self._own, self._allowed, self._wx = own, allowed, wx
+        self._teams = {t: i for i, t in enumerate(teams)}
+        self._elastic = np.array([ELASTICITY[p] for p in POSITIONS])
+        self._wx_share = np.array([WEATHER_SHARE[p] for p in POSITIONS])
+        self._by_name, self._by_id, self._def_by_team = {}, {}, {}
+
+    def _index(self, start, entries):
+        for k, e in enumerate(entries):
+            self._by_name.setdefault(_norm(e["name"]), start + k)
+            if e["pos"] == "DEF":
+                self._def_by_team.setdefault(utils_core.team_abbr(e["team"]), start + k)
+            if e.get("id"):
+                self._by_id[e["id"]] = start + k
+
+    # ---------- data plane ----------
+    def dataset(self):
+        """``(arrays, meta)`` for ``dataplane.publish``; fixed-width dtypes only."""
+        with self._lock:
+            arrays = {
+                "points": self.points,
+                "baseline": self.baseline,
+                "bye": self.bye,
+                "pos_code": self._pos_code,
+                "team_idx": self._team_idx,
+                "own": self._own,
+                "allowed": self._allowed,
+                "wx": self._wx,
+            }
+            arrays.update(
+                (name, np.array(getattr(self, name), dtype=str)) for name in TEXT
+            )
+            meta = {
+                "current_week": self.current_week,
+                "teams": sorted(self._teams, key=self._teams.get),
+                "replacement": {p: float(v) for p, v in self.replacement.items()},
+                "ids": self.ids,
+            }
+        return arrays, meta
+
+    @classmethod
+    def from_dataset(cls, ds):
+        """A matrix over a mapped dataset, without rebuilding it.
+
+        The numeric arrays stay copy-on-write mappings: rows this worker
+        refreshes become private pages, the rest are shared with every
+        other worker.  Only the name lookups are rebuilt.
+        """
+        a, meta = ds.arrays, ds.meta
+        m = cls.__new__(cls)
+        m._setup(a["own"], a["allowed"], a["wx"], meta["teams"], meta["current_week"])
+        m.replacement = meta["replacement"]
+        m.points, m.baseline, m.bye = a["points"], a["baseline"], a["bye"]
+        m._pos_code, m._team_idx = a["pos_code"], a["team_idx"]
+        m.names, m.pos, m.team = (a[name].tolist() for name in TEXT[:3])
+        m.ids = list(meta["ids"])
+        m.status = a["status"].astype(object)  # compared to str and reassigned
+        m._index(
+            0,
+            [
+                {"name": n, "pos": p, "team": t, "id": i}
+                for n, p, t, i in zip(m.names, m.pos, m.team, m.ids)
+            ],
+        )
+        return m
+
+    # ---------- vectorized rows ----------
+    def _compute(self, rows):
+        pos = self._pos_code[rows]
+        team = self._team_idx[rows]
+        known = team >= 0
+        t = np.where(known, team, 0)
+        is_def = pos == POSITIONS.index("DEF")
+        env = np.where(is_def[:, None], self._allowed[t], self._own[t])
+        env = np.where(known[:, None], env, 1.0)
+        factor = 1.0 + self._elastic[pos][:, None] * (env - 1.0)
+
+        wx = np.ones_like(factor)
+        cw = self.current_week - 1
+        wx[:, cw] = 1.0 - self._wx_share[pos] * np.where(known, self._wx[t], 0.0)
+
+        share, recovery = np.ones(len(rows)), np.zeros(len(rows))
+        for k, s in enumerate(self.status[rows]):
+            share[k], recovery[k] = STATUS.get(s, (1.0, 0.0))
+        ahead = self.weeks - self.current_week
+        gap = (1.0 - share)[:, None] * recovery[:, None] ** np.maximum(ahead, 0)
+        injury = np.where(ahead >= 0, 1.0 - gap, 1.0)  # past weeks are as played
+
+        playing = self.weeks[None, :] != self.bye[rows][:, None]
+        return np.clip(
+            self.baseline[rows][:, None] * factor * wx * injury * playing, 0.0, None
+        )
+
+    def _append(self, entries):
+        if not entries:
+            return
+        start = len(self.names)
+        for e in entries:
+            self.names.append(e["name"])
+            self.pos.append(e["pos"])
+            self.team.append(e["team"])
+            self.ids.append(e.get("id"))
+        self._index(start, entries)
+        self._pos_code = np.concatenate(
+            [self._pos_code, [POSITIONS.index(e["pos"]) for e in entries]]
+        ).astype(np.int8)
+        self._team_idx = np.concatenate(
+            [
+                self._team_idx,
+                [self._teams.get(utils_core.team_abbr(e["team"]), -1) for e in entries],
+            ]
+        ).astype(np.int64)
+        self.baseline = np.concatenate(
+            [self.baseline, [e["baseline"] for e in entries]]
+        )
+        self.bye = np.concatenate([self.bye, [e["bye"] for e in entries]]).astype(
+            np.int64
+        )
+        self.status = np.concatenate(
+            [self.status, np.array([e["status"] for e in entries], dtype=object)]
+        )
+        rows = np.arange(start, len(self.names))
+        self.points = np.vstack([self.points, self._compute(rows)])
+
+    def ensure(self, players):
+        """Add unseen Yahoo players and refresh rows whose status changed."""
+        with self._lock:
+            self._ensure(players)
+
+    def _ensure(self, players):
+        new, changed = [], []
+        for p in players:
+            row = self.row(p)
+            if row is None:
+                # Bare ids (free agents, opponents) get name/team/position
+                # from the local player mirror before falling back to a stub.
+                p = sleeper_mirror.enrich(p)
+                row = self.row(p)
+            status = (p.get("status") or "").upper()
+            if row is None:
+                pos = _position(p)
+                if pos is None:
+                    continue
+                new.append(
+                    {
+                        "id": p.get("id"),
+                        "name": p.get("name") or p.get("id") or "",
+                        "pos": pos,
+                        "team": p.get("team") or "",
+                        "bye": int(p.get("bye") or 0),
+                        "baseline": float(
+                            p.get("projection") or FLOOR_SHARE * self.replacement[pos]
+                        ),
+                        "status": status,
+                    }
+                )
+                continue
+            if p.get("id") and p["id"] not in self._by_id:
+                self._by_id[p["id"]] = row
+            if status != self.status[row]:
+                self.status[row] = status
+                changed.append(row)
+            if not self.bye[row] and p.get("bye"):
+                self.bye[row] = int(p["bye"])
+                changed.append(row)
+        if changed:
+            rows = np.unique(changed)
+            self.points[rows] = self._compute(rows)
+        self._append(new)
+
+    # ---------- slices ----------
+    def row(self, player):
+        """Row for a player dict, Yahoo-style id or name; ``None`` if unknown."""
+        if not isinstance(player, dict):
+            player = {"id": player, "name": player}
+        row = self._by_id.get(player.get("id"))
+        if row is None and _position(player) == "DEF":
+            # Yahoo names defenses by city only; match them by team.
+            row = self._def_by_team.get(utils_core.team_abbr(player.get("team")))
+        if row is None:
+            row = self._by_name.get(_norm(player.get("name")))
+        return row
+
+    def rows(self, players):
+        """Row index per player; -1 for players the matrix does not know."""
+        return np.array(
+            [r if (r := self.row(p)) is not None else -1 for p in players],
+            dtype=np.int64,
+        )
+
+    def week(self, players, week=None):
+        """Projected points for ``players`` in one week (current by default)."""
+        w = (week or self.current_week) - 1
+        rows = self.rows(players)
+        return np.where(rows >= 0, self.points[np.maximum(rows, 0), w], 0.0)
+
+    def rest_of_season(self, players, from_week=None):
+        start = (from_week or self.current_week) - 1
+        rows = self.rows(players)
+        ros = self.points[np.maximum(rows, 0), start:].sum(axis=1)
+        return np.where(rows >= 0, ros, 0.0)
+
+    def weekly(self, players):
+        """``(players, weeks)`` slice; unknown players are all zeros."""
+        rows = self.rows(players)
+        return np.where((rows >= 0)[:, None], self.points[np.maximum(rows, 0)], 0.0)
+
+    def annotate(self, players, week=None):
+        """Copies of player dicts with ``projection``, ``ros`` and ``bye`` filled in."""
+        players = list(players)
+        with self._lock:
+            self._ensure(players)
+            rows = self.rows(players)
+            wk, ros = self.week(players, week), self.rest_of_season(players)
+            byes = np.where(rows >= 0, self.bye[np.maximum(rows, 0)], 0)
+        return [
+            {**p, "projection": v, "ros": r, "bye": p.get("bye") or b}
+            for p, v, r, b in zip(players, wk.tolist(), ros.tolist(), byes.tolist())
+        ]
+
+
+def _position(player):
+    pos = (player.get("position") or player.get("id", "").split("_")[0]).upper()
+    for p in pos.split(","):
+        p = "DEF" if p in ("DST", "D/ST") else p
+        if p in POSITIONS:
+            return p
+    return None
+
+
+@metrics.timed("projections")
+def build(odds=None, weather=None, current_week=None):
+    hub = _load("stats_hub.json") or {}
+    season = game_lines(_load("odds_cache.json")) or game_lines(hub.get("odds"))
+    board = DraftBoard.load()
+    teams = sorted(set(utils_core.TEAM_ABBR.values()))
+    week = current_week or utils_core.current_week()
+    own, allowed = environment(teams, season, game_lines(odds), week)
+    wx = weather_penalty(teams, hub.get("weather"), weather)
+    return Matrix(board, own, allowed, wx, teams, week, hub)
+
+
+def context(current_week=None):
+    """Everything besides odds and weather that a matrix depends on."""
+    return [
+        current_week or utils_core.current_week(),
+        [_mtime(name) for name in SOURCES],
+        # Published matrices outlive this process; a retune must miss.
+        [ELASTICITY, WEATHER_SHARE, STATUS, FLOOR_SHARE, WIND_MPH, WIND_PENALTY],
+    ]
+
+
+def current(odds=None, weather=None, current_week=None):
+    """The shared matrix, rebuilt only when its inputs changed."""
+    global _current
+    import role_graph  # role_graph imports the roles, which import this module
+
+    key = role_graph.fingerprint([odds, weather, context(current_week)])
+    with _lock:
+        if _current is None or _current[0] != key:
+            _current = (key, _shared(key, odds, weather, current_week))
+            _current[1].key = key
+        return _current[1]
+
+
+def _shared(key, odds, weather, current_week):
+    """The matrix for ``key``: mapped if another worker built it, else built and published."""
+    ds = dataplane.load(PLANE, key) if PLANE else None
+    if ds is not None:
+        metrics.inc("projections_matrix_total", result="mapped")
+        return Matrix.from_dataset(ds)
+    matrix = build(odds, weather, current_week)
+    metrics.inc("projections_matrix_total", result="built")
+    if PLANE:
+        try:
+            dataplane.publish(PLANE, *matrix.dataset(), version=key)
+        except OSError as e:
+            log.warning("Could not publish projections: %s", e)
+    return matrix
@@ -0,0 +1,342 @@
+"""Cross-process token buckets for paid upstream APIs.
+
+Every gunicorn worker and the cron job share one SQLite file
+(``out/quota.sqlite``), so a provider's quota is spent once however many
+processes call it.  Each provider has a quota per period (``QUOTAS``,
+overridable with ``QUOTA_<PROVIDER>="500/month"`` or ``"500/month,50"`` to
+set the burst too).  The bucket refills at ``quota / period`` and holds at
+most the burst, which smooths spending; on top of it, a hard cap stops
+grants once the period's quota is spent.  Periods follow the providers'
+resets: calendar minute, hour, day (UTC) and month, ISO week.
+
+Callers have a priority (``priority()`` context, default ``normal``).  Lower
+priorities must leave a share of the burst untouched (``RESERVE``), so a
+game-day lineup still gets odds after the history page has drained what it
+may.  A denied ``limited`` call returns the provider's last good response for
+the same arguments, marked ``"stale": True``, or a ``quota_exhausted`` error
+so the caller's fallback chain moves on.
+"""
+
+import os, json, time, sqlite3, hashlib, logging, functools, threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from contextvars import ContextVar
+
+import metrics
+
+DB_FILE = os.getenv("QUOTA_DB", os.path.join("out", "quota.sqlite"))
+PERIODS = {"minute": 60, "hour": 3600, "day": 86400, "week": 7 * 86400}
+PERIODS["month"] = 30 * PERIODS["day"]
+# provider -> "quota/period"; LLM quotas are in tokens, the rest in requests.
+QUOTAS = {
+    "oddsapi": "500/month",
+    "sportsdataio": "1000/month",
+    "sportsgameodds": "2500/month",
+    "tomorrowio": "500/day",
+    "stormglass": "10/day",
+    "visualcrossing": "1000/day",
+    "openweather": "1000/day",
+    "claude": "300000/day",
+    "openai": "300000/day",
+}
+BURST_SHARE = 0.25  # default burst: a quarter of the period's quota
+# Share of the burst a caller must leave in the bucket.
+RESERVE = {"critical": 0.0, "normal": 0.2, "low": 0.5}
+USAGE_HOURS = 24  # window for the burn rate
+
+log = logging.getLogger(__name__)
+_priority = ContextVar("quota_priority", default="normal")
+_local = threading.local()
+
+
+def set_priority(level):
+    """Set the caller priority for this context; returns a token for ``reset_priority``."""
+    return _priority.set(level if level in RESERVE else "normal")
+
+
+def reset_priority(token):
+    _priority.reset(token)
+
+
+@contextmanager
+def priority(level):
+    """Run the enclosed upstream calls at ``level`` (critical, normal, low)."""
+    token = set_priority(level)
+    try:
+        yield
+    finally:
+        reset_priority(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def limits(provider):
+    """``(quota, period name, burst)`` for a provider, or None if unlimited."""
+    raw = os.getenv(f"QUOTA_{provider.upper()}") or QUOTAS.get(provider)
+    if not raw:
+        return None
+    try:
+        spec, _, burst = raw.partition(",")
+        amount, _, period = spec.partition("/")
+        quota, period = float(amount), period.strip() or "day"
+        if period not in PERIODS:
+            raise KeyError(period)
+        return quota, period, float(burst) if burst else quota * BURST_SHARE
+    except (KeyError, ValueError):
+        log.warning("Bad quota %r for %s; leaving it unlimited", raw, provider)
+        return None
+
+
+def period_bounds(period, now):
+    """``(start, end)`` epoch seconds of the quota period containing ``now``."""
+    t = datetime.fromtimestamp(now, timezone.utc)
+    if period == "month":
+        start = t.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = (start + timedelta(days=32)).replace(day=1)
+        return start.timestamp(), end.timestamp()
+    if period == "week":
+        start = (t - timedelta(days=t.weekday())).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return start.timestamp(), (start + timedelta(days=7)).timestamp()
+    seconds = PERIODS[period]
+    start = now - now % seconds
+    return start, start + seconds
+
+
+# ------------------ store ------------------
+def _db():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DB_FILE) or ".", exist_ok=True)
+        conn = sqlite3.connect(DB_FILE, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "PRAGMA synchronous=NORMAL"
+        )  # WAL stays consistent; only skips fsyncs
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                provider TEXT PRIMARY KEY, tokens REAL, updated REAL);
+            CREATE TABLE IF NOT EXISTS spent (
+                provider TEXT PRIMARY KEY, period_start REAL, used REAL);
+            CREATE TABLE IF NOT EXISTS usage (
+                provider TEXT, hour INTEGER, granted REAL DEFAULT 0,
+                denied INTEGER DEFAULT 0, PRIMARY KEY (provider, hour));
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, provider TEXT, ts REAL, payload TEXT);
+            """
+        )
+        _local.conn = conn
+    return conn
+
+
+def _refill(cur, provider, now, rate, burst):
+    row = cur.execute(
+        "SELECT tokens, updated FROM buckets WHERE provider = ?", (provider,)
+    ).fetchone()
+    if row is None:
+        return burst
+    return min(burst, row[0] + (now - row[1]) * rate)
+
+
+def _spent(cur, provider, start):
+    """Quota used in the period starting at ``start``."""
+    row = cur.execute(
+        "SELECT period_start, used FROM spent WHERE provider = ?", (provider,)
+    ).fetchone()
+    return row[1] if row and row[0] == start else 0.0
+
+
+def _set_spent(cur, provider, start, used):
+    cur.execute(
+        "INSERT OR REPLACE INTO spent (provider, period_start, used) VALUES (?, ?, ?)",
+        (provider, start, used),
+    )
+
+
+def acquire(provider, cost=1.0, level=None):
+    """Take ``cost`` tokens if the caller's priority allows; returns success."""
+    spec = limits(provider)
+    if spec is None:
+        return True
+    quota, period, burst = spec
+    level = level or current_priority()
+    now = time.time()
+    start, _ = period_bounds(period, now)
+    conn = _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        tokens = _refill(conn, provider, now, quota / PERIODS[period], burst)
+        used = _spent(conn, provider, start)
+        granted = (
+            tokens - cost >= RESERVE.get(level, 0.0) * burst and used + cost <= quota
+        )
+        if granted:
+            tokens -= cost
+            _set_spent(conn, provider, start, used + cost)
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (provider, tokens, updated) VALUES (?, ?, ?)",
+            (provider, tokens, now),
+        )
+        conn.execute(
+            "INSERT INTO usage (provider, hour, granted, denied) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (provider, hour) DO UPDATE SET "
+            "granted = granted + excluded.granted, denied = denied + excluded.denied",
+            (provider, int(now // 3600), cost if granted else 0.0, 0 if granted else 1),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    metrics.inc(
+        "quota_requests_total",
+        provider=provider,
+        priority=level,
+        result="granted" if granted else "denied",
+    )
+    return granted
+
+
+def refund(provider, cost=1.0):
+    """Give tokens back for a call that never reached the provider."""
+    spec = limits(provider)
+    if spec is None:
+        return
+    quota, period, burst = spec
+    now = time.time()
+    start, _ = period_bounds(period, now)
+    conn = _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rate = quota / PERIODS[period]
+        tokens = min(burst, _refill(conn, provider, now, rate, burst) + cost)
+        _set_spent(
+            conn, provider, start, max(0.0, _spent(conn, provider, start) - cost)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (provider, tokens, updated) VALUES (?, ?, ?)",
+            (provider, tokens, now),
+        )
+        conn.execute(
+            "UPDATE usage SET granted = max(0, granted - ?) WHERE provider = ? AND hour = ?",
+            (cost, provider, int(now // 3600)),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _response_key(provider, args, kwargs):
+    raw = json.dumps([provider, args, kwargs], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _remember(key, provider, payload):
+    try:
+        _db().execute(
+            "INSERT OR REPLACE INTO responses (key, provider, ts, payload) VALUES (?, ?, ?, ?)",
+            (key, provider, time.time(), json.dumps(payload, default=str)),
+        )
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        log.warning("Could not keep %s response: %s", provider, e)
+
+
+def _recall(key):
+    row = (
+        _db()
+        .execute("SELECT ts, payload FROM responses WHERE key = ?", (key,))
+        .fetchone()
+    )
+    return (row[0], json.loads(row[1])) if row else (None, None)
+
+
+def limited(provider, cost=1.0, cache=True):
+    """Gate an upstream fetch on the provider's bucket.
+
+    ``cost`` may be a callable of the call's arguments (e.g. LLM tokens).
+    Calls that fail with ``missing_*`` never reached the provider and are
+    refunded.  With ``cache``, good dict results are kept and served stale
+    while the bucket is empty.
+    """
+
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            amount = cost(*args, **kwargs) if callable(cost) else cost
+            key = _response_key(provider, args, kwargs) if cache else None
+            if not acquire(provider, amount):
+                ts, payload = _recall(key) if cache else (None, None)
+                if isinstance(payload, dict):
+                    metrics.inc("quota_stale_total", provider=provider)
+                    return {**payload, "stale": True, "stale_since": ts}
+                return {"error": f"quota_exhausted:{provider}"}
+            result = fn(*args, **kwargs)
+            err = result.get("error") if isinstance(result, dict) else None
+            if err and str(err).startswith("missing_"):
+                refund(provider, amount)
+            elif cache and isinstance(result, dict) and not err:
+                _remember(key, provider, result)
+            return result
+
+        return wrapper
+
+    return deco
+
+
+# ------------------ reporting ------------------
+def report(now=None):
+    """Quota left this period, burn rate and projected period use per provider.
+
+    ``hours_to_empty`` is when the current burn rate spends what is left,
+    or None if that is after the period resets.
+    """
+    now = now or time.time()
+    conn = _db()
+    since = int(now // 3600) - USAGE_HOURS + 1
+    burned = dict(
+        conn.execute(
+            "SELECT provider, sum(granted) FROM usage WHERE hour >= ? GROUP BY provider",
+            (since,),
+        ).fetchall()
+    )
+    denied = dict(
+        conn.execute(
+            "SELECT provider, sum(denied) FROM usage WHERE hour >= ? GROUP BY provider",
+            (since,),
+        ).fetchall()
+    )
+    out = {}
+    for provider in sorted(set(QUOTAS) | set(burned)):
+        spec = limits(provider)
+        if spec is None:
+            continue
+        quota, period, burst = spec
+        rate = quota / PERIODS[period]
+        start, end = period_bounds(period, now)
+        used = _spent(conn, provider, start)
+        left = max(0.0, quota - used)
+        reset_hours = (end - now) / 3600
+        burn = (burned.get(provider) or 0.0) / USAGE_HOURS
+        to_empty = left / burn if burn > 0 else None
+        out[provider] = {
+            "quota": quota,
+            "period": period,
+            "used": round(used, 2),
+            "remaining": round(left, 2),
+            "resets_in_hours": round(reset_hours, 1),
+            "burst": burst,
+            "bucket": round(_refill(conn, provider, now, rate, burst), 2),
+            "burn_per_hour": round(burn, 3),
+            "hours_to_empty": (
+                round(to_empty, 1)
+                if to_empty is not None and to_empty < reset_hours
+                else None
+            ),
+            "projected_period_use": round(min(quota, used + burn * reset_hours), 1),
+            "denied_24h": int(denied.get(provider) or 0),
+        }
+    return out
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import os, sys, json, requests
+import os, sys, json, time, requests
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -11,11 +11,12 @@ REFRESH_TOKEN = os.getenv("YAHOO_REFRESH_TOKEN")
 REDIRECT_URI = os.getenv("YAHOO_REDIRECT_URI")
 ENV_PATH = ".env"
 TOKEN_URL = "https://api.login.yahoo.com/oauth2/get_token"
-JSON_PATH = "yahoo_token.json"
+JSON_PATH = os.getenv("YAHOO_TOKEN_FILE", "yahoo_token.json")
 
 
-def refresh():
-    if not (CLIENT_ID and CLIENT_SECRET and REFRESH_TOKEN):
+def refresh(json_path=JSON_PATH, refresh_token=None):
+    refresh_token = refresh_token or REFRESH_TOKEN
+    if not (CLIENT_ID and CLIENT_SECRET and refresh_token):
         return {"error": "Missing CLIENT_ID, CLIENT_SECRET, or REFRESH_TOKEN in .env"}
 
     try:
@@ -25,7 +26,7 @@ def refresh():
             data={
                 "grant_type": "refresh_token",
                 "redirect_uri": REDIRECT_URI,
-                "refresh_token": REFRESH_TOKEN,
+                "refresh_token": refresh_token,
             },
             headers={"Content-Type": "application/x-www-form-urlencoded"},
             timeout=20,
@@ -38,20 +39,23 @@ def refresh():
 
     data = resp.json()
     new_access_token = data.get("access_token")
-    new_refresh_token = data.get("refresh_token", REFRESH_TOKEN)
+    new_refresh_token = data.get("refresh_token", refresh_token)
+    saved = [json_path]
 
-    # Update .env
-    lines = []
-    with open(ENV_PATH, "r") as f:
-        for line in f:
-            if line.startswith("YAHOO_ACCESS_TOKEN="):
-                lines.append(f"YAHOO_ACCESS_TOKEN={new_access_token}\n")
-            elif line.startswith("YAHOO_REFRESH_TOKEN="):
-                lines.append(f"YAHOO_REFRESH_TOKEN={new_refresh_token}\n")
-            else:
-                lines.append(line)
-    with open(ENV_PATH, "w") as f:
-        f.writelines(lines)
+    # Update .env (deployments configure tokens through the environment)
+    if os.path.exists(ENV_PATH):
+        lines = []
+        with open(ENV_PATH, "r") as f:
+            for line in f:
+                if line.startswith("YAHOO_ACCESS_TOKEN="):
+                    lines.append(f"YAHOO_ACCESS_TOKEN={new_access_token}\n")
+                elif line.startswith("YAHOO_REFRESH_TOKEN="):
+                    lines.append(f"YAHOO_REFRESH_TOKEN={new_refresh_token}\n")
+                else:
+                    lines.append(line)
+        with open(ENV_PATH, "w") as f:
+            f.writelines(lines)
+        saved.append(ENV_PATH)
 
     # Save yahoo_token.json
     payload = {
@@ -59,12 +63,16 @@ def refresh():
         "access_token": new_access_token,
         "refresh_token": new_refresh_token,
         "expires_in": data.get("expires_in"),
+        "expires_at": time.time() + float(data.get("expires_in") or 3600),
         "token_type": data.get("token_type"),
     }
-    with open(JSON_PATH, "w") as f:
+    # Write-then-rename so other workers never read a half-written file
+    tmp = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
         json.dump(payload, f, indent=2)
+    os.replace(tmp, json_path)
 
-    return {"status": "ok", "saved_to": [ENV_PATH, JSON_PATH]}
+    return {"status": "ok", "saved_to": saved, "token": payload}
 
 
 if __name__ == "__main__":
@@ -72,4 +80,4 @@ if __name__ == "__main__":
     if "error" in result:
         print("❌", result["error"])
         sys.exit(1)
-    print("✅ Yahoo tokens refreshed and saved:", result)
+    print("✅ Yahoo tokens refreshed and saved:", result["saved_to"])
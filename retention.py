@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""Retention and compaction for run outputs and snapshots.
+
+Everything younger than ``RETENTION_DAYS`` is left alone.  Older than that,
+only the last entry per kind per UTC day survives:
+
+* ``out/<kind>_YYYYMMDD_HHMMSS.json`` (logic_runner) and
+  ``out/cron_logs/snapshot_*.json`` (cron_job): the day's last file is packed
+  into ``out/archive/<kind>/<YYYY-MM>.ndjson.gz`` and every old file is
+  deleted.  Other teams' outputs (``out/teams/<team>/``) are archived as
+  ``<kind>@<team>``.  Files git tracks (recorded fixtures) are never
+  touched, and a day whose last file cannot be read is left in place.
+* ``runs`` and ``snapshots`` rows: superseded rows are deleted in batches of
+  ``BATCH`` so no single statement holds locks for long.  Runs are kept per
+  kind and per team (the payload's ``team``).
+
+Archives are gzip members appended per pass and each line records its
+source file, so an interrupted pass can simply be re-run.  ``history()``
+reads them back for historical queries.
+
+    python retention.py [--days 14] [--dry-run]
+"""
+
+import os, re, sys, json, gzip, argparse, logging, subprocess
+from datetime import datetime, timedelta, timezone
+
+import metrics
+
+OUT_DIR = "out"
+ARCHIVE_DIR = os.path.join(OUT_DIR, "archive")
+SOURCES = (OUT_DIR, os.path.join(OUT_DIR, "cron_logs"))
+TEAMS_DIR = os.path.join(OUT_DIR, "teams")
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "14"))
+BATCH = int(os.getenv("RETENTION_BATCH", "500"))
+STAMPED = re.compile(r"^(?P<kind>[a-z][a-z_]*?)_(?P<ts>\d{8}_\d{6})\.json$")
+TS_FORMAT = "%Y%m%d_%H%M%S"
+
+log = logging.getLogger(__name__)
+
+
+def _cutoff(days):
+    # Whole UTC days only, so a day is never split across two passes.
+    now = datetime.now(timezone.utc)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days)
+
+
+# ------------------ files ------------------
+def _team_sources():
+    try:
+        teams = sorted(os.listdir(TEAMS_DIR))
+    except OSError:
+        return []
+    return [(os.path.join(TEAMS_DIR, t), "@" + t) for t in teams]
+
+
+def _tracked(folders):
+    """Real paths of files git tracks under ``folders``; empty outside a repo."""
+    try:
+        out = subprocess.run(
+            ["git", "ls-files", "-z", "--full-name", "--", *folders],
+            capture_output=True,
+            check=True,
+        ).stdout
+        root = subprocess.run(
+            ["git", "rev-parse", "--show-toplevel"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return set()
+    return {
+        os.path.realpath(os.path.join(root, p))
+        for p in out.decode("utf-8", "replace").split("\0")
+        if p
+    }
+
+
+def stamped_files(sources=SOURCES):
+    """``[(kind, utc datetime, path)]`` for every untracked timestamped output."""
+    found = []
+    folders = [(folder, "") for folder in sources]
+    if sources is SOURCES:
+        folders += _team_sources()
+    tracked = _tracked([f for f, _ in folders if os.path.isdir(f)])
+    for folder, suffix in folders:
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            continue
+        for name in names:
+            m = STAMPED.match(name)
+            path = os.path.join(folder, name)
+            if not m or os.path.realpath(path) in tracked:
+                continue
+            ts = datetime.strptime(m["ts"], TS_FORMAT).replace(tzinfo=timezone.utc)
+            found.append((m["kind"] + suffix, ts, path))
+    return found
+
+
+def _archive_path(kind, ts):
+    return os.path.join(ARCHIVE_DIR, kind, f"{ts:%Y-%m}.ndjson.gz")
+
+
+def _archived(path):
+    """Source file names already packed into an archive."""
+    if not os.path.exists(path):
+        return set()
+    names = set()
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                names.add(json.loads(line)["source"])
+    except (OSError, EOFError, ValueError):
+        # A truncated trailing member from an interrupted pass: keep what
+        # was readable and let the re-pack append the rest again.
+        pass
+    return names
+
+
+def compact_files(days=RETENTION_DAYS, dry_run=False, sources=SOURCES):
+    """Pack each kind's last file per old day into its archive, delete the rest."""
+    cutoff = _cutoff(days)
+    keep, old = {}, []
+    for kind, ts, path in stamped_files(sources):
+        if ts >= cutoff:
+            continue
+        day = (kind, ts.date())
+        old.append((day, path))
+        if day not in keep or ts > keep[day][0]:
+            keep[day] = (ts, path)
+
+    batches = {}
+    for day, (ts, path) in keep.items():
+        batches.setdefault(_archive_path(day[0], ts), []).append((day, ts, path))
+    archived, unreadable = 0, set()
+    for archive, entries in batches.items():
+        done = _archived(archive)
+        lines = []
+        for (kind, _), ts, path in sorted(entries, key=lambda e: e[1]):
+            name = os.path.basename(path)
+            if name in done:
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("Skipping unreadable %s: %s", path, e)
+                unreadable.add((kind, ts.date()))
+                continue
+            record = {"kind": kind, "ts": ts.isoformat(), "source": name, "data": data}
+            lines.append(json.dumps(record, separators=(",", ":"), default=str))
+        if lines and not dry_run:
+            os.makedirs(os.path.dirname(archive), exist_ok=True)
+            with gzip.open(archive, "at", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        archived += len(lines)
+
+    # A day whose last file cannot be read is kept whole until it can.
+    old = [path for day, path in old if day not in unreadable]
+    freed = 0
+    for path in old:
+        try:
+            freed += os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+        except OSError:
+            pass
+    if not dry_run:
+        metrics.inc("retention_files_deleted_total", len(old))
+    return {"files_deleted": len(old), "archived": archived, "bytes_freed": freed}
+
+
+def history(kind, since=None, until=None):
+    """Archived entries of ``kind`` (oldest first), optionally within a range."""
+    folder = os.path.join(ARCHIVE_DIR, kind)
+    try:
+        months = sorted(os.listdir(folder))
+    except OSError:
+        return
+    for name in months:
+        month = name.split(".")[0]
+        if (since and month < f"{since:%Y-%m}") or (until and month > f"{until:%Y-%m}"):
+            continue
+        try:
+            with gzip.open(os.path.join(folder, name), "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    ts = datetime.fromisoformat(entry["ts"])
+                    if (since is None or ts >= since) and (
+                        until is None or ts <= until
+                    ):
+                        yield entry
+        except (OSError, EOFError, ValueError):
+            continue
+
+
+# ------------------ database ------------------
+def table_columns(cur, table):
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = %s",
+        (table,),
+    )
+    return {r[0] for r in cur.fetchall()}
+
+
+def time_column(cols):
+    """SQL expression for a row's timestamp, whichever shape the table has."""
+    if "ts" in cols:
+        return "ts"
+    if "timestamp" in cols:
+        return "to_timestamp(timestamp, 'YYYYMMDD_HH24MISS')"
+    return None
+
+
+def _downsample_sql(table, cols):
+    """DELETE for one batch of superseded rows, given the table's columns.
+
+    ``runs`` and ``snapshots`` exist in two shapes (schema.sql vs. the
+    tables thanos and cron_job create on the fly), so the timestamp and
+    kind expressions are picked from whichever columns are present.
+    """
+    ts = time_column(cols)
+    if ts is None:
+        return None
+    kind = next((f"{c}, " for c in ("kind", "source") if c in cols), "")
+    # Runs of every team share a kind; the team only lives in the payload,
+    # as it does in the file pass's ``kind@team``.
+    team = next((f"{c}->>'team', " for c in ("payload", "json") if c in cols), "")
+    return (
+        f"DELETE FROM {table} WHERE id IN ("
+        f"SELECT id FROM (SELECT id, row_number() OVER ("
+        f"PARTITION BY {kind}{team}date_trunc('day', {ts}) "
+        f"ORDER BY {ts} DESC, id DESC"
+        f") AS rn FROM {table} WHERE {ts} < %s) old WHERE rn > 1 LIMIT %s)"
+    )
+
+
+def compact_db(days=RETENTION_DAYS, dry_run=False, tables=("runs", "snapshots")):
+    """Delete superseded rows older than the retention window, in batches."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        return {}
+    import psycopg2
+
+    cutoff = _cutoff(days).replace(tzinfo=None)
+    deleted = {}
+    conn = psycopg2.connect(url)
+    try:
+        cur = conn.cursor()
+        for table in tables:
+            sql = _downsample_sql(table, table_columns(cur, table))
+            if sql is None:
+                continue
+            if dry_run:
+                count = sql.replace("DELETE FROM", "SELECT count(*) FROM", 1)
+                cur.execute(count.replace(" LIMIT %s", ""), (cutoff,))
+                deleted[table] = cur.fetchone()[0]
+                continue
+            total = 0
+            while True:
+                cur.execute(sql, (cutoff, BATCH))
+                conn.commit()
+                total += cur.rowcount
+                if cur.rowcount < BATCH:
+                    break
+            deleted[table] = total
+            metrics.inc("retention_rows_deleted_total", total, table=table)
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        metrics.inc("db_errors_total", op="retention")
+        log.warning("Retention pass failed: %s", e)
+    finally:
+        conn.close()
+    return deleted
+
+
+def compact(days=RETENTION_DAYS, dry_run=False):
+    return {
+        "files": compact_files(days, dry_run),
+        "rows_deleted": compact_db(days, dry_run),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact old run outputs")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if args.days < 1:
+        sys.exit("--days must be at least 1")
+    print(json.dumps(compact(args.days, args.dry_run), indent=2))
+
+
+if __name__ == "__main__":
+    main()
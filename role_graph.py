@@ -0,0 +1,359 @@
+import os, json, time, logging, hashlib, threading, contextvars
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import metrics, utils_core, dataplane, leagues, news, projections, team_logic, general_manager_logic, waiver_logic, scout_logic, learning
+from trade_logic import run_trade_logic
+
+CACHE_DIR = os.getenv("ROLE_CACHE_DIR", os.path.join("out", "role_cache"))
+MAX_WORKERS = int(os.getenv("ROLE_GRAPH_WORKERS", "6"))
+MAX_TEAMS = int(os.getenv("ROLE_GRAPH_TEAMS", "4"))  # teams run concurrently
+SHARED_TTL = float(os.getenv("SHARED_INPUT_TTL", "300"))
+log = logging.getLogger(__name__)
+
+# League-independent inputs: fetched once and shared by every team (and by
+# later runs in this process) for SHARED_TTL seconds.
+SHARED = {
+    "odds": utils_core.fetch_odds,
+    "weather": utils_core.fetch_weather_data,
+    "history": learning.load_history,
+    # Roles query the news index directly; the version only invalidates them.
+    "news": lambda: {"version": news.refresh()["version"]},
+}
+# Shared inputs published to the data plane, so one worker's fetch serves
+# every worker until SHARED_TTL runs out.
+PUBLISHED = ("odds", "weather")
+# Per-team Yahoo inputs, the only fetches that scale with the number of teams.
+PER_TEAM = {
+    "roster": lambda team: utils_core.load_roster(
+        utils_core.current_week(league_key=team and team.league),
+        team_key=team and team.key,
+    ),
+    "free_agents": lambda team: utils_core.fetch_free_agents(
+        league_key=team and team.league
+    ),
+    "opponents": lambda team: utils_core.load_opponents(
+        utils_core.current_week(league_key=team and team.league),
+        team_key=team and team.key,
+    ),
+    # League adds price competing FAAB bids and count active rivals.
+    "transactions": lambda team: utils_core.fetch_yahoo_transactions(
+        league_key=team and team.league
+    ),
+}
+INPUTS = {**SHARED, **PER_TEAM}
+
+# role -> (declared inputs, callable taking those inputs as keywords)
+ROLES = {
+    "head_coach": (
+        ("roster", "odds", "weather"),
+        lambda roster, odds, weather, **kw: team_logic.run_head_coach_logic(
+            roster, odds, weather, None, **kw
+        ),
+    ),
+    "gm": (
+        ("roster", "odds", "weather", "free_agents", "opponents"),
+        general_manager_logic.run_general_manager_logic,
+    ),
+    "waiver": (
+        ("roster", "odds", "weather", "free_agents", "transactions", "news"),
+        lambda roster, odds, weather, free_agents, transactions, news, **kw: waiver_logic.run_waiver_logic(
+            roster, odds, weather, free_agents, transactions, **kw
+        ),
+    ),
+    "scout": (
+        ("roster", "odds", "weather", "opponents", "news"),
+        lambda roster, odds, weather, opponents, news, **kw: scout_logic.run_scout_logic(
+            roster, odds, weather, opponents, **kw
+        ),
+    ),
+    "trade": (
+        ("roster", "odds", "weather", "free_agents", "opponents"),
+        run_trade_logic,
+    ),
+    "learning": (("history",), learning.refine_strategy),
+}
+
+
+# Keys that change on every upstream call without changing the data itself.
+VOLATILE_KEYS = {
+    "time",
+    "timestamp",
+    "generated_at",
+    "updated",
+    "updated_at",
+    "asof",
+    "copyright",
+    "refresh_rate",
+}
+FLOAT_DIGITS = 6
+
+_memo = {}
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+_lock = threading.Lock()
+_shared = {}  # input -> (expires, value)
+_shared_locks = defaultdict(threading.Lock)
+
+
+def normalize(value):
+    if isinstance(value, dict):
+        return {
+            str(k): normalize(v) for k, v in value.items() if k not in VOLATILE_KEYS
+        }
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, float):
+        return round(value, FLOAT_DIGITS)
+    return value
+
+
+def fingerprint(value):
+    raw = json.dumps(normalize(value), sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def cache_name(role, team=None):
+    """Cache entry for a role; the default team keeps the plain role name."""
+    return role if leagues.is_default(team) else f"{role}@{team.slug}"
+
+
+def _cache_path(role):
+    return os.path.join(CACHE_DIR, f"{role}.json")
+
+
+def load_cached(role, fp):
+    memo = _memo.get(role)
+    if memo and memo[0] == fp:
+        return memo[1]
+    try:
+        with open(_cache_path(role), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except Exception:
+        return None
+    if entry.get("fingerprint") != fp:
+        return None
+    _memo[role] = (fp, entry.get("result"))
+    return entry.get("result")
+
+
+def store_cached(role, fp, result):
+    _memo[role] = (fp, result)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = _cache_path(role) + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fp, "result": result}, f, default=str)
+        os.replace(tmp, _cache_path(role))
+    except Exception as e:
+        log.warning("Could not cache %s results: %s", role, e)
+
+
+def build_graph(roles):
+    """Return {node: deps} for the requested roles and the inputs they need."""
+    graph = {}
+    for role in roles:
+        deps, _ = ROLES[role]
+        graph[role] = tuple(deps)
+        for dep in deps:
+            graph.setdefault(dep, ())
+    return graph
+
+
+def shared_input(name):
+    """A league-independent input, fetched once per SHARED_TTL.
+
+    Concurrent callers (one per team in a fan-out) wait on the same fetch
+    instead of each hitting the upstream.  Errors are not cached.
+    """
+    entry = _shared.get(name)
+    if entry is None or entry[0] <= time.monotonic():
+        with _shared_locks[name]:
+            entry = _shared.get(name)
+            if entry is None or entry[0] <= time.monotonic():
+                value, ttl = None, SHARED_TTL
+                if name in PUBLISHED:
+                    value = dataplane.load_value(name, SHARED_TTL)
+                if value is not None:
+                    # Expire with the worker that fetched it, not later.
+                    ttl -= dataplane.age(name) or 0.0
+                    metrics.inc("shared_input_total", input=name, result="mapped")
+                else:
+                    metrics.inc("shared_input_total", input=name, result="miss")
+                    value = SHARED[name]()
+                    if isinstance(value, dict) and "error" in value:
+                        return value
+                    if name in PUBLISHED:
+                        _publish(name, value)
+                _shared[name] = (time.monotonic() + ttl, value)
+                return value
+    metrics.inc("shared_input_total", input=name, result="hit")
+    return entry[1]
+
+
+def _publish(name, value):
+    try:
+        dataplane.publish_value(name, value)
+    except (OSError, ValueError) as e:
+        log.warning("Could not publish %s: %s", name, e)
+
+
+def _fetch_input(name, team=None):
+    try:
+        return shared_input(name) if name in SHARED else PER_TEAM[name](team)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def clear_cache():
+    _memo.clear()
+    _shared.clear()
+    for name in os.listdir(CACHE_DIR) if os.path.isdir(CACHE_DIR) else []:
+        os.remove(os.path.join(CACHE_DIR, name))
+
+
+def _record(role, hit):
+    with _lock:
+        _stats[role]["hits" if hit else "misses"] += 1
+    metrics.inc("role_cache_total", role=role, result="hit" if hit else "miss")
+
+
+def cache_stats(role=None):
+    with _lock:
+        if role is not None:
+            s = dict(_stats[role])
+        else:
+            s = {
+                "hits": sum(v["hits"] for v in _stats.values()),
+                "misses": sum(v["misses"] for v in _stats.values()),
+            }
+    total = s["hits"] + s["misses"]
+    s["hit_ratio"] = s["hits"] / total if total else 0.0
+    return s
+
+
+def _run_role(role, values, params, team=None):
+    deps, fn = ROLES[role]
+    args = {d: values[d] for d in deps}
+    # Roles read projections.current(odds, weather); its week and source
+    # files are part of the key, so a week rollover misses the cache.
+    fp = fingerprint([role, args, params, projections.context()])
+    # An output computed from a failed fetch is degraded; it is neither
+    # served from nor written to the cache, so the next run retries.
+    failed = any(isinstance(v, dict) and "error" in v for v in args.values())
+    name = cache_name(role, team)
+    cached = None if failed else load_cached(name, fp)
+    _record(role, cached is not None)
+    if cached is not None:
+        return cached, True, fp
+    result = fn(**args, **params)
+    if not failed:
+        store_cached(name, fp, result)
+    return result, False, fp
+
+
+def run(roles=None, on_result=None, params=None, max_workers=MAX_WORKERS, team=None):
+    """Run roles as a DAG over their inputs.
+
+    Inputs are fetched once and shared; a role starts as soon as its inputs
+    are ready, and reuses its cached output when the fingerprint of its
+    normalized inputs and ``params[role]`` is unchanged, so a change to one
+    input only recomputes the roles that declare it.  ``team`` (a
+    ``leagues.Team``, default the configured default) picks whose Yahoo
+    inputs are fetched and whose role cache is used.
+    ``on_result(role, result)`` is called for every role, cached or not, so
+    each run is recorded.  Returns ``(results, timings)``.
+    """
+    roles = list(roles or ROLES)
+    params = params or {}
+    graph = build_graph(roles)
+    values, timings = {}, {}
+    pending, running = dict(graph), {}
+    t0 = time.perf_counter()
+
+    def _task(node):
+        start = time.perf_counter() - t0
+        fp = None
+        if node in INPUTS:
+            out, hit = _fetch_input(node, team), False
+        else:
+            out, hit, fp = _run_role(node, values, params.get(node, {}), team)
+        return out, hit, fp, start, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for node, deps in list(pending.items()):
+                if all(d in values for d in deps):
+                    # Copy the context so quota.priority() reaches the workers.
+                    ctx = contextvars.copy_context()
+                    running[pool.submit(ctx.run, _task, node)] = node
+                    del pending[node]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                node = running.pop(fut)
+                try:
+                    out, hit, fp, start, end = fut.result()
+                except Exception as e:
+                    out, hit, fp, start, end = {"error": str(e)}, False, None, 0.0, 0.0
+                values[node] = out
+                timings[node] = {"start": start, "end": end, "cached": hit}
+                if fp:
+                    timings[node]["fingerprint"] = fp
+                if node in ROLES and on_result:
+                    on_result(node, out)
+
+    timings["_total"] = {"start": 0.0, "end": time.perf_counter() - t0}
+    timings["_critical_path"] = critical_path(graph, timings)
+    return {r: values[r] for r in roles}, timings
+
+
+def run_teams(roles=None, teams=None, on_result=None, params=None, max_teams=MAX_TEAMS):
+    """Fan ``run`` out across teams (default: every configured team).
+
+    Teams run concurrently; shared inputs are fetched once for all of them
+    and only the per-team Yahoo inputs are fetched per team.
+    ``on_result(team, role, result)`` is called for every role's result.
+    Returns ``{team key: (results, timings)}``.
+    """
+    teams = teams or leagues.configured() or [None]
+
+    def _one(team):
+        hook = (lambda role, out: on_result(team, role, out)) if on_result else None
+        return run(roles, on_result=hook, params=params, team=team)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_teams, len(teams)))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _one, t) for t in teams]
+        runs = [f.result() for f in futures]
+    return {(t.key if t else None): r for t, r in zip(teams, runs)}
+
+
+def critical_path(graph, timings):
+    """Walk back from the last node to finish through its latest dependency."""
+    ends = {n: timings[n]["end"] for n in graph if n in timings}
+    if not ends:
+        return []
+    node = max(ends, key=ends.get)
+    path = [node]
+    while graph.get(node):
+        node = max(graph[node], key=lambda d: ends.get(d, 0.0))
+        path.append(node)
+    return list(reversed(path))
+
+
+def format_timings(timings):
+    path = timings.get("_critical_path", [])
+    nodes = [n for n in timings if not n.startswith("_")]
+    nodes.sort(key=lambda n: timings[n]["start"])
+    lines = [f"{'node':<14}{'start':>9}{'dur':>9}  flags"]
+    for n in nodes:
+        t = timings[n]
+        flags = []
+        if n in path:
+            flags.append("critical")
+        if t.get("cached"):
+            flags.append("cached")
+        lines.append(
+            f"{n:<14}{t['start']:>8.3f}s{t['end'] - t['start']:>8.3f}s  {','.join(flags)}"
+        )
+    lines.append(f"critical path: {' -> '.join(path)}")
+    lines.append(f"wall time: {timings['_total']['end']:.3f}s")
+    return "\n".join(lines)
@@ -8,6 +8,7 @@ CREATE TABLE IF NOT EXISTS runs (
     week INT,
     json JSONB
 );
+CREATE INDEX IF NOT EXISTS runs_kind_ts ON runs (kind, ts);
 
 -- Store snapshots of raw API pulls
 CREATE TABLE IF NOT EXISTS snapshots (
@@ -16,6 +17,7 @@ CREATE TABLE IF NOT EXISTS snapshots (
     source TEXT NOT NULL,
     data JSONB
 );
+CREATE INDEX IF NOT EXISTS snapshots_source_ts ON snapshots (source, ts);
 
 -- Opponent surveillance
 CREATE TABLE IF NOT EXISTS opponents (
@@ -26,3 +28,4 @@ CREATE TABLE IF NOT EXISTS opponents (
     moves JSONB,
     tendencies JSONB
 );
+CREATE INDEX IF NOT EXISTS opponents_manager ON opponents (manager);
@@ -1,18 +1,447 @@
-import utils_core, random
+import os, json, logging, threading, utils_core, metrics, yahoo_parse, news
 
+# Per-manager features are folded in incrementally as transactions and
+# roster snapshots arrive, persisted to the ``opponents`` table (one row per
+# update; ``manager`` holds the team key) and mirrored to STATE_FILE so they
+# survive without a database.  Lookups never touch the raw history.
+STATE_FILE = os.getenv("SCOUT_STATE_FILE", os.path.join("out", "scout_profiles.json"))
+RECENT_MOVES = 20
+RISKY_STATUSES = {"Q", "D", "O", "IR", "SUSP", "PUP-R"}
+WEEK_SECS = 7 * 24 * 3600
+NEWS_HOURS = 48  # opponent headlines since the last game day or so
+NEWS_PER_PLAYER = 2
 
-def run_scout_logic(opponent, odds, weather):
-    profile = {"bias": "RB_heavy" if random.random() > 0.5 else "WR_heavy"}
-    tendencies = ["PanicTrades", "IgnoresKickers"]
-    weaknesses = ["ShallowBench", "OverplaysVeterans"]
-    boom_candidates = ["SleeperTE", "WR_Rookie"]
-    rune_focus = random.uniform(0.5, 0.85)
+log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_profiles = None  # team_key -> row
+_loaded_mtime = None  # STATE_FILE mtime _profiles was loaded from or saved as
+_derived = {}  # team_key -> tendencies and labels, rebuilt on every ingest
+_index = {}  # team key, manager nickname or team name (lowercased) -> team_key
+
+
+def _blank(team_key):
+    return {
+        "team_key": team_key,
+        "manager": "",
+        "team": "",
+        "adds": {},
+        "drops": {},
+        "waiver_claims": 0,
+        "fa_adds": 0,
+        "trades": 0,
+        "faab_spent": 0,
+        "faab_bids": 0,
+        "first_ts": 0,
+        "last_ts": 0,
+        "last_keys": [],  # transactions folded at last_ts
+        "lineups": [],
+        "starts": 0,
+        "risky_starts": 0,
+        "suboptimal_starts": 0,
+        "roster": [],
+        "moves": [],
+    }
+
+
+# ------------------ storage ------------------
+def _db_rows():
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        return None
+    try:
+        import psycopg2
+
+        conn = psycopg2.connect(url)
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT DISTINCT ON (manager) manager, roster, moves, tendencies "
+            "FROM opponents ORDER BY manager, ts DESC"
+        )
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        metrics.inc("db_errors_total", op="read")
+        log.warning("Scout profile load failed: %s", e)
+        return None
+    return {
+        key: {
+            **(tendencies or {}).get("counts", {}),
+            "roster": roster or [],
+            "moves": moves or [],
+        }
+        for key, roster, moves, tendencies in rows
+    }
+
+
+def _state_mtime():
+    try:
+        return os.stat(STATE_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load():
+    """Profiles, reloaded whenever another process (cron) has saved new ones."""
+    global _profiles, _loaded_mtime
+    mtime = _state_mtime()
+    if _profiles is not None and mtime == _loaded_mtime:
+        return _profiles
+    _loaded_mtime = mtime
+    rows = _db_rows()
+    if rows is None:
+        try:
+            with open(STATE_FILE, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except Exception:
+            rows = {}
+    _profiles = {}
+    for key, row in rows.items():
+        _profiles[key] = {**_blank(key), **row}
+    _reindex()
+    return _profiles
+
+
+def _reindex():
+    _index.clear()
+    _derived.clear()
+    share = _league_add_share()
+    for key, row in _profiles.items():
+        _derived[key] = tendencies(row, share)
+        for alias in (key, row.get("manager"), row.get("team")):
+            if alias:
+                _index[alias.lower()] = key
+    if _derived:
+        league = {
+            k: sum(t[k] for t in _derived.values()) / len(_derived)
+            for k in ("adds_per_week", "trades_per_week")
+        }
+        for t in _derived.values():
+            t["labels"] = _labels(t, league)
+
+
+def _persist(changed):
+    global _loaded_mtime
+    tmp = f"{STATE_FILE}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(STATE_FILE) or ".", exist_ok=True)
+    with open(tmp, "w") as f:
+        json.dump(_profiles, f)
+    os.replace(tmp, STATE_FILE)
+    _loaded_mtime = _state_mtime()
+
+    url = os.getenv("DATABASE_URL")
+    if not url or not changed:
+        return
+    try:
+        import psycopg2
+
+        conn = psycopg2.connect(url)
+        cur = conn.cursor()
+        for key in changed:
+            row = _profiles[key]
+            counts = {k: v for k, v in row.items() if k not in ("roster", "moves")}
+            # One row per manager: the profile already folds every ingest.
+            cur.execute("DELETE FROM opponents WHERE manager = %s", (key,))
+            cur.execute(
+                "INSERT INTO opponents (manager, roster, moves, tendencies) "
+                "VALUES (%s,%s,%s,%s)",
+                (
+                    key,
+                    json.dumps(row["roster"]),
+                    json.dumps(row["moves"]),
+                    json.dumps({**_derived[key], "counts": counts}),
+                ),
+            )
+        conn.commit()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        metrics.inc("db_errors_total", op="write")
+        log.warning("Scout profile save failed: %s", e)
+
+
+# ------------------ ingest ------------------
+def _row(key, changed):
+    changed.add(key)
+    if key not in _profiles:
+        _profiles[key] = _blank(key)
+    return _profiles[key]
+
+
+def _bump(counter, pos):
+    pos = (pos or "").split(",")[0] or "?"
+    counter[pos] = counter.get(pos, 0) + 1
+
+
+def _fold_transaction(t, changed):
+    if t.status != "successful":
+        return
+    teams = set()
+    for m in t.moves:
+        if m.type == "add" and ".t." in m.destination:
+            row = _row(m.destination, changed)
+            _bump(row["adds"], m.position)
+            if m.source == "waivers":
+                row["waiver_claims"] += 1
+                if t.faab_bid:
+                    row["faab_spent"] += t.faab_bid
+                    row["faab_bids"] += 1
+            else:
+                row["fa_adds"] += 1
+            teams.add(m.destination)
+        elif m.type == "drop" and ".t." in m.source:
+            _bump(_row(m.source, changed)["drops"], m.position)
+            teams.add(m.source)
+        elif m.type == "trade":
+            teams.update(k for k in (m.source, m.destination) if ".t." in k)
+    for key in teams:
+        row = _row(key, changed)
+        if t.type == "trade":
+            row["trades"] += 1
+        row["first_ts"] = min(row["first_ts"] or t.timestamp, t.timestamp)
+        if t.timestamp > row["last_ts"]:
+            row["last_ts"], row["last_keys"] = t.timestamp, [t.key]
+        elif t.timestamp == row["last_ts"]:
+            row["last_keys"].append(t.key)
+        row["moves"] = (
+            [
+                {"ts": t.timestamp, "type": m.type, "player": m.name, "pos": m.position}
+                for m in t.moves
+                if key in (m.source, m.destination)
+            ]
+            + row["moves"]
+        )[:RECENT_MOVES]
+
+
+def _fold_lineup(team, week, changed):
+    """Start/sit counters from one weekly roster snapshot, counted once."""
+    row = _row(team.key, changed)
+    if week in row["lineups"]:
+        return
+    row["lineups"].append(week)
+    row["roster"] = [p.name for p in team.players]
+    starters = [p for p in team.players if p.selected_position not in ("BN", "IR", "")]
+    bench = [p for p in team.players if p.selected_position == "BN"]
+    row["starts"] += len(starters)
+    row["risky_starts"] += sum(1 for p in starters if p.status in RISKY_STATUSES)
+    for p in starters:
+        better = any(
+            _score(b) > _score(p) and p.selected_position in b.eligible for b in bench
+        )
+        row["suboptimal_starts"] += better
+
+
+def _score(player):
+    # Scored points once the week has stats, the projection before that.
+    return player.points or player.projection
+
+
+def _roster_week(payload):
+    """Roster week of a team or league ``teams/roster`` payload; 0 if absent."""
+    try:
+        content = payload["fantasy_content"]
+        if "team" in content:
+            return int(content["team"][1]["roster"]["week"])
+        teams = content["league"][1]["teams"]
+        first = next(v["team"] for k, v in teams.items() if k.isdigit())
+        return int(first[1]["roster"]["week"])
+    except (KeyError, IndexError, TypeError, ValueError, StopIteration):
+        return 0
+
+
+def _roster_teams(payload):
+    if isinstance(payload, dict) and "league" in payload.get("fantasy_content", {}):
+        return yahoo_parse.teams(payload)
+    team = yahoo_parse.team(payload)
+    return (team,) if team else ()
+
+
+def _seen(t, watermark):
+    """Whether a transaction was folded in by an earlier ingest."""
+    for k in {m.destination for m in t.moves} | {m.source for m in t.moves}:
+        if k in watermark:
+            ts, keys = watermark[k]
+            if t.timestamp < ts or (t.timestamp == ts and t.key in keys):
+                return True
+    return False
+
+
+def ingest(transactions=None, rosters=(), teams=None):
+    """Fold new league activity into the per-manager rows and persist them.
+
+    ``rosters`` holds team roster payloads or league ``teams/roster``
+    payloads (one call for every team).  Transactions already folded (by
+    timestamp, and by key at a manager's latest timestamp) and roster weeks
+    already seen are skipped, so the full league history can be passed in
+    repeatedly without double counting.
+    """
+    with _lock:
+        _load()
+        changed = set()
+        for t in yahoo_parse.teams(teams) if teams else ():
+            row = _row(t.key, changed)
+            row["manager"], row["team"] = t.manager, t.name
+        watermark = {
+            k: (r["last_ts"], set(r.get("last_keys") or ()))
+            for k, r in _profiles.items()
+        }
+        for t in yahoo_parse.transactions(transactions) if transactions else ():
+            if not _seen(t, watermark):
+                _fold_transaction(t, changed)
+        for payload in rosters or ():
+            week = _roster_week(payload)
+            for team in _roster_teams(payload):
+                row = _row(team.key, changed)
+                row["manager"] = team.manager or row["manager"]
+                row["team"] = team.name or row["team"]
+                if week:
+                    _fold_lineup(team, week, changed)
+        if changed:
+            _reindex()
+            _persist(changed)
+        return sorted(changed)
+
+
+# ------------------ features ------------------
+def _league_add_share():
+    totals = {}
+    for row in _profiles.values():
+        for pos, n in row["adds"].items():
+            totals[pos] = totals.get(pos, 0) + n
+    count = sum(totals.values())
+    return {pos: n / count for pos, n in totals.items()} if count else {}
+
+
+def tendencies(row, league_share=None):
+    """Derived features for one manager row."""
+    league_share = league_share if league_share is not None else _league_add_share()
+    adds = sum(row["adds"].values())
+    span = max(row["last_ts"] - row["first_ts"], 0)
+    weeks = max(1.0, span / WEEK_SECS)
+    bias = (
+        {
+            pos: round(n / adds - league_share.get(pos, 0.0), 3)
+            for pos, n in row["adds"].items()
+        }
+        if adds
+        else {}
+    )
+    starts = row["starts"] or 1
+    return {
+        "position_bias": bias,
+        "favorite_position": max(bias, key=bias.get) if bias else None,
+        "trades_per_week": round(row["trades"] / weeks, 3),
+        "adds_per_week": round(adds / weeks, 3),
+        "waiver_share": round(row["waiver_claims"] / adds, 3) if adds else 0.0,
+        "avg_faab_bid": (
+            round(row["faab_spent"] / row["faab_bids"], 2) if row["faab_bids"] else 0.0
+        ),
+        "risky_start_rate": round(row["risky_starts"] / starts, 3),
+        "suboptimal_start_rate": round(row["suboptimal_starts"] / starts, 3),
+        "weeks_observed": len(row["lineups"]),
+    }
+
+
+def _labels(t, league):
+    labels = []
+    if t["adds_per_week"] > 1.5 * league["adds_per_week"] and t["adds_per_week"] > 0:
+        labels.append("WaiverHawk")
+    if t["adds_per_week"] == 0 and league["adds_per_week"] > 0:
+        labels.append("SetAndForget")
+    if (
+        t["trades_per_week"] > 1.5 * league["trades_per_week"]
+        and t["trades_per_week"] > 0
+    ):
+        labels.append("TradeHappy")
+    if t["risky_start_rate"] > 0.1:
+        labels.append("StartsInjured")
+    if t["suboptimal_start_rate"] > 0.15:
+        labels.append("LeavesPointsOnBench")
+    if t["position_bias"].get("DEF", 0) > 0.05:
+        labels.append("StreamsDefense")
+    if t["position_bias"].get("K", 0) > 0.05:
+        labels.append("StreamsKickers")
+    return labels
+
+
+def profile(manager):
+    """Precomputed profile for a team key, manager nickname or team name."""
+    with _lock:
+        _load()
+        key = _index.get((manager or "").lower())
+        if key is None:
+            return None
+        row, t = _profiles[key], dict(_derived[key])
+    return {
+        "team_key": key,
+        "manager": row["manager"],
+        "team": row["team"],
+        "tendencies": t,
+        "labels": t.pop("labels", []),
+        "recent_moves": row["moves"],
+        "roster": list(row["roster"]),
+    }
+
+
+def _headlines(names):
+    """Recent stories on the opponent's players, from the shared news index."""
+    found = news.for_players([n for n in names if n], NEWS_HOURS)
+    return [
+        {"player": name, "title": s["title"], "url": s["url"]}
+        for name, stories in found.items()
+        for s in stories[:NEWS_PER_PLAYER]
+    ]
+
+
+@metrics.timed("scout")
+def run_scout_logic(roster, odds, weather, opponents=None, manager=None):
+    """Scouting report on ``manager`` (default: this week's opponent).
+
+    ``roster`` is our own team; it keeps us out of a raw league
+    ``opponents`` payload.
+    """
+    opp = None
+    if opponents:
+        me = yahoo_parse.team(roster) if isinstance(roster, dict) else None
+        opps = yahoo_parse.opponent_rosters(opponents, me.key if me else None)
+        opp = next((o for o in opps if o["key"] == manager), None) if manager else None
+        if manager is None and opps:
+            opp = opps[0]
+            manager = opp["key"]
+    prof = profile(manager) if manager else None
+    if opp and opp["roster"]:
+        names = [p.get("name") for p in opp["roster"]]
+    else:
+        names = (prof or {}).get("roster") or []
+    headlines = _headlines(names)
+    if prof is None:
+        return {
+            "role": "scout",
+            "manager": manager,
+            "profile": {},
+            "tendencies": [],
+            "weaknesses": [],
+            "news": headlines,
+            "rationale": "No league history ingested for this opponent yet",
+        }
+    t = prof["tendencies"]
+    fav = t["favorite_position"]
+    weaknesses = []
+    if t["risky_start_rate"] > 0.1:
+        weaknesses.append("Starts injured players")
+    if t["suboptimal_start_rate"] > 0.15:
+        weaknesses.append("Leaves projected points on the bench")
+    if "SetAndForget" in prof["labels"]:
+        weaknesses.append("Never works the waiver wire")
     return {
         "role": "scout",
-        "profile": profile,
-        "tendencies": tendencies,
+        "manager": prof["manager"] or prof["team_key"],
+        "team": prof["team"],
+        "profile": {"bias": f"{fav}_heavy" if fav else "balanced", **t},
+        "tendencies": prof["labels"],
         "weaknesses": weaknesses,
-        "boom_candidates": boom_candidates,
-        "logic": {"rune_focus": rune_focus},
-        "rationale": "Rune opponent model built from neural profile and tendencies",
+        "recent_moves": prof["recent_moves"][:5],
+        "news": headlines,
+        "rationale": f"Profile from {len(prof['recent_moves'])} recent moves "
+        f"and {t['weeks_observed']} observed lineups",
     }
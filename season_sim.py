@@ -0,0 +1,399 @@
+"""Whole-league season Monte Carlo for playoff, bye and title odds.
+
+Every team's weekly score is drawn from a normal around a strength-based
+mean; the remaining regular season and the playoff bracket are simulated for
+all teams at once as ``(sims, weeks, teams)`` arrays.  Draws are kept on the
+``SeasonSim`` so that when a week goes final its simulated slice is replaced
+by the real result instead of re-simulating the season.
+"""
+
+import os, re, json
+import numpy as np
+
+import yahoo_parse, role_graph
+
+OUT_DIR = "out"
+SCOREBOARD_DIR = os.path.join(OUT_DIR, "scoreboards")
+N_SIMS = int(os.getenv("SEASON_SIMS", "20000"))
+# Cap on sims a request may ask for.  The (sims, weeks, teams) float32 draws
+# take 4 bytes each: 20k sims of 14 weeks x 12 teams is ~13 MB, and
+# standings() makes about two more copies of the live weeks.
+MAX_SIMS = int(os.getenv("SEASON_MAX_SIMS", "20000"))
+LEAGUE_MEAN = 110.0  # average weekly team score
+POWER_POINTS = 20.0  # weekly points between power 0 and power 1
+SCORE_SD = 24.0  # weekly score standard deviation
+PF_SCALE = 1e4  # wins dominate points-for in the standings sort key
+
+
+def _load(name):
+    try:
+        with open(os.path.join(OUT_DIR, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _norm(name):
+    name = (name or "").lower().replace("...", "").replace("_", " ")
+    return re.sub(r"[^a-z0-9]", "", name)
+
+
+def match_team(name, names):
+    """Index of ``name`` in ``names``, tolerating truncation and punctuation."""
+    n = _norm(name)
+    if not n:
+        return None
+    norms = [_norm(x) for x in names]
+    if n in norms:
+        return norms.index(n)
+    for i, c in enumerate(norms):
+        if len(n) >= 5 and (c.startswith(n) or n.startswith(c)):
+            return i
+    return None
+
+
+# ------------------ inputs ------------------
+def league_settings(settings_payload):
+    league = (settings_payload or {}).get("fantasy_content", {}).get("league", [])
+    meta = league[0] if league else {}
+    settings = {}
+    if len(league) > 1:
+        settings = (league[1].get("settings") or [{}])[0]
+    return {
+        "current_week": int(meta.get("current_week") or 1),
+        "end_week": int(meta.get("end_week") or 17),
+        "playoff_start_week": int(settings.get("playoff_start_week") or 15),
+        "num_playoff_teams": int(settings.get("num_playoff_teams") or 6),
+        "reseeding": bool(int(settings.get("uses_playoff_reseeding") or 0)),
+    }
+
+
+def known_pairings(names, team_matchups=(), schedule=None):
+    """``{week: {(i, j)}}`` from Yahoo matchups and the legacy schedule file."""
+    known = {}
+    for m in team_matchups:
+        idx = [match_team(t.name, names) for t in m.teams]
+        if len(idx) == 2 and None not in idx and idx[0] != idx[1]:
+            known.setdefault(m.week, set()).add(tuple(sorted(idx)))
+    weeks = (schedule or {}).get("weeks") or []
+    me = match_team((schedule or {}).get("me"), names)
+    if me is None and weeks:
+        # The schedule file names "me" by NFL abbreviation; it is the one team
+        # that never shows up as an opponent.
+        seen = {match_team(w.get("opponent"), names) for w in weeks}
+        missing = [i for i in range(len(names)) if i not in seen]
+        me = missing[0] if len(missing) == 1 else None
+    if me is not None:
+        for w in weeks:
+            opp = match_team(w.get("opponent"), names)
+            if opp is not None and opp != me:
+                known.setdefault(int(w["week"]), set()).add(tuple(sorted((me, opp))))
+    return known
+
+
+def build_schedule(n_teams, weeks, known):
+    """Opponent index per (week, team); -1 means no game.
+
+    Known pairings are placed first; teams still unpaired in a week are
+    matched with a circle-method rotation until league scoreboards fill in
+    the real schedule.
+    """
+    sched = -np.ones((len(weeks), n_teams), dtype=np.int64)
+    for wi, week in enumerate(weeks):
+        opp = sched[wi]
+        for i, j in sorted(known.get(week, ())):
+            if opp[i] < 0 and opp[j] < 0:
+                opp[i], opp[j] = j, i
+        free = [t for t in range(n_teams) if opp[t] < 0]
+        if len(free) > 1:
+            fixed, rest = free[0], free[1:]
+            k = wi % len(rest)
+            order = [fixed] + rest[k:] + rest[:k]
+            for a, b in zip(order[: len(order) // 2], reversed(order)):
+                opp[a], opp[b] = b, a
+    return sched
+
+
+def team_means(names, power_payload):
+    power = power_payload or {}
+    keys = list(power)
+    vals = []
+    for name in names:
+        i = match_team(name, keys)
+        vals.append(power[keys[i]].get("power") if i is not None else None)
+    known = [v for v in vals if v is not None]
+    center = float(np.mean(known)) if known else 0.5
+    vals = [center if v is None else v for v in vals]
+    return LEAGUE_MEAN + POWER_POINTS * (np.asarray(vals, dtype=np.float64) - center)
+
+
+# ------------------ simulation ------------------
+class SeasonSim:
+    def __init__(
+        self,
+        names,
+        means,
+        weeks,
+        sched,
+        base_wins,
+        base_pf,
+        settings,
+        n_sims=N_SIMS,
+        seed=None,
+    ):
+        self.names, self.weeks = list(names), list(weeks)
+        self.settings = settings
+        self.n_sims, n_teams = n_sims, len(names)
+        self.sched = sched
+        self.base_wins = np.asarray(base_wins, dtype=np.float64)
+        self.base_pf = np.asarray(base_pf, dtype=np.float64)
+        self.final_weeks = []
+        rng = np.random.default_rng(seed)
+        self.scores = self._draw(rng, means, (n_sims, len(weeks), n_teams))
+        self.playoff_scores = self._draw(rng, means, (n_sims, self._rounds(), n_teams))
+        self.live = np.ones(len(weeks), dtype=bool)
+
+    @staticmethod
+    def _draw(rng, means, size):
+        """Normal scores drawn straight into float32, with no float64 copy."""
+        scores = rng.standard_normal(size, dtype=np.float32)
+        scores *= SCORE_SD
+        scores += np.asarray(means, dtype=np.float32)
+        return scores
+
+    def _rounds(self):
+        p = self.settings["num_playoff_teams"]
+        return int(np.ceil(np.log2(p))) if p > 1 else 0
+
+    def apply_final(self, week, points):
+        """Replace a simulated week with its final ``{team_index: points}``."""
+        if week not in self.weeks or week in self.final_weeks:
+            return
+        wi = self.weeks.index(week)
+        opp = self.sched[wi]
+        pts = np.array([points.get(t, 0.0) for t in range(len(self.names))])
+        has_game = opp >= 0
+        opp_pts = np.where(has_game, pts[np.clip(opp, 0, None)], 0.0)
+        self.base_wins += np.where(
+            has_game, (pts > opp_pts) + 0.5 * (pts == opp_pts), 0.0
+        )
+        self.base_pf += pts
+        self.live[wi] = False
+        self.final_weeks.append(week)
+
+    def standings(self):
+        """Simulated final (wins, points_for), each shaped (sims, teams)."""
+        live = np.flatnonzero(self.live)
+        scores = self.scores[:, live, :]
+        opp = self.sched[live]
+        has_game = opp >= 0
+        opp_scores = scores[:, np.arange(len(live))[:, None], np.clip(opp, 0, None)]
+        wins = ((scores > opp_scores) & has_game).sum(axis=1)
+        pf = scores.sum(axis=1)
+        return self.base_wins + wins, self.base_pf + pf
+
+    def odds(self):
+        n_sims, n_teams = self.n_sims, len(self.names)
+        wins, pf = self.standings()
+        order = np.argsort(-(wins * PF_SCALE + pf), axis=1, kind="stable")
+        seed_of = np.empty_like(order)
+        np.put_along_axis(seed_of, order, np.arange(n_teams)[None, :], axis=1)
+
+        p = min(self.settings["num_playoff_teams"], n_teams)
+        byes = (2 ** self._rounds() - p) if p > 1 else 0
+        champ = self._bracket(order[:, :p], byes) if p > 1 else order[:, 0]
+
+        playoff = (seed_of < p).mean(axis=0)
+        bye = (seed_of < byes).mean(axis=0)
+        title = np.bincount(champ, minlength=n_teams) / n_sims
+        return [
+            {
+                "team": self.names[t],
+                "mean_wins": float(wins[:, t].mean()),
+                "mean_points_for": float(pf[:, t].mean()),
+                "playoff_odds": float(playoff[t]),
+                "bye_odds": float(bye[t]),
+                "title_odds": float(title[t]),
+            }
+            for t in np.argsort(-title)
+        ]
+
+    def _bracket(self, teams_by_seed, byes):
+        """Vectorized single-elimination bracket, higher seed vs lowest seed."""
+        alive = np.tile(np.arange(teams_by_seed.shape[1]), (self.n_sims, 1))
+        for r in range(self._rounds()):
+            scores = self.playoff_scores[:, r, :]
+            nb = byes if r == 0 else 0
+            bye, play = alive[:, :nb], alive[:, nb:]
+            m = play.shape[1] // 2
+            hi, lo = play[:, :m], play[:, ::-1][:, :m]
+            s_hi = np.take_along_axis(
+                scores, np.take_along_axis(teams_by_seed, hi, 1), 1
+            )
+            s_lo = np.take_along_axis(
+                scores, np.take_along_axis(teams_by_seed, lo, 1), 1
+            )
+            winners = np.where(s_hi >= s_lo, hi, lo)
+            alive = np.concatenate([bye, winners], axis=1)
+            if self.settings["reseeding"]:
+                alive = np.sort(alive, axis=1)
+        return np.take_along_axis(teams_by_seed, alive[:, :1], 1)[:, 0]
+
+
+# ------------------ entry point ------------------
+_sims = {}
+
+
+def weekly_finals(names, scoreboards):
+    """``{week: {team_index: points}}`` for every scoreboard week gone final."""
+    finals = {}
+    for payload in scoreboards or ():
+        for m in yahoo_parse.matchups(payload):
+            if m.status != "postevent":
+                continue
+            for t in m.teams:
+                i = match_team(t.name, names)
+                if i is not None:
+                    finals.setdefault(m.week, {})[i] = t.points
+    return finals
+
+
+def _scoreboard_path(week):
+    return os.path.join(SCOREBOARD_DIR, f"week_{int(week):02d}.json")
+
+
+def stored_scoreboards():
+    """Every league scoreboard ``sync_scoreboards`` has kept, by week."""
+    try:
+        names = sorted(os.listdir(SCOREBOARD_DIR))
+    except OSError:
+        return []
+    out = []
+    for name in names:
+        if name.startswith("week_") and name.endswith(".json"):
+            try:
+                with open(os.path.join(SCOREBOARD_DIR, name), encoding="utf-8") as f:
+                    out.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return out
+
+
+def _final(payload):
+    matchups = yahoo_parse.matchups(payload) if payload else ()
+    return bool(matchups) and all(m.status == "postevent" for m in matchups)
+
+
+def sync_scoreboards(current_week, fetch):
+    """Store the scoreboard of every week up to ``current_week`` not yet final.
+
+    ``fetch(week)`` returns a Yahoo league scoreboard.  Weeks already stored
+    as final are never fetched again, so after the first run this costs one
+    call per week in progress.  Returns the weeks fetched.
+    """
+    os.makedirs(SCOREBOARD_DIR, exist_ok=True)
+    fetched = []
+    for week in range(1, current_week + 1):
+        path = _scoreboard_path(week)
+        try:
+            with open(path, encoding="utf-8") as f:
+                if _final(json.load(f)):
+                    continue
+        except (OSError, ValueError):
+            pass
+        payload = fetch(week)
+        if not payload or "error" in payload:
+            continue
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+        fetched.append(week)
+    return fetched
+
+
+def season_outlook(
+    standings=None,
+    settings=None,
+    power=None,
+    schedule=None,
+    team_matchups=None,
+    scoreboards=(),
+    n_sims=N_SIMS,
+    seed=None,
+):
+    """Playoff/bye/title odds for every team, cached per week.
+
+    Inputs default to the recorded ``out/`` artifacts.  The simulation is
+    kept in memory; later calls with new final weeks only fold those weeks in.
+    """
+    standings = standings if standings is not None else _load("standings_raw.json")
+    settings = league_settings(
+        settings if settings is not None else _load("settings_raw.json")
+    )
+    power = power if power is not None else _load("team_power.json")
+    schedule = schedule if schedule is not None else _load("season_schedule.json")
+    team_matchups = (
+        team_matchups if team_matchups is not None else _load("matchups.json")
+    )
+
+    teams = yahoo_parse.standings(standings) if standings else ()
+    names = [t.name for t in teams] or list(power or {})
+    if not names:
+        return {"error": "no teams"}
+    start = settings["current_week"]
+    weeks = list(range(start, settings["playoff_start_week"]))
+    finals = weekly_finals(names, scoreboards)
+
+    base_key = role_graph.fingerprint(
+        [
+            names,
+            settings,
+            power,
+            schedule,
+            team_matchups,
+            [t.wins for t in teams],
+            n_sims,
+            seed,
+        ]
+    )
+    done = sorted(w for w in finals if w in weeks)
+    cache_key = role_graph.fingerprint([base_key, {w: finals[w] for w in done}])
+    cached = role_graph.load_cached("season", cache_key)
+    if cached is not None:
+        return {**cached, "from_cache": True}
+
+    sim = _sims.get(base_key)
+    if sim is None or any(w not in done for w in sim.final_weeks):
+        known = known_pairings(
+            names,
+            yahoo_parse.matchups(team_matchups) if team_matchups else (),
+            schedule,
+        )
+        base_wins = [t.wins + 0.5 * t.ties for t in teams] or [0] * len(names)
+        base_pf = [t.points_for for t in teams] or [0] * len(names)
+        sim = SeasonSim(
+            names,
+            team_means(names, power),
+            weeks,
+            build_schedule(len(names), weeks, known),
+            base_wins,
+            base_pf,
+            settings,
+            n_sims=n_sims,
+            seed=seed,
+        )
+        _sims.clear()
+        _sims[base_key] = sim
+    for w in done:
+        sim.apply_final(w, finals[w])
+
+    result = {
+        "week": start + len(sim.final_weeks),
+        "sims": n_sims,
+        "final_weeks": list(sim.final_weeks),
+        "playoff_teams": settings["num_playoff_teams"],
+        "teams": sim.odds(),
+    }
+    role_graph.store_cached("season", cache_key, result)
+    return {**result, "from_cache": False}
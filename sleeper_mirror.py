@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""Local mirror of Sleeper's NFL player database.
+
+Sleeper's ``/players/nfl`` dump is several megabytes and Sleeper asks
+clients to fetch it at most once a day.  ``sync()`` downloads it at most
+every ``MAX_AGE`` seconds, conditionally (``If-None-Match``) and streamed to
+disk, skips the reload when the body hash is unchanged, and parses it one
+player at a time with ``iter_object`` so memory stays bounded.  Players land
+in ``out/mirror/players.sqlite``, keyed by Sleeper id and indexed by Yahoo id
+and normalized name; the swap is one transaction, so readers in other
+workers see either the old table or the new one.
+
+Everything else resolves players through ``player``/``by_yahoo``/``enrich``
+instead of the network.
+
+    python sleeper_mirror.py [--force]
+"""
+
+import os, json, time, sqlite3, hashlib, argparse, logging, threading
+from functools import lru_cache
+
+import requests
+
+import metrics
+from nfl_teams import team_abbr
+from draft_engine import _norm
+
+SLEEPER_URL = os.getenv("SLEEPER_PLAYERS_URL", "https://api.sleeper.app/v1/players/nfl")
+MIRROR_DIR = os.path.join("out", "mirror")
+DB_FILE = os.getenv("PLAYERS_DB", os.path.join(MIRROR_DIR, "players.sqlite"))
+MAX_AGE = 86400  # Sleeper's guidance: the full dump at most once a day
+CHUNK = 1 << 16
+BATCH = 1000
+COLUMNS = (
+    "sleeper_id",
+    "yahoo_id",
+    "espn_id",
+    "name",
+    "norm",
+    "position",
+    "team",
+    "status",
+    "injury_status",
+    "data",
+)
+WHITESPACE = " \t\r\n"
+NUMBER_TAIL = set("0123456789.eE+-")  # characters that can extend a number
+
+log = logging.getLogger(__name__)
+_local = threading.local()
+
+
+# ------------------ streaming parse ------------------
+def iter_object(fp, chunk=CHUNK):
+    """Yield ``(key, value)`` for each member of a top-level JSON object.
+
+    Reads ``fp`` (text mode) ``chunk`` characters at a time and decodes one
+    member at a time, so only the current member is ever held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buf, i, eof = "", 0, False
+
+    def more():
+        nonlocal buf, i, eof
+        data = fp.read(chunk)
+        eof = not data
+        buf, i = buf[i:] + data, 0
+        return not eof
+
+    def peek():
+        nonlocal i
+        while True:
+            while i < len(buf) and buf[i] in WHITESPACE:
+                i += 1
+            if i < len(buf):
+                return buf[i]
+            if not more():
+                raise ValueError("truncated JSON object")
+
+    def expect(chars):
+        nonlocal i
+        c = peek()
+        if c not in chars:
+            raise ValueError(f"expected one of {chars!r}, got {c!r}")
+        i += 1
+        return c
+
+    def value():
+        nonlocal i
+        peek()
+        while True:
+            try:
+                v, end = decoder.raw_decode(buf, i)
+                # A number ending at the buffer's edge, or cut after "." or
+                # "e" by it, may continue in the next chunk.
+                cut = end == len(buf) or (
+                    buf[end] in NUMBER_TAIL and not isinstance(v, (str, dict, list))
+                )
+                if eof or not cut:
+                    i = end
+                    return v
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            more()
+
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        key = value()
+        if not isinstance(key, str):
+            raise ValueError("object keys must be strings")
+        expect(":")
+        yield key, value()
+        if expect(",}") == "}":
+            return
+
+
+# ------------------ store ------------------
+def _db():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DB_FILE) or ".", exist_ok=True)
+        conn = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS players (
+                sleeper_id TEXT PRIMARY KEY, yahoo_id TEXT, espn_id TEXT,
+                name TEXT, norm TEXT, position TEXT, team TEXT, status TEXT,
+                injury_status TEXT, data TEXT);
+            CREATE INDEX IF NOT EXISTS players_yahoo ON players (yahoo_id);
+            CREATE INDEX IF NOT EXISTS players_norm ON players (norm);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        _local.conn = conn
+    return conn
+
+
+def _meta():
+    return dict(_db().execute("SELECT key, value FROM meta").fetchall())
+
+
+def _set_meta(conn, **values):
+    conn.executemany(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+        [(k, str(v)) for k, v in values.items()],
+    )
+
+
+def _row(sleeper_id, p):
+    name = (
+        p.get("full_name")
+        or " ".join(x for x in (p.get("first_name"), p.get("last_name")) if x)
+        or sleeper_id
+    )
+    position = p.get("position") or ""
+    return (
+        sleeper_id,
+        str(p["yahoo_id"]) if p.get("yahoo_id") else None,
+        str(p["espn_id"]) if p.get("espn_id") else None,
+        name,
+        _norm(name),
+        position,
+        team_abbr(p.get("team")),
+        p.get("status") or "",
+        p.get("injury_status") or "",
+        json.dumps(p, separators=(",", ":")),
+    )
+
+
+def load(path):
+    """Replace the players table from a dump file; returns the player count."""
+    conn = _db()
+    count = 0
+    insert = f"INSERT INTO players ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    with open(path, "r", encoding="utf-8") as f:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM players")
+            batch = []
+            for sleeper_id, p in iter_object(f):
+                if not isinstance(p, dict):
+                    continue
+                batch.append(_row(sleeper_id, p))
+                if len(batch) >= BATCH:
+                    conn.executemany(insert, batch)
+                    count, batch = count + len(batch), []
+            conn.executemany(insert, batch)
+            count += len(batch)
+            _set_meta(conn, players=count, loaded_at=time.time())
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return count
+
+
+# ------------------ sync ------------------
+@metrics.timed_upstream("sleeper")
+def _download(etag=None):
+    """``(etag, sha256, tmp path)``; the path is None on 304."""
+    os.makedirs(MIRROR_DIR, exist_ok=True)
+    headers = {"If-None-Match": etag} if etag else {}
+    with requests.get(SLEEPER_URL, headers=headers, stream=True, timeout=60) as resp:
+        if resp.status_code == 304:
+            return etag, None, None
+        resp.raise_for_status()
+        digest = hashlib.sha256()
+        tmp = os.path.join(MIRROR_DIR, f".sleeper_players.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            for block in resp.iter_content(CHUNK):
+                digest.update(block)
+                f.write(block)
+        return resp.headers.get("ETag"), digest.hexdigest(), tmp
+
+
+def sync(force=False):
+    """Refresh the mirror if it is older than ``MAX_AGE``; returns a summary."""
+    meta = _meta()
+    age = time.time() - float(meta.get("checked_at") or 0)
+    if not force and age < MAX_AGE and meta.get("players"):
+        return {"status": "fresh", "players": int(meta["players"]), "age_s": int(age)}
+    try:
+        etag, sha, tmp = _download(None if force else meta.get("etag"))
+    except Exception as e:
+        metrics.inc("sleeper_sync_total", result="error")
+        log.warning("Sleeper download failed: %s", e)
+        return {"error": str(e), "players": int(meta.get("players") or 0)}
+    result = "not_modified" if tmp is None else "unchanged"
+    try:
+        if tmp is not None and (force or sha != meta.get("sha256")):
+            load(tmp)
+            result = "updated"
+            _by_yahoo.cache_clear()
+            _player.cache_clear()
+        values = {"checked_at": time.time(), "etag": etag or ""}
+        if sha:
+            values["sha256"] = sha
+        _set_meta(_db(), **values)
+    finally:
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+    metrics.inc("sleeper_sync_total", result=result)
+    return {"status": result, "players": int(_meta().get("players") or 0)}
+
+
+# ------------------ lookups ------------------
+def _stamp():
+    # Changes whenever another process reloads the table, so memoized
+    # lookups never outlive the data they came from.
+    try:
+        db = os.stat(DB_FILE).st_mtime_ns
+    except OSError:
+        return None
+    try:
+        return db, os.stat(f"{DB_FILE}-wal").st_mtime_ns
+    except OSError:
+        return db, 0
+
+
+def _as_dict(row):
+    if row is None:
+        return None
+    return {c: v for c, v in zip(COLUMNS, row) if c not in ("norm", "data")}
+
+
+@lru_cache(maxsize=8192)
+def _by_yahoo(yahoo_id, stamp):
+    row = (
+        _db()
+        .execute(
+            f"SELECT {', '.join(COLUMNS)} FROM players WHERE yahoo_id = ?",
+            (str(yahoo_id),),
+        )
+        .fetchone()
+    )
+    return _as_dict(row)
+
+
+@lru_cache(maxsize=8192)
+def _player(sleeper_id, stamp):
+    row = (
+        _db()
+        .execute(
+            f"SELECT {', '.join(COLUMNS)} FROM players WHERE sleeper_id = ?",
+            (str(sleeper_id),),
+        )
+        .fetchone()
+    )
+    return _as_dict(row)
+
+
+def player(sleeper_id=None, yahoo_id=None):
+    """Mirrored player by Sleeper or Yahoo id, or None."""
+    stamp = _stamp()
+    if stamp is None:
+        return None
+    if sleeper_id is not None:
+        return _player(str(sleeper_id), stamp)
+    if yahoo_id is not None:
+        return _by_yahoo(str(yahoo_id), stamp)
+    return None
+
+
+def by_yahoo(yahoo_ids):
+    """``{yahoo id: player}`` for the ids the mirror knows."""
+    found = {}
+    for yid in yahoo_ids:
+        p = player(yahoo_id=yid)
+        if p is not None:
+            found[str(yid)] = p
+    return found
+
+
+def find(name, position=None, team=None):
+    """Best match for a name (optionally narrowed by position/team), or None."""
+    if _stamp() is None:
+        return None
+    rows = (
+        _db()
+        .execute(
+            f"SELECT {', '.join(COLUMNS)} FROM players WHERE norm = ?", (_norm(name),)
+        )
+        .fetchall()
+    )
+    matches = [_as_dict(r) for r in rows]
+    if position:
+        matches = [m for m in matches if m["position"] == position] or matches
+    if team:
+        matches = [m for m in matches if m["team"] == team] or matches
+    # Prefer active players on a team over retired namesakes.
+    matches.sort(key=lambda m: (not m["team"], m["status"] != "Active"))
+    return matches[0] if matches else None
+
+
+def yahoo_id(player_id):
+    """Yahoo id from a roster id like ``"RB_31883"`` (or a bare id)."""
+    tail = str(player_id or "").rsplit("_", 1)[-1]
+    return tail if tail.isdigit() else None
+
+
+def enrich(p):
+    """Fill a player dict's missing name/team/position/status from the mirror."""
+    if p.get("name") and p.get("team") and p.get("position"):
+        return p
+    m = player(yahoo_id=yahoo_id(p.get("id")))
+    if m is None:
+        return p
+    return {
+        **p,
+        "name": p.get("name") or m["name"],
+        "team": p.get("team") or m["team"],
+        "position": p.get("position") or m["position"],
+        "status": p.get("status") or m["injury_status"],
+        "sleeper_id": m["sleeper_id"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror Sleeper's player database")
+    parser.add_argument("--force", action="store_true", help="Ignore age and ETag")
+    args = parser.parse_args()
+    print(json.dumps(sync(force=args.force), indent=2))
+
+
+if __name__ == "__main__":
+    main()
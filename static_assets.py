@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Static file index for the React bundle.
+
+``static/`` is walked once at startup: each file is read into memory with its
+content type, a content hash ETag and its compressed variants (``.br``/``.gz``
+siblings from the build when present, otherwise gzip -- and brotli, when the
+module is installed -- computed here).  Requests are then answered from the
+index without touching the filesystem: fingerprinted build output
+(``assets/index-CpdBVcsH.js``) is cached as immutable for a year, everything
+else revalidates by ETag and gets a 304 when unchanged.
+
+    python static_assets.py static   # write .br/.gz siblings at build time
+"""
+
+import os, re, sys, gzip, hashlib, mimetypes
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional; .br siblings from the build are still served
+    brotli = None
+
+COMPRESSIBLE = re.compile(r"^(text/|application/(javascript|json|xml)|image/svg)")
+# Vite build output: assets/<name>-<8 char content hash>.<ext>
+FINGERPRINTED = re.compile(r"^assets/.+-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+MIN_COMPRESS_BYTES = 512
+MAX_MEMORY_BYTES = 8 * 1024 * 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class Asset:
+    __slots__ = ("path", "mimetype", "etag", "cache_control", "variants")
+
+    def __init__(self, path, mimetype, body, cache_control):
+        self.path, self.mimetype = path, mimetype
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.cache_control = cache_control
+        self.variants = {"identity": body}
+
+
+def _compress(encoding, body):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=11)
+    return None
+
+
+def accepted_encodings(header):
+    """Encodings from ``Accept-Encoding`` with a non-zero q-value."""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        m = re.search(r"q=([0-9.]+)", params)
+        if m:
+            try:
+                q = float(m.group(1))
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticIndex:
+    def __init__(self, root):
+        self.root = root
+        self.assets = {}
+        if os.path.isdir(root):
+            self._scan()
+
+    def _scan(self):
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                full = os.path.join(dirpath, name)
+                rel = os.path.relpath(full, self.root).replace(os.sep, "/")
+                if (
+                    rel.endswith((".br", ".gz"))
+                    or os.path.getsize(full) > MAX_MEMORY_BYTES
+                ):
+                    continue
+                with open(full, "rb") as f:
+                    body = f.read()
+                mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if mimetype.startswith("text/") or mimetype == "application/javascript":
+                    mimetype += "; charset=utf-8"
+                cache = IMMUTABLE if FINGERPRINTED.match(rel) else REVALIDATE
+                asset = Asset(rel, mimetype, body, cache)
+                if COMPRESSIBLE.match(mimetype) and len(body) >= MIN_COMPRESS_BYTES:
+                    for encoding, suffix in ENCODINGS:
+                        data = None
+                        if os.path.exists(full + suffix):
+                            with open(full + suffix, "rb") as f:
+                                data = f.read()
+                        else:
+                            data = _compress(encoding, body)
+                        if data is not None and len(data) < len(body):
+                            asset.variants[encoding] = data
+                self.assets[rel] = asset
+
+    def get(self, path):
+        return self.assets.get(path.lstrip("/"))
+
+    def response(self, request, path):
+        """Response for ``path``, or ``None`` when it is not in the index."""
+        asset = self.get(path)
+        if asset is None:
+            return None
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding"))
+        encoding = next(
+            (e for e, _ in ENCODINGS if e in accepted and e in asset.variants),
+            "identity",
+        )
+        etag = asset.etag if encoding == "identity" else f"{asset.etag}-{encoding}"
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(request.headers.get("If-None-Match"), etag):
+            return Response(status=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        # Werkzeug drops the body itself for HEAD requests.
+        return Response(
+            asset.variants[encoding], content_type=asset.mimetype, headers=headers
+        )
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = {t.strip().removeprefix("W/").strip('"') for t in header.split(",")}
+    return etag in tags
+
+
+def precompress(root):
+    """Write ``.br``/``.gz`` siblings for every compressible file under root."""
+    written = 0
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            full = os.path.join(dirpath, name)
+            if name.endswith((".br", ".gz")):
+                continue
+            mimetype = mimetypes.guess_type(name)[0] or ""
+            if not COMPRESSIBLE.match(mimetype):
+                continue
+            with open(full, "rb") as f:
+                body = f.read()
+            if len(body) < MIN_COMPRESS_BYTES:
+                continue
+            for encoding, suffix in ENCODINGS:
+                data = _compress(encoding, body)
+                if data is not None and len(data) < len(body):
+                    with open(full + suffix, "wb") as f:
+                        f.write(data)
+                    written += 1
+    return written
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else "static"
+    print(f" Wrote {precompress(root)} compressed variants under {root}")
+    if brotli is None:
+        print(" brotli not installed; only .gz variants were written")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Local stand-in for Yahoo, The Odds API, OpenWeather, news feeds and the LLMs.
+
+Responses are replayed from the recorded artifacts in ``out/`` so benchmarks
+and load tests never touch the network.  ``env()`` returns the variables that
+point ``utils_core``, ``thanos_council`` and the SDK clients at the stub.
+"""
+import os, json, time, random, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.getenv("STUB_FIXTURE_DIR", "out")
+
+
+def _load(name):
+    with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_fixtures():
+    """Pre-serialize every canned response once, keyed by route name."""
+    roster = _load("roster.json")
+    matchups = _load("matchups.json")
+    # League teams with rosters: every team gets the recorded roster.
+    league_rosters = _load("teams_raw.json")
+    roster_node = roster["fantasy_content"]["team"][1]
+    for k, t in league_rosters["fantasy_content"]["league"][1]["teams"].items():
+        if k.isdigit():
+            t["team"] = [t["team"][0], roster_node]
+    odds = _load("odds_cache.json")
+    weather = _load("weather_cache.json")
+    team_weather = weather.get("team_weather", {})
+    first = next(iter(team_weather.values()), {})
+    openweather = {
+        "main": {"temp": 62.0},
+        "wind": {"speed": first.get("wind_mph") or 0.0},
+        "weather": [{"main": "Clear"}],
+        "name": next(iter(team_weather), ""),
+    }
+    claude = {
+        "id": "msg_stub",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-3-haiku-20240307",
+        "content": [
+            {"type": "text", "text": '{"decision": "hold", "rationale": "stub"}'}
+        ],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 512, "output_tokens": 24},
+    }
+    openai = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": '{"decision": "hold"}'},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 512, "completion_tokens": 12, "total_tokens": 524},
+    }
+    ollama = {
+        "response": '{"decision": "hold"}',
+        "prompt_eval_count": 512,
+        "eval_count": 12,
+    }
+    news = "".join(
+        f"<item><title>{team} injury report: two starters limited</title>"
+        f"<link>https://news.invalid/{i}</link>"
+        f"<pubDate>{time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime())}</pubDate>"
+        f"</item>"
+        for i, team in enumerate(team_weather)
+    )
+    team_key = roster["fantasy_content"]["team"][0][0]["team_key"]
+    raw = {
+        "yahoo_roster": roster,
+        "yahoo_matchups": matchups,
+        "yahoo_league_rosters": league_rosters,
+        "yahoo_transactions": {
+            "fantasy_content": {
+                "league": [
+                    league_rosters["fantasy_content"]["league"][0],
+                    {"transactions": {"count": 0}},
+                ]
+            }
+        },
+        "oddsapi": odds.get("games", []),
+        "openweather": openweather,
+        "claude": claude,
+        "openai": openai,
+        "ollama": ollama,
+    }
+    fixtures = {k: json.dumps(v).encode("utf-8") for k, v in raw.items()}
+    fixtures["news"] = f"<rss><channel>{news}</channel></rss>".encode("utf-8")
+    return team_key, fixtures
+
+
+def route(method, path):
+    path = path.split("?", 1)[0]
+    if path.startswith("/fantasy/v2/team/") and "/roster" in path:
+        return "yahoo_roster"
+    if path.startswith("/fantasy/v2/team/") and "/matchups" in path:
+        return "yahoo_matchups"
+    if path.startswith("/fantasy/v2/league/") and "/teams/roster" in path:
+        return "yahoo_league_rosters"
+    if path.startswith("/fantasy/v2/league/") and "/transactions" in path:
+        return "yahoo_transactions"
+    if path.startswith("/v4/sports/") and path.endswith("/odds"):
+        return "oddsapi"
+    if path == "/news/rss":
+        return "news"
+    if path.startswith("/data/2.5/weather"):
+        return "openweather"
+    if method == "POST" and path.endswith("/v1/messages"):
+        return "claude"
+    if method == "POST" and path.endswith("/chat/completions"):
+        return "openai"
+    if method == "POST" and path == "/api/generate":
+        return "ollama"
+    return None
+
+
+class StubServer:
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0):
+        self.team_key, self.fixtures = build_fixtures()
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.hits = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                name = route(method, self.path)
+                with stub._lock:
+                    stub.hits[name] = stub.hits.get(name, 0) + 1
+                delay = stub.latency_ms + random.uniform(0, stub.jitter_ms)
+                if delay:
+                    time.sleep(delay / 1000.0)
+                body = stub.fixtures.get(name)
+                status = 200 if body is not None else 404
+                if body is None:
+                    body = json.dumps({"error": f"no fixture for {self.path}"}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def env(self, token_file):
+        """Environment that routes every upstream call to this stub."""
+        with open(token_file, "w") as f:
+            json.dump({"access_token": "stub", "expires_in": 3600}, f)
+        return {
+            "YAHOO_TEAM_KEY": self.team_key,
+            "YAHOO_TOKEN_FILE": token_file,
+            "YAHOO_API_BASE": f"{self.url}/fantasy/v2",
+            "ODDS_PRIMARY": "oddsapi",
+            "ODDS_API_KEY": "stub",
+            "ODDS_API_BASE": self.url,
+            "OPENWEATHER_API_KEY": "stub",
+            "OPENWEATHER_API_BASE": self.url,
+            "ANTHROPIC_API_KEY": "stub",
+            "ANTHROPIC_BASE_URL": self.url,
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OLLAMA_HOST": self.url,
+            "NEWS_FEEDS": f"{self.url}/news/rss",
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded upstream fixtures")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    stub = StubServer(
+        port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms
+    )
+    print(f" Stub upstreams on {stub.url}")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
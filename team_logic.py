@@ -1,32 +1,63 @@
-import random, numpy as np, utils_core
-
-
-def simulate_matchup(roster, odds, weather, trials=500):
-    win_scores = []
-    for _ in range(trials):
-        base = random.uniform(0.4, 0.6)
-        if odds and "data" in odds:
-            base += 0.05
-        if weather and weather.get("wind") and weather["wind"] > 20:
-            base -= 0.05
-        win_scores.append(max(0, min(1, base + random.gauss(0, 0.1))))
+import numpy as np, metrics, yahoo_parse, projections, season_sim, waiver_logic
+
+
+def project_lineup(roster, odds, weather):
+    """``(points, starters, bench)`` for the best lineup on this week's projections."""
+    proj = projections.current(odds, weather)
+    players = proj.annotate(yahoo_parse.player_dicts(roster))
+    slots, _, _ = waiver_logic.league()
+    points, lineup = waiver_logic.best_lineup(
+        players, waiver_logic.starting_slots(slots)
+    )
+    starters = [lineup[k] for k in sorted(lineup)]
+    started = {p["id"] for p in starters}
+    bench = sorted(
+        (p for p in players if p["id"] not in started),
+        key=lambda p: p["projection"],
+        reverse=True,
+    )
+    return points, starters, bench
+
+
+@metrics.timed("simulate_matchup")
+def simulate_matchup(roster, odds, weather, trials=500, opponent=None):
+    """``(win probability, 10th and 90th percentile of our score)``."""
+    mine = project_lineup(roster, odds, weather)[0]
+    theirs = (
+        project_lineup(opponent, odds, weather)[0]
+        if opponent
+        else season_sim.LEAGUE_MEAN
+    )
+    return _simulate(mine, theirs, trials)
+
+
+def _simulate(mine, theirs, trials):
+    rng = np.random.default_rng()
+    scores = np.maximum(rng.normal(mine, season_sim.SCORE_SD, int(trials)), 0.0)
+    against = rng.normal(theirs, season_sim.SCORE_SD, int(trials))
     return (
-        np.mean(win_scores),
-        np.percentile(win_scores, 10),
-        np.percentile(win_scores, 90),
+        float((scores > against).mean()),
+        float(np.percentile(scores, 10)),
+        float(np.percentile(scores, 90)),
     )
 
 
-def run_head_coach_logic(roster, odds, weather, opponent=None):
-    win, floor, ceiling = simulate_matchup(roster, odds, weather)
-    lineup = ["Starter_" + str(i) for i in range(1, 10)]
-    bench = ["Bench_" + str(i) for i in range(1, 7)]
+@metrics.timed("head_coach")
+def run_head_coach_logic(roster, odds, weather, opponent=None, trials=500):
+    points, starters, bench = project_lineup(roster, odds, weather)
+    theirs = (
+        project_lineup(opponent, odds, weather)[0]
+        if opponent
+        else season_sim.LEAGUE_MEAN
+    )
+    win, floor, ceiling = _simulate(points, theirs, trials)
     return {
         "role": "head_coach",
-        "lineup": lineup,
-        "bench": bench,
+        "lineup": [p["name"] for p in starters],
+        "bench": [p["name"] for p in bench],
+        "projected_points": round(points, 2),
         "logic": {"win_prob": win, "floor": floor, "ceiling": ceiling},
         "odds": odds,
         "weather": weather,
-        "rationale": f"Monte Carlo {int(500)} trials show win {win:.2f}, floor {floor:.2f}, ceiling {ceiling:.2f}",
+        "rationale": f"Monte Carlo {int(trials)} trials: {points:.1f} projected vs {theirs:.1f}, win {win:.2f}, floor {floor:.1f}, ceiling {ceiling:.1f}",
     }
@@ -0,0 +1,21 @@
+import os, json
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURES, name)
+
+
+@pytest.fixture
+def recorded():
+    """Loader for the Yahoo responses recorded under ``out/``."""
+
+    def load(name):
+        with open(os.path.join(ROOT, "out", name), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    return load
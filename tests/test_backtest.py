@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import backtest, news, utils_core
+from test_yahoo_parse import _player, _roster
+
+
+def _league(key, payload):
+    return {
+        "fantasy_content": {"league": [{"league_key": "461.l.881883"}, {key: payload}]}
+    }
+
+
+def _teams(*teams):
+    nodes = {
+        str(i): {
+            "team": [
+                [{"team_key": key}, {"team_id": key[-1]}, {"name": key}],
+                {"roster": {"0": {"players": {"0": player, "count": 1}}}},
+            ]
+        }
+        for i, (key, player) in enumerate(teams)
+    }
+    return _league("teams", {**nodes, "count": len(teams)})
+
+
+def test_weekly_buckets_by_the_stored_week():
+    start = utils_core.SEASON_START
+    # Both snapshots fall in calendar week 2; the league said week 3.
+    decision = (start + timedelta(days=8), {"week": 3, "timestamp": "d"})
+    outcome = (start + timedelta(days=13), {"week": 3, "timestamp": "o"})
+    weeks = backtest.weekly([decision, outcome])
+    assert list(weeks) == [3]
+    assert weeks[3] == (decision[1], outcome[1])
+
+
+def test_actual_points_cover_opponents_and_free_agents():
+    outcome = {
+        "roster": _roster(_player(1, "Mine", "QB", points=20.5)),
+        "league_rosters": _teams(
+            ("461.l.881883.t.7", _player(2, "Rival Back", "RB", points=11.0))
+        ),
+        "free_agents": _league(
+            "players",
+            {"0": _player(3, "Waiver Wire", "WR", points=7.25), "count": 1},
+        ),
+    }
+    points = backtest.actual_points(outcome)
+    assert points["QB_1"] == 20.5
+    assert points["RB_2"] == 11.0
+    assert points["WR_3"] == 7.25
+
+
+def test_replay_reads_news_from_the_decision_snapshot(monkeypatch):
+    decided = datetime(2025, 9, 12, 18, tzinfo=timezone.utc)
+    story = {
+        "title": "Rival Back limited at practice",
+        "url": "n/1",
+        "published": (decided - timedelta(hours=3)).timestamp(),
+    }
+    live = lambda names, hours=24, now=None: {"Rival Back": [{"title": "later"}]}
+    monkeypatch.setattr(news, "for_players", live)
+    snap = {"timestamp": decided.strftime("%Y%m%d_%H%M%S"), "news": [story]}
+    with backtest._replaying(2, {}, snap):
+        found = news.for_players(["Rival Back"], 24)
+        assert utils_core.current_week() == 2
+    assert [s["title"] for s in found["Rival Back"]] == [story["title"]]
+    assert news.for_players is live
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import dataplane
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataplane, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(dataplane, "_mapped", {})
+    monkeypatch.setattr(dataplane, "_pointers", {})
+
+
+def test_publish_swaps_what_readers_load():
+    v1 = dataplane.publish("proj", {"points": np.arange(3.0)}, {"week": 1})
+    old = dataplane.load("proj")
+    assert (old.version, old.meta) == (v1, {"week": 1})
+    assert dataplane.load("proj") is old
+
+    v2 = dataplane.publish("proj", {"points": np.arange(3.0) * 2}, {"week": 2})
+    new = dataplane.load("proj")
+    assert v2 != v1 and new.version == v2
+    assert new.arrays["points"].tolist() == [0.0, 2.0, 4.0]
+    # A reader still holding the old version keeps its arrays.
+    assert old.arrays["points"].tolist() == [0.0, 1.0, 2.0]
+
+
+def test_republishing_a_version_only_moves_current():
+    v1 = dataplane.publish("odds", {}, {"value": 1})
+    dataplane.publish("odds", {}, {"value": 2})
+    assert dataplane.publish("odds", {}, {"value": 1}) == v1
+    assert dataplane.load("odds").meta == {"value": 1}
+
+
+def test_old_versions_are_pruned():
+    versions = [dataplane.publish("w", {}, {"value": i}) for i in range(5)]
+    kept = {v for v in versions if dataplane.load("w", v) is not None}
+    assert len(kept) == dataplane.KEEP and versions[-1] in kept
+    assert dataplane.load_value("w") == 4
+    assert dataplane.load_value("w", max_age=-1) is None
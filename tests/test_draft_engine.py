@@ -0,0 +1,73 @@
+import pytest
+
+import draft_engine
+from draft_engine import DraftBoard, POSITIONS
+
+ROSTER = {"QB": 1, "RB": 2, "WR": 2, "TE": 1, "W/R/T": 1, "K": 1, "DEF": 1, "BN": 3}
+
+
+@pytest.fixture
+def board():
+    players, rank = [], 0
+    for pos, n in (("RB", 30), ("WR", 30), ("QB", 12), ("TE", 12), ("K", 8)):
+        for k in range(n):
+            rank += 1
+            players.append(
+                {"name": f"{pos} {k}", "pos": pos, "rank": rank, "tier": 1 + k // 4}
+            )
+    for k in range(8):
+        rank += 1
+        players.append(
+            {"name": f"DEF {k}", "pos": "DEF", "team": f"T{k}", "rank": rank}
+        )
+    return DraftBoard(players, ROSTER, num_teams=4)
+
+
+def test_snake_order(board):
+    assert [board.owner(p) for p in range(1, 9)] == [0, 1, 2, 3, 3, 2, 1, 0]
+    assert board.next_pick(0, after=1) == 8
+
+
+def test_pick_removes_the_player_everywhere(board):
+    top = board.best(1)[0]
+    assert board.pick(top)
+    assert not board.pick(top)
+    assert top not in board.best(20)
+    assert board.picks == [(1, top, 0)]
+    assert board.team_counts[0].sum() == 1
+    assert 0.0 < board.scarcity(board.pos[top]) < 1.0
+
+
+def test_cliff_tracks_the_top_tier(board):
+    assert board.cliff("RB")["left_in_tier"] == 4
+    for k in range(4):
+        board.pick_name(f"RB {k} (Atl - RB)")
+    cliff = board.cliff("RB")
+    assert cliff["tier"] == 2 and cliff["left_in_tier"] == 4
+    assert cliff["drop"] > 0.0
+
+
+def test_views_match_a_fresh_scan_after_picks(board):
+    for name in ("RB 0", "WR 1", "RB 2", "QB 0", "WR 0", "TE 3"):
+        board.pick(board.find(name))
+    live = [i for i in range(len(board.names)) if board.available[i]]
+    by_value = sorted(live, key=lambda i: -board.vorp[i])
+    assert [board.vorp[i] for i in board.best(5)] == [
+        board.vorp[i] for i in by_value[:5]
+    ]
+    rb = [i for i in live if board.pos[i] == "RB"]
+    assert board.cliff("RB")["left_in_tier"] == sum(board.tier[i] == 1 for i in rb)
+
+
+def test_lookahead_until_our_next_pick(board):
+    board.pick(board.best(1)[0])
+    ahead = board.lookahead(slot=0, n_sims=500, seed=3)
+    assert ahead["next_pick"] == 8 and ahead["picks_before"] == 6
+    assert ahead == board.lookahead(slot=0, n_sims=500, seed=3)
+    survive = ahead["survive"]
+    assert all(0.0 <= s <= 1.0 for s in survive.values())
+    # Six picks come off the board in every simulation.
+    assert abs(sum(1.0 - s for s in survive.values()) - 6.0) < 1e-9
+    assert set(ahead["expected"]) == set(POSITIONS)
+    ranked = sorted(survive, key=lambda i: board.rank[i])
+    assert survive[ranked[0]] < survive[ranked[-1]]
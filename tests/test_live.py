@@ -0,0 +1,31 @@
+import itertools
+import threading
+
+import pytest
+
+import live
+
+
+@pytest.fixture
+def events(tmp_path, monkeypatch):
+    monkeypatch.setattr(live, "LIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(live, "EVENTS_FILE", str(tmp_path / "events.ndjson"))
+    monkeypatch.setattr(live, "_streams", threading.BoundedSemaphore(1))
+    live._append([{"seq": i, "team": "t1", "points": i} for i in (1, 2, 3)])
+
+
+def test_stream_resumes_after_the_last_id(events):
+    chunks = list(itertools.islice(live.stream(last_id=1), 3))
+    assert chunks[0].startswith("retry: ")
+    assert [c.split("\n")[0] for c in chunks[1:]] == ["id: 2", "id: 3"]
+
+
+def test_streams_past_the_cap_are_refused_until_one_closes(events):
+    first = live.open_stream(last_id=2)
+    assert next(first).startswith("retry: ")
+    assert live.open_stream() is None
+
+    first.close()
+    second = live.open_stream(last_id=2)
+    assert second is not None
+    second.close()
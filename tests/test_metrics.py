@@ -0,0 +1,52 @@
+import os, json
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _dead_worker(folder, n):
+    # pid 0 never names a worker, so the file always reads as dead.
+    data = {
+        "counters": [["test_dead_total", [["role", "waiver"]], n]],
+        "hists": [
+            [
+                "test_dead_seconds",
+                [],
+                {
+                    "buckets": [1] + [0] * len(metrics.BUCKETS),
+                    "sum": 0.001,
+                    "count": 1,
+                },
+            ]
+        ],
+    }
+    (folder / "0-1.json").write_text(json.dumps(data))
+
+
+def _total(name, **labels):
+    counters, _ = metrics.collect()
+    return counters.get(metrics._key(name, labels), 0.0)
+
+
+def test_live_counters_are_merged():
+    metrics.inc("test_live_total", 3, role="gm")
+    assert _total("test_live_total", role="gm") == 3
+
+
+def test_dead_workers_counts_are_archived_not_dropped(folder):
+    _dead_worker(folder, 5)
+    assert _total("test_dead_total", role="waiver") == 5
+    assert not (folder / "0-1.json").exists()
+    assert _total("test_dead_total", role="waiver") == 5
+
+    _dead_worker(folder, 2)
+    assert _total("test_dead_total", role="waiver") == 7
+    _, hists = metrics.collect()
+    assert hists[("test_dead_seconds", ())]["count"] == 2
@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+
+import news
+from conftest import fixture_path
+
+FEEDS = ("news_wire.xml", "news_site.xml", "news_atom.xml", "news_feed.json")
+
+
+def _stories(name):
+    with open(fixture_path(name), "rb") as f:
+        return news.parse_feed(f.read(), name)
+
+
+def _all():
+    return [s for name in FEEDS for s in _stories(name)]
+
+
+def test_parse_rss():
+    stories = _stories("news_wire.xml")
+    assert len(stories) == 3
+    first = stories[0]
+    assert first["title"].startswith("Chiefs' Patrick Mahomes limited")
+    assert first["url"] == "https://wire.example/nfl/mahomes-ankle"
+    assert "<p>" not in first["summary"] and first["summary"].startswith("Kansas")
+    assert (
+        first["published"]
+        == datetime(2025, 9, 10, 18, 5, tzinfo=timezone.utc).timestamp()
+    )
+    assert first["source"] == "news_wire.xml"
+
+
+def test_parse_atom_and_json_feed():
+    atom = _stories("news_atom.xml")
+    assert [s["url"] for s in atom] == [
+        "https://atom.example/bijan-hamstring",
+        "https://atom.example/chase-rest",
+    ]
+    # <updated> stands in for a missing <published>.
+    assert (
+        atom[1]["published"]
+        == datetime(2025, 9, 10, 20, 40, tzinfo=timezone.utc).timestamp()
+    )
+    feed = _stories("news_feed.json")
+    assert [s["title"] for s in feed] == [
+        "Puka Nacua catches 11 passes in Rams opener",
+        "Puka Nacua not on Rams injury report",
+    ]
+    assert feed[1]["summary"].startswith("Puka Nacua was not listed")
+
+
+def test_syndicated_copies_fold_into_one_story():
+    index = news.Index(_all())
+    assert len(index.stories) == 7
+    folded = {s["url"]: s.get("sources") for s in index.stories.values()}
+    assert folded["https://wire.example/nfl/mahomes-ankle"] == ["news_site.xml"]
+    assert folded["https://wire.example/nfl/bijan-workload"] == ["news_site.xml"]
+    assert folded["https://wire.example/nfl/chase-rest"] == ["news_atom.xml"]
+
+
+def test_separate_stories_about_one_player_are_kept():
+    index = news.Index(_all())
+    urls = {s["url"] for s in index.stories.values()}
+    assert "https://site.example/story/mahomes-full-practice" in urls
+    assert "https://atom.example/bijan-hamstring" in urls
+    assert {"https://json.example/items/1", "https://json.example/items/2"} <= urls
+
+
+def test_for_players_newest_first_within_window():
+    index = news.Index(_all())
+    now = datetime(2025, 9, 12, 18, 0, tzinfo=timezone.utc).timestamp()
+    found = index.for_players(["Patrick Mahomes", "Bijan Robinson", "Nobody"], 72, now)
+    assert [s["url"] for s in found["Patrick Mahomes"]] == [
+        "https://site.example/story/mahomes-full-practice",
+        "https://wire.example/nfl/mahomes-ankle",
+    ]
+    assert found["Bijan Robinson"][0]["url"] == "https://atom.example/bijan-hamstring"
+    assert "Nobody" not in found
+    recent = index.for_players(["Patrick Mahomes"], 1, now)
+    assert [s["url"] for s in recent["Patrick Mahomes"]] == [
+        "https://site.example/story/mahomes-full-practice"
+    ]
+
+
+def test_expire_drops_old_stories():
+    index = news.Index(_all())
+    cutoff = datetime(2025, 9, 11, tzinfo=timezone.utc).timestamp()
+    dropped = index.expire(cutoff)
+    assert dropped == 5
+    assert {s["url"] for s in index.stories.values()} == {
+        "https://site.example/story/mahomes-full-practice",
+        "https://atom.example/bijan-hamstring",
+    }
+    # An expired story no longer swallows a fresh copy of itself.
+    assert index.add(_stories("news_wire.xml")[0])
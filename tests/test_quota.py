@@ -0,0 +1,90 @@
+import pytest
+
+import quota
+
+
+@pytest.fixture(autouse=True)
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(quota, "DB_FILE", str(tmp_path / "quota.sqlite"))
+    monkeypatch.setattr(quota._local, "conn", None, raising=False)
+    monkeypatch.setenv("QUOTA_TESTAPI", "10/day,4")
+    yield
+    conn = getattr(quota._local, "conn", None)
+    if conn is not None:
+        conn.close()
+    quota._local.conn = None
+
+
+def test_unlimited_provider_always_granted():
+    assert all(quota.acquire("no_such_provider") for _ in range(100))
+
+
+def test_limits_from_env():
+    assert quota.limits("testapi") == (10.0, "day", 4.0)
+    assert quota.limits("stormglass") == (10.0, "day", 2.5)
+
+
+def test_bucket_holds_the_burst():
+    granted = [quota.acquire("testapi", level="critical") for _ in range(6)]
+    assert granted == [True] * 4 + [False] * 2
+
+
+def test_lower_priorities_leave_a_reserve():
+    # low must leave half of the 4-token burst, normal a fifth of it.
+    assert [quota.acquire("testapi", level="low") for _ in range(3)] == [
+        True,
+        True,
+        False,
+    ]
+    assert quota.acquire("testapi", level="normal")
+    assert not quota.acquire("testapi", level="normal")
+    assert quota.acquire("testapi", level="critical")
+
+
+def test_period_quota_is_a_hard_cap():
+    conn = quota._db()
+    for _ in range(3):
+        while quota.acquire("testapi", level="critical"):
+            pass
+        # Refill the bucket by hand, as hours of elapsed time would.
+        conn.execute("UPDATE buckets SET tokens = 4")
+    assert quota.report()["testapi"]["used"] == 10.0
+    assert not quota.acquire("testapi", level="critical")
+
+
+def test_refund_returns_tokens_and_quota():
+    assert quota.acquire("testapi", cost=4, level="critical")
+    assert not quota.acquire("testapi", level="critical")
+    quota.refund("testapi", 4)
+    assert quota.acquire("testapi", cost=4, level="critical")
+    assert quota.report()["testapi"]["used"] == 4.0
+
+
+def test_report_counts_the_period():
+    quota.acquire("testapi", cost=3, level="critical")
+    quota.acquire("testapi", cost=3, level="critical")  # denied: bucket at 1
+    r = quota.report()["testapi"]
+    assert (r["quota"], r["used"], r["remaining"], r["denied_24h"]) == (
+        10.0,
+        3.0,
+        7.0,
+        1,
+    )
+    assert 0 < r["resets_in_hours"] <= 24
+
+
+def test_limited_serves_stale_when_denied(monkeypatch):
+    monkeypatch.setenv("QUOTA_TESTAPI", "10/day,1")
+    calls = []
+
+    @quota.limited("testapi")
+    def fetch(team):
+        calls.append(team)
+        return {"team": team, "temp": 50}
+
+    with quota.priority("critical"):
+        assert fetch("BUF") == {"team": "BUF", "temp": 50}
+        stale = fetch("BUF")
+        assert stale["stale"] is True and stale["temp"] == 50
+        assert fetch("KC") == {"error": "quota_exhausted:testapi"}
+    assert calls == ["BUF"]
@@ -0,0 +1,60 @@
+import os, json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import retention
+
+
+@pytest.fixture
+def out(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    return tmp_path
+
+
+def _write(folder, kind, ts, data):
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{kind}_{ts:{retention.TS_FORMAT}}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    return path
+
+
+def test_old_days_keep_their_last_file_per_kind(out):
+    old = datetime.now(timezone.utc).replace(hour=9) - timedelta(days=30)
+    new = datetime.now(timezone.utc) - timedelta(hours=1)
+    folder = str(out / "runs")
+    for h in range(3):
+        _write(folder, "waiver", old + timedelta(hours=h), {"n": h})
+    _write(folder, "gm", old, {"n": "gm"})
+    fresh = _write(folder, "waiver", new, {"n": "fresh"})
+
+    result = retention.compact_files(days=14, sources=(folder,))
+    assert result["files_deleted"] == 4 and result["archived"] == 2
+    assert os.listdir(folder) == [os.path.basename(fresh)]
+    kept = list(retention.history("waiver"))
+    assert [e["data"] for e in kept] == [{"n": 2}]
+    assert [e["data"] for e in retention.history("gm")] == [{"n": "gm"}]
+
+    # A re-run after an interrupted pass packs nothing twice.
+    _write(folder, "waiver", old + timedelta(hours=2), {"n": 2})
+    assert retention.compact_files(days=14, sources=(folder,))["archived"] == 0
+
+
+def test_unreadable_last_file_keeps_the_day(out):
+    old = datetime.now(timezone.utc).replace(hour=9) - timedelta(days=30)
+    folder = str(out / "runs")
+    first = _write(folder, "waiver", old, {"n": 0})
+    last = _write(folder, "waiver", old + timedelta(hours=1), {})
+    with open(last, "w") as f:
+        f.write("{truncated")
+    result = retention.compact_files(days=14, sources=(folder,))
+    assert result["files_deleted"] == 0
+    assert os.path.exists(first) and os.path.exists(last)
+
+
+def test_runs_are_downsampled_per_team():
+    sql = retention._downsample_sql("runs", {"id", "ts", "kind", "payload"})
+    assert "PARTITION BY kind, payload->>'team', date_trunc('day', ts)" in sql
+    sql = retention._downsample_sql("snapshots", {"id", "timestamp", "data"})
+    assert "->>'team'" not in sql
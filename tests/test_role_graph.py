@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+import role_graph
+
+
+@pytest.fixture
+def graph(tmp_path, monkeypatch):
+    """Two inputs and three roles standing in for the real ones."""
+    calls = []
+    inputs = {
+        "a": lambda team: {"a": 1},
+        "b": lambda team: {"error": "upstream down"},
+    }
+
+    def role(name, delay=0.0):
+        def fn(**kw):
+            time.sleep(delay)
+            calls.append(name)
+            return {"role": name, "inputs": sorted(kw)}
+
+        return fn
+
+    roles = {
+        "slow": (("a",), role("slow", 0.05)),
+        "fast": (("a",), role("fast")),
+        "degraded": (("a", "b"), role("degraded")),
+        "broken": (("a",), lambda a: 1 / 0),
+    }
+    monkeypatch.setattr(role_graph, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(role_graph, "_memo", {})
+    monkeypatch.setattr(role_graph, "SHARED", {})
+    monkeypatch.setattr(role_graph, "PER_TEAM", inputs)
+    monkeypatch.setattr(role_graph, "INPUTS", inputs)
+    monkeypatch.setattr(role_graph, "ROLES", roles)
+    return calls
+
+
+def test_build_graph_adds_inputs():
+    graph = role_graph.build_graph(["waiver"])
+    assert graph["waiver"] == role_graph.ROLES["waiver"][0]
+    assert all(graph[d] == () for d in graph["waiver"])
+
+
+def test_roles_start_after_their_inputs(graph):
+    results, timings = role_graph.run(["slow", "fast"])
+    assert results["fast"] == {"role": "fast", "inputs": ["a"]}
+    for role in ("slow", "fast"):
+        assert timings[role]["start"] >= timings["a"]["end"]
+    assert timings["fast"]["end"] < timings["slow"]["end"]
+    assert timings["_critical_path"] == ["a", "slow"]
+
+
+def test_role_error_is_reported_not_raised(graph):
+    results, _ = role_graph.run(["broken", "fast"])
+    assert "division by zero" in results["broken"]["error"]
+    assert results["fast"]["role"] == "fast"
+
+
+def test_fingerprint_ignores_volatile_keys_and_float_noise():
+    a = {"odds": [{"spread": 3.0000001, "updated": "10:00"}]}
+    b = {"odds": [{"spread": 3.0, "updated": "10:05"}]}
+    assert role_graph.fingerprint(a) == role_graph.fingerprint(b)
+    assert role_graph.fingerprint(a) != role_graph.fingerprint({"odds": []})
+
+
+def test_unchanged_inputs_hit_the_cache(graph, monkeypatch):
+    seen = []
+    role_graph.run(["fast"], on_result=lambda role, out: seen.append(role))
+    _, timings = role_graph.run(["fast"], on_result=lambda r, o: seen.append(r))
+    assert graph == ["fast"]
+    assert timings["fast"]["cached"]
+    # Every run is recorded, cached or not.
+    assert seen == ["fast", "fast"]
+
+    monkeypatch.setitem(role_graph.INPUTS, "a", lambda team: {"a": 2})
+    _, timings = role_graph.run(["fast"])
+    assert graph == ["fast", "fast"]
+    assert not timings["fast"]["cached"]
+
+
+def test_outputs_from_failed_inputs_are_not_cached(graph):
+    role_graph.run(["degraded"])
+    _, timings = role_graph.run(["degraded"])
+    assert graph == ["degraded", "degraded"]
+    assert not timings["degraded"]["cached"]
@@ -0,0 +1,81 @@
+import os, json
+
+import pytest
+
+import scout_logic
+from test_yahoo_parse import ME, _roster, _transaction
+
+RIVAL = "461.l.881883.t.7"
+
+
+@pytest.fixture(autouse=True)
+def state(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setattr(scout_logic, "STATE_FILE", str(tmp_path / "profiles.json"))
+    monkeypatch.setattr(scout_logic, "_profiles", None)
+
+
+def _league(*transactions):
+    return {
+        "fantasy_content": {
+            "league": [
+                {"league_key": "461.l.881883"},
+                {
+                    "transactions": {
+                        **{str(i): t for i, t in enumerate(transactions)},
+                        "count": len(transactions),
+                    }
+                },
+            ]
+        }
+    }
+
+
+def test_same_second_transactions_are_not_dropped():
+    first = _transaction("tr.1", 1757500000, [(7, "add", "freeagents", RIVAL)])
+    second = _transaction("tr.2", 1757500000, [(8, "add", "freeagents", RIVAL)])
+    scout_logic.ingest(transactions=_league(first))
+    scout_logic.ingest(transactions=_league(first, second))
+    scout_logic.ingest(transactions=_league(first, second))
+    assert scout_logic._load()[RIVAL]["fa_adds"] == 2
+
+
+def test_profiles_reload_when_another_process_saves(recorded):
+    scout_logic.ingest(rosters=[recorded("teams_raw.json")])
+    assert scout_logic.profile("Mark")["team_key"] == ME
+    # Another process (cron) saves new profiles; this one picks them up.
+    with open(scout_logic.STATE_FILE, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    rows[ME]["manager"] = "Marcus"
+    with open(scout_logic.STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump(rows, f)
+    os.utime(scout_logic.STATE_FILE, ns=(1, 1))
+    assert scout_logic.profile("Mark") is None
+    assert scout_logic.profile("Marcus")["team_key"] == ME
+
+
+def test_scout_reports_opponent_news(recorded, monkeypatch):
+    scout_logic.ingest(rosters=[recorded("teams_raw.json")])
+    asked = []
+
+    def for_players(names, hours):
+        asked.extend(names)
+        return {"Travis Kelce": [{"title": "Kelce limited", "url": "u/1"}]}
+
+    monkeypatch.setattr(scout_logic.news, "for_players", for_players)
+    opponents = [
+        {"key": RIVAL, "team": "Kimochi Inc.", "roster": [{"name": "Travis Kelce"}]}
+    ]
+    out = scout_logic.run_scout_logic({}, {}, {}, opponents)
+    assert asked == ["Travis Kelce"]
+    assert out["news"] == [
+        {"player": "Travis Kelce", "title": "Kelce limited", "url": "u/1"}
+    ]
+
+
+def test_scout_never_reports_on_our_own_team(recorded, monkeypatch):
+    monkeypatch.setattr(scout_logic.news, "for_players", lambda names, hours: {})
+    league = recorded("teams_raw.json")
+    scout_logic.ingest(rosters=[league])
+    out = scout_logic.run_scout_logic(_roster(), {}, {}, league)
+    assert out["manager"] != scout_logic.profile(ME)["manager"]
@@ -0,0 +1,77 @@
+import numpy as np
+
+import season_sim
+
+SETTINGS = {
+    "current_week": 1,
+    "end_week": 17,
+    "playoff_start_week": 4,
+    "num_playoff_teams": 6,
+    "reseeding": False,
+}
+
+
+def _sim(means, n_sims=4000, seed=7, **settings):
+    names = [f"team {i}" for i in range(len(means))]
+    weeks = [1, 2, 3]
+    sched = season_sim.build_schedule(len(names), weeks, {})
+    zeros = [0] * len(names)
+    return season_sim.SeasonSim(
+        names,
+        np.asarray(means, dtype=np.float64),
+        weeks,
+        sched,
+        zeros,
+        zeros,
+        {**SETTINGS, **settings},
+        n_sims=n_sims,
+        seed=seed,
+    )
+
+
+def test_schedule_pairs_every_team_each_week():
+    sched = season_sim.build_schedule(8, [1, 2, 3], {1: {(0, 5)}})
+    assert sched[0][0] == 5 and sched[0][5] == 0
+    for opp in sched:
+        assert sorted(opp[opp]) == list(range(8))
+
+
+def test_draws_are_float32_and_seeded():
+    a, b = _sim([110.0] * 8), _sim([110.0] * 8)
+    assert a.scores.dtype == np.float32
+    assert np.array_equal(a.scores, b.scores)
+    assert abs(float(a.scores.mean()) - 110.0) < 1.0
+
+
+def test_odds_add_up_and_follow_strength():
+    odds = _sim(np.linspace(90.0, 130.0, 8)).odds()
+    assert abs(sum(t["playoff_odds"] for t in odds) - 6.0) < 1e-9
+    # Six playoff teams in a three-round bracket: the top two seeds sit out one.
+    assert abs(sum(t["bye_odds"] for t in odds) - 2.0) < 1e-9
+    assert abs(sum(t["title_odds"] for t in odds) - 1.0) < 1e-9
+    assert odds[0]["team"] == "team 7"
+    assert odds[-1]["title_odds"] < odds[0]["title_odds"]
+
+
+def test_bracket_with_byes_and_chalk():
+    sim = _sim([110.0] * 8, n_sims=3)
+    # Team t always scores t: the higher team index wins every game.
+    sim.playoff_scores[:] = np.arange(8, dtype=np.float32)
+    seeds = np.tile(np.array([0, 1, 2, 3, 4, 5]), (3, 1))
+    assert list(sim._bracket(seeds, byes=2)) == [5, 5, 5]
+    # Reversed scores: the top seed, which had a bye, wins the title.
+    sim.playoff_scores[:] = np.arange(8, 0, -1, dtype=np.float32)
+    assert list(sim._bracket(seeds, byes=2)) == [0, 0, 0]
+
+
+def test_final_week_replaces_its_draws():
+    sim = _sim([110.0] * 8, n_sims=10)
+    opp = sim.sched[0]
+    winner = int(np.flatnonzero(opp >= 0)[0])
+    points = {t: 100.0 for t in range(8)}
+    points[winner] = 150.0
+    sim.apply_final(1, points)
+    wins, pf = sim.standings()
+    assert sim.final_weeks == [1]
+    assert sim.base_wins[winner] == 1.0 and sim.base_wins[opp[winner]] == 0.0
+    assert np.all(pf[:, winner] >= 150.0)
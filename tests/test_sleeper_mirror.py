@@ -0,0 +1,33 @@
+import io, json
+
+import pytest
+
+import sleeper_mirror
+
+DOCS = [
+    '{"a": 12345, "b": 1e5}',
+    '{"a": -1.25e-3, "b": [1.5, 2E+2], "c": true, "d": null, "e": "x.e"}',
+    '{"4034": {"first_name": "Patrick", "age": 30.1, "fantasy_positions": ["QB"]}, "k": 10}',
+    "{}",
+    ' \n{ "a" : 0 , "b" : -0.5 }\n',
+]
+
+
+@pytest.mark.parametrize("doc", DOCS)
+@pytest.mark.parametrize("chunk", range(1, 12))
+def test_iter_object_any_chunk_size(doc, chunk):
+    got = dict(sleeper_mirror.iter_object(io.StringIO(doc), chunk))
+    assert got == json.loads(doc)
+
+
+def test_iter_object_is_lazy():
+    members = sleeper_mirror.iter_object(io.StringIO('{"a": 1, "b": oops}'), 4)
+    assert next(members) == ("a", 1)
+    with pytest.raises(ValueError):
+        next(members)
+
+
+@pytest.mark.parametrize("doc", ['{"a": 1', '{"a" 1}', "[1, 2]", '{"a": 1,'])
+def test_iter_object_rejects_bad_documents(doc):
+    with pytest.raises(ValueError):
+        list(sleeper_mirror.iter_object(io.StringIO(doc), 3))
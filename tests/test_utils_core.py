@@ -0,0 +1,85 @@
+import pytest
+
+import utils_core
+from test_yahoo_parse import _player
+
+
+@pytest.fixture
+def yahoo(monkeypatch):
+    """League metadata served per league key, counting the calls."""
+    leagues, calls = {}, []
+
+    def get(path, timeout=12):
+        calls.append(path)
+        meta = leagues.get(path.split("/", 1)[1])
+        if meta is None:
+            return {"error": "404 Client Error"}
+        return {"fantasy_content": {"league": [meta]}}
+
+    monkeypatch.setattr(utils_core, "yahoo_get", get)
+    utils_core._fetch_league_meta.cache_clear()
+    yield leagues, calls
+    utils_core._fetch_league_meta.cache_clear()
+
+
+def _meta(start, current, end=17):
+    return {
+        "start_date": start,
+        "start_week": "1",
+        "end_week": str(end),
+        "current_week": str(current),
+    }
+
+
+def test_current_week_follows_the_live_league(yahoo):
+    leagues, calls = yahoo
+    # Seasons that start later than today: only Yahoo's current_week counts.
+    leagues["461.l.1"] = _meta("2099-09-03", 9)
+    leagues["461.l.2"] = _meta("2099-09-03", 11, end=14)
+    assert utils_core.current_week(league_key="461.l.1") == 9
+    assert utils_core.current_week(league_key="461.l.2") == 11
+    assert utils_core.season("461.l.2")[2] == 14
+    fetched = len(calls)
+
+    # Cached per league until the TTL runs out.
+    leagues["461.l.1"] = _meta("2099-09-03", 12)
+    assert utils_core.current_week(league_key="461.l.1") == 9
+    assert len(calls) == fetched
+
+
+def test_recorded_settings_stand_in_when_yahoo_fails(yahoo):
+    _, calls = yahoo
+    assert utils_core.league_meta("461.l.404") is utils_core.LEAGUE_META
+    assert utils_core.season("461.l.404") == (
+        utils_core.SEASON_START,
+        utils_core.START_WEEK,
+        utils_core.END_WEEK,
+    )
+    # The failure is remembered for LEAGUE_META_RETRY, not refetched per call.
+    assert calls == ["league/461.l.404"]
+
+
+def test_weeks_count_from_the_tuesday_before_the_start(yahoo):
+    leagues, _ = yahoo
+    leagues["461.l.1"] = _meta("2025-09-04", 1)  # a Thursday
+    start, first, last = utils_core.season("461.l.1")
+    assert (start.weekday(), start.day) == (1, 2)
+    assert utils_core.nfl_week(start.replace(day=8), "461.l.1") == 1
+    assert utils_core.nfl_week(start.replace(day=9), "461.l.1") == 2
+    assert utils_core.nfl_week(start.replace(month=8), "461.l.1") == 0
+
+
+def test_yahoo_players_stop_at_the_page_cap(monkeypatch):
+    calls = []
+
+    def get(path, timeout=12):
+        calls.append(path)
+        start = len(calls) * 2
+        players = {str(i): _player(start + i, f"P{start + i}", "WR") for i in (0, 1)}
+        league = [{"league_key": "461.l.1"}, {"players": {**players, "count": 2}}]
+        return {"fantasy_content": {"league": league}}
+
+    monkeypatch.setattr(utils_core, "yahoo_get", get)
+    got = utils_core.fetch_yahoo_players("461.l.1", pages=3, count=2)
+    assert len(calls) == 3 and len(got["players"]) == 6
+    assert calls[-1].endswith("players;start=4;count=2")
@@ -0,0 +1,88 @@
+import waiver_logic
+
+
+def _candidates(*gains):
+    positions = ("RB", "WR", "TE", "QB")
+    return [
+        {
+            "player": {"id": f"{pos}_{i}", "name": f"FA {i}"},
+            "position": pos,
+            "gain": gain,
+            "drop": None,
+        }
+        for i, (gain, pos) in enumerate(zip(gains, positions))
+    ]
+
+
+def _bids(plan):
+    return {c["position"]: bid for c, bid, _ in plan}
+
+
+def test_no_candidates_or_room():
+    assert waiver_logic.plan_claims([], 100, 3, True) == []
+    assert waiver_logic.plan_claims(_candidates(5.0), 100, 0, True) == []
+
+
+def test_faab_plan_fits_budget_and_claim_limit():
+    plan = waiver_logic.plan_claims(_candidates(5.0, 3.0, 1.0), 100, 2, True)
+    assert 0 < len(plan) <= 2
+    assert sum(bid for _, bid, _ in plan) <= 100
+    assert all(0.0 <= p <= 1.0 for _, _, p in plan)
+    # Ranked by expected gain, best claim first.
+    scores = [c["gain"] * p for c, _, p in plan]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_one_claim_per_position():
+    same = [dict(c, position="WR") for c in _candidates(5.0, 4.0, 3.0)]
+    plan = waiver_logic.plan_claims(same, 100, 3, True)
+    assert len(plan) == 1
+
+
+def test_dollars_are_worth_more_early_in_the_season():
+    cands = _candidates(5.0, 3.0, 1.0)
+    early = _bids(waiver_logic.plan_claims(cands, 100, 3, True, weeks_left=8))
+    late = _bids(waiver_logic.plan_claims(cands, 100, 3, True, weeks_left=0))
+    assert sum(early.values()) < sum(late.values())
+    assert all(early.get(pos, 0) <= bid for pos, bid in late.items())
+
+
+def test_claims_that_do_not_pay_for_their_bid_are_dropped():
+    cost = waiver_logic.dollar_cost([5.0, 0.2], 100, 8)
+    plan = waiver_logic.plan_claims(_candidates(5.0, 0.2), 100, 2, True, weeks_left=8)
+    assert all(c["gain"] > cost * bid for c, bid, _ in plan)
+
+
+def test_rolling_priority_bids_nothing():
+    plan = waiver_logic.plan_claims(
+        _candidates(5.0, 3.0), 100, 2, False, rivals_ahead=5
+    )
+    assert len(plan) == 2
+    assert all(bid == 0 for _, bid, _ in plan)
+    # The best free agent draws the most rival interest.
+    probs = {c["position"]: p for c, _, p in plan}
+    assert probs["RB"] < probs["WR"] <= 1.0
+
+
+def test_two_claims_never_release_the_same_player():
+    bench = {"id": "RB_8", "name": "Bench Back", "projection": 1.0}
+    cands = [dict(c, drop=bench, drops=[bench]) for c in _candidates(5.0, 3.0)]
+    plan = waiver_logic.plan_claims(cands, 100, 2, True, open_slots=0)
+    assert len(plan) == 1
+    assert plan[0][0]["drop"] is bench
+
+    # A second bench player lets both claims through, one drop each.
+    spare = {"id": "WR_9", "name": "Bench Wideout", "projection": 2.0}
+    cands = [dict(c, drops=[bench, spare]) for c in cands]
+    plan = waiver_logic.plan_claims(cands, 100, 2, True, open_slots=0)
+    assert sorted(c["drop"]["id"] for c, _, _ in plan) == ["RB_8", "WR_9"]
+
+
+def test_open_roster_spots_are_used_before_drops():
+    bench = {"id": "RB_8", "name": "Bench Back", "projection": 1.0}
+    cands = [dict(c, drops=[None, bench]) for c in _candidates(5.0, 3.0)]
+    plan = waiver_logic.plan_claims(cands, 100, 2, True, open_slots=1)
+    assert sorted(str(c["drop"] and c["drop"]["id"]) for c, _, _ in plan) == [
+        "None",
+        "RB_8",
+    ]
@@ -0,0 +1,57 @@
+import pytest
+
+import projections, whatif
+from test_yahoo_parse import _player, _roster
+
+POINTS = {"QB": 20.0, "RB": 12.0, "WR": 11.0, "TE": 8.0, "K": 7.0, "DEF": 6.0}
+
+
+class _Proj:
+    """Fixed projections: a position's base less the last digit of the id."""
+
+    def annotate(self, players):
+        return [
+            {
+                **p,
+                "projection": POINTS[p["position"]] - int(p["id"].split("_")[1]) % 10,
+                "ros": 10.0,
+            }
+            for p in players
+        ]
+
+
+@pytest.fixture
+def roster(monkeypatch):
+    monkeypatch.setattr(projections, "current", lambda odds, weather: _Proj())
+    players = [("QB", 1), ("QB", 2), ("RB", 11), ("RB", 12), ("RB", 13)]
+    players += [("WR", 21), ("WR", 22), ("WR", 23), ("WR", 24), ("TE", 31)]
+    players += [("K", 41), ("DEF", 51)]
+    return _roster(*(_player(i, f"{pos} {i}", pos) for pos, i in players))
+
+
+def _run(roster, *scenarios, seed=7):
+    out = whatif.evaluate(roster, {}, {}, list(scenarios), trials=500, seed=seed)
+    return {s["name"]: s for s in out["scenarios"]}
+
+
+def test_an_unchanged_lineup_has_exactly_zero_delta(roster):
+    same = _run(roster, {"name": "same"}, {"name": "noop", "sit": ["WR_24"]})
+    for s in same.values():
+        assert s["delta_points"] == s["delta_points_se"] == 0.0
+        assert s["delta_win_prob"] == s["delta_win_prob_se"] == 0.0
+
+
+def test_deltas_are_paired_across_scenarios(roster):
+    out = whatif.evaluate(roster, {}, {}, [{"sit": ["WR 21"]}], trials=500, seed=7)
+    base, (sit,) = out["baseline"], out["scenarios"]
+    assert "WR 23" in sit["lineup"] and "WR 21" not in sit["lineup"]
+    assert sit["projected_points"] - base["projected_points"] == -2.0
+    # Only the swapped pair's draws differ, so the paired error is far
+    # below the spread of either team score.
+    assert sit["delta_points"] == pytest.approx(-2.0, abs=4 * sit["delta_points_se"])
+    assert sit["delta_points_se"] * 10 < base["ceiling"] - base["floor"]
+
+
+def test_a_seed_makes_runs_repeatable(roster):
+    scenario = {"name": "bench WR", "sit": ["WR_21"]}
+    assert _run(roster, scenario) == _run(roster, scenario)
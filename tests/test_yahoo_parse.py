@@ -0,0 +1,166 @@
+import yahoo_parse
+
+ME = "461.l.881883.t.1"
+
+
+def _player(pid, name, pos, selected="", status="", points=None, projection=None):
+    node = [
+        [
+            {"player_key": f"461.p.{pid}"},
+            {"player_id": str(pid)},
+            {"name": {"full": name}},
+            {"editorial_team_abbr": "kc"},
+            {"display_position": pos},
+            {"eligible_positions": [{"position": p} for p in pos.split(",")]},
+            {"status": status},
+        ]
+    ]
+    if selected:
+        node.append(
+            {"selected_position": [{"coverage_type": "week"}, {"position": selected}]}
+        )
+    if points is not None:
+        node.append({"player_points": {"total": str(points)}})
+    if projection is not None:
+        node.append({"player_projected_points": {"total": str(projection)}})
+    return {"player": node}
+
+
+def _roster(*players, week=3):
+    return {
+        "fantasy_content": {
+            "team": [
+                [{"team_key": ME}, {"team_id": "1"}, {"name": "SLAMDUNK"}],
+                {
+                    "roster": {
+                        "week": str(week),
+                        "0": {
+                            "players": {
+                                **{str(i): p for i, p in enumerate(players)},
+                                "count": len(players),
+                            }
+                        },
+                    }
+                },
+            ]
+        }
+    }
+
+
+def _transaction(key, ts, moves, faab=None):
+    meta = {
+        "transaction_key": key,
+        "type": "add/drop",
+        "status": "successful",
+        "timestamp": str(ts),
+    }
+    if faab is not None:
+        meta["faab_bid"] = str(faab)
+    players = {}
+    for i, (pid, kind, source, dest) in enumerate(moves):
+        data = {"type": kind}
+        data["source_team_key" if ".t." in source else "source_type"] = source
+        data["destination_team_key" if ".t." in dest else "destination_type"] = dest
+        players[str(i)] = {
+            "player": [
+                [
+                    {"player_key": f"461.p.{pid}"},
+                    {"player_id": str(pid)},
+                    {"name": {"full": f"P{pid}"}},
+                    {"display_position": "WR"},
+                ],
+                {"transaction_data": [data]},
+            ]
+        }
+    players["count"] = len(moves)
+    return {"transaction": [meta, {"players": players}]}
+
+
+def test_roster_players():
+    payload = _roster(
+        _player(1, "Patrick Mahomes", "QB", "QB", points=24.5, projection=21.0),
+        _player(2, "Travis Kelce", "TE", "BN", status="Q"),
+    )
+    team = yahoo_parse.team(payload)
+    assert (team.key, team.name) == (ME, "SLAMDUNK")
+    qb, te = team.players
+    assert (qb.name, qb.team, qb.selected_position, qb.points, qb.projection) == (
+        "Patrick Mahomes",
+        "KC",
+        "QB",
+        24.5,
+        21.0,
+    )
+    assert (te.selected_position, te.status, te.eligible) == ("BN", "Q", ("TE",))
+    assert [p["id"] for p in yahoo_parse.player_dicts(payload)] == ["QB_1", "TE_2"]
+
+
+def test_results_are_cached_by_content():
+    a = _roster(_player(1, "A", "WR"))
+    b = _roster(_player(1, "A", "WR"))
+    assert yahoo_parse.roster(a) is yahoo_parse.roster(b)
+    assert yahoo_parse.roster(_roster(_player(1, "B", "WR")))[0].name == "B"
+
+
+def test_error_payloads_parse_empty():
+    assert yahoo_parse.roster({"error": "quota_exhausted:yahoo"}) == ()
+    assert yahoo_parse.team(None) == ()
+
+
+def test_league_teams(recorded):
+    teams = yahoo_parse.teams(recorded("teams_raw.json"))
+    assert len(teams) == 12
+    assert (teams[0].key, teams[0].name, teams[0].manager) == (ME, "SLAMDUNK", "Mark")
+
+
+def test_matchups_and_opponent(recorded):
+    payload = recorded("matchups.json")
+    weeks = yahoo_parse.matchups(payload)
+    assert len(weeks) == 14 and weeks[0].week == 1
+    assert yahoo_parse.matchup_opponent(payload, ME) == "461.l.881883.t.7"
+    assert yahoo_parse.matchup_opponent(payload, "nobody") is None
+
+
+def test_opponent_rosters_puts_first_in_front(recorded):
+    opps = yahoo_parse.opponent_rosters(
+        recorded("teams_raw.json"), ME, "461.l.881883.t.7"
+    )
+    assert len(opps) == 11
+    assert opps[0]["key"] == "461.l.881883.t.7"
+    assert ME not in {o["key"] for o in opps}
+
+
+def test_transactions():
+    payload = {
+        "fantasy_content": {
+            "league": [
+                {"league_key": "461.l.881883"},
+                {
+                    "transactions": {
+                        "0": _transaction(
+                            "461.l.881883.tr.2",
+                            1757500000,
+                            [(7, "add", "waivers", ME), (8, "drop", ME, "waivers")],
+                            faab=12,
+                        ),
+                        "count": 1,
+                    }
+                },
+            ]
+        }
+    }
+    (t,) = yahoo_parse.transactions(payload)
+    assert (t.key, t.type, t.timestamp, t.faab_bid) == (
+        "461.l.881883.tr.2",
+        "add/drop",
+        1757500000,
+        12,
+    )
+    add, drop = t.moves
+    assert (add.type, add.source, add.destination, add.name) == (
+        "add",
+        "waivers",
+        ME,
+        "P7",
+    )
+    assert (drop.type, drop.source, drop.destination) == ("drop", ME, "waivers")
@@ -1,19 +1,34 @@
-import os, json, subprocess
+import os, json, time, subprocess
 from datetime import datetime
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, abort, g, jsonify, request, send_from_directory, stream_with_context
 import psycopg2
-import numpy as np
 
-import utils_core, team_logic, general_manager_logic, waiver_logic, scout_logic, learning, notifications
+import metrics, utils_core, notifications, news, role_graph, season_sim, scout_logic, yahoo_auth
+import static_assets, log_config, leagues, live, quota, whatif, yahoo_parse, dataplane
+import analytics_export
 from thanos_council import consult_council
 from llm_adapter import llm_generate
 
+log = log_config.setup("thanos")
+access_log = log.getChild("access")  # one line per request, never deduped
 app = Flask(__name__, static_folder="static")
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Upstream quota priority per route (quota.RESERVE); anything else is "normal".
+ROUTE_PRIORITY = {
+    "/api/run/head_coach": "critical",
+    "/api/live": "critical",
+    "/api/live/stream": "critical",
+    "/api/history": "low",
+    "/api/analytics/<kind>": "low",
+    "/api/season": "low",
+    "/api/data_ingest": "low",
+    "/api/scheduler/teams": "low",
+}
 
 def get_db_conn():
     return psycopg2.connect(DATABASE_URL)
 
+@metrics.timed("db_write")
 def save_run_to_db(kind, payload):
     try:
         conn = get_db_conn()
@@ -29,22 +44,61 @@ def save_run_to_db(kind, payload):
         cur.close()
         conn.close()
     except Exception as e:
-        print(f"DB save failed: {e}")
+        metrics.inc("db_errors_total", op="write")
+        log.warning("DB save failed", extra={"kind": kind, "error": str(e)})
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else None
+    g.quota_token = quota.set_priority(ROUTE_PRIORITY.get(route, "normal"))
+
+@app.teardown_request
+def _reset_priority(exc=None):
+    token = g.pop("quota_token", None)
+    if token is not None:
+        quota.reset_priority(token)
+
+@app.after_request
+def _record_request(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe("http_request_seconds", time.perf_counter() - start, route=route)
+        metrics.inc("http_requests_total", route=route, status=response.status_code)
+        fields = {
+            "method": request.method,
+            "route": route,
+            "status": response.status_code,
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        if response.status_code >= 500:
+            access_log.warning("request failed", extra=fields)
+        else:
+            access_log.info("request", extra=fields)
+    return response
 
 # ------------------ React UI ------------------
+# static/ is indexed once; assets are served from memory with ETags and
+# precompressed variants, and unknown paths fall back to index.html.
+assets = static_assets.StaticIndex(app.static_folder)
+
+def _serve_index():
+    resp = assets.response(request, "index.html")
+    return resp if resp is not None else send_from_directory(app.static_folder, "index.html")
+
 @app.route("/")
 def serve_ui():
-    return send_from_directory(app.static_folder, "index.html")
+    return _serve_index()
 
 @app.errorhandler(404)
 def not_found(e):
-    return send_from_directory(app.static_folder, "index.html")
+    return _serve_index()
 
 @app.route("/<path:path>")
 def serve_react(path):
-    if os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    return send_from_directory(app.static_folder, "index.html")
+    resp = assets.response(request, path)
+    return resp if resp is not None else _serve_index()
 
 # ------------------ Health ------------------
 @app.route("/api/health")
@@ -61,67 +115,91 @@ def api_health():
         status["db"] = f"error: {e}"
     return jsonify(status)
 
+@app.route("/api/quota")
+def api_quota():
+    return jsonify(quota.report())
+
+@app.route("/api/dataplane")
+def api_dataplane():
+    return jsonify(dataplane.status())
+
+@app.route("/metrics")
+def api_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # ------------------ Role Runners ------------------
+def _team():
+    """Team named by ``?team=``/``?league=``, else the default; 400 if unknown."""
+    team_key, league = request.args.get("team"), request.args.get("league")
+    team = leagues.resolve(team_key, league)
+    if team is None and (team_key or league):
+        abort(Response(json.dumps({"error": f"unknown team {team_key or league}"}),
+                       400, mimetype="application/json"))
+    return team
+
+def _with_team(payload, team):
+    return payload if leagues.is_default(team) else {**payload, "team": team.key}
+
+def run_role_cached(role, params=None):
+    team = _team()
+    results, timings = role_graph.run([role], params={role: params} if params else None, team=team)
+    result, timing = results[role], timings[role]
+    if not timing["cached"]:
+        save_run_to_db(role, _with_team(result, team))
+    cache = {"hit": timing["cached"], "fingerprint": timing.get("fingerprint")}
+    cache.update(role_graph.cache_stats(role))
+    return {**_with_team(result, team), "_cache": cache}
+
 @app.route("/api/run/head_coach")
 def api_head_coach():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    result = team_logic.run_head_coach_logic(roster, odds, weather, None)
-    save_run_to_db("head_coach", result)
-    return jsonify(result)
+    trials = request.args.get("trials", type=int)
+    return jsonify(run_role_cached("head_coach", {"trials": trials} if trials else None))
 
 @app.route("/api/run/gm")
 def api_gm():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    result = general_manager_logic.run_general_manager_logic(roster, odds, weather)
-    save_run_to_db("gm", result)
-    return jsonify(result)
+    return jsonify(run_role_cached("gm"))
 
 @app.route("/api/run/waiver")
 def api_waiver():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    result = waiver_logic.run_waiver_logic(roster, odds, weather)
-    save_run_to_db("waiver", result)
-    return jsonify(result)
+    return jsonify(run_role_cached("waiver"))
 
 @app.route("/api/run/scout")
 def api_scout():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    result = scout_logic.run_scout_logic(roster, odds, weather)
-    save_run_to_db("scout", result)
-    return jsonify(result)
+    return jsonify(run_role_cached("scout"))
 
 @app.route("/api/run/trade")
 def api_trade():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    from trade_logic import run_trade_logic
-    result = run_trade_logic(roster, odds, weather)
-    save_run_to_db("trade", result)
-    return jsonify(result)
+    return jsonify(run_role_cached("trade"))
 
 @app.route("/api/run/learning")
 def api_learning():
-    result = learning.refine_strategy()
-    save_run_to_db("learning", result)
+    return jsonify(run_role_cached("learning"))
+
+@app.route("/api/whatif", methods=["POST"])
+def api_whatif():
+    """Many start/sit and trade scenarios in one simulation (see whatif.py)."""
+    team = _team()
+    body = request.get_json(silent=True) or {}
+    scenarios = body.get("scenarios")
+    roster = role_graph.PER_TEAM["roster"](team)
+    if isinstance(roster, dict) and "error" in roster:
+        return jsonify(_with_team(roster, team)), 502
+    pool = []
+    if isinstance(scenarios, list) and any(isinstance(s, dict) and s.get("get") for s in scenarios):
+        # Trades bring players in from free agency or another roster.
+        fa, opps = (role_graph.PER_TEAM[name](team) for name in ("free_agents", "opponents"))
+        pool = [] if "error" in fa else yahoo_parse.player_dicts(fa)
+        if "error" not in opps:
+            pool += [p for o in yahoo_parse.opponent_rosters(opps) for p in o["roster"]]
+    try:
+        result = whatif.evaluate(
+            roster, role_graph.shared_input("odds"), role_graph.shared_input("weather"),
+            scenarios, pool, body.get("trials", whatif.DEFAULT_TRIALS), body.get("seed"),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    result = _with_team(result, team)
+    save_run_to_db("whatif", result)
     return jsonify(result)
 
 @app.route("/api/run/defense")
@@ -144,27 +222,53 @@ def api_psycho():
     save_run_to_db("psycho", result)
     return jsonify(result)
 
+@app.route("/api/scout/<manager>")
+def api_scout_profile(manager):
+    profile = scout_logic.profile(manager)
+    if profile is None:
+        return jsonify({"error": f"no profile for {manager}"}), 404
+    return jsonify(profile)
+
+# ------------------ Live scoring ------------------
+@app.route("/api/live")
+def api_live():
+    team = _team()
+    board = live.state().get(team.key) if team else None
+    return jsonify({"poller": live.ensure_poller(), "scoreboard": board})
+
+@app.route("/api/live/stream")
+def api_live_stream():
+    team = _team()
+    live.ensure_poller()
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    if last_id is None:
+        last_id = request.args.get("since", 0, type=int)
+    events = live.open_stream(last_id, team.key if team else None)
+    if events is None:
+        return jsonify({"error": "too many live streams, retry shortly"}), 503, {"Retry-After": "30"}
+    return Response(stream_with_context(events), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # ------------------ Council / Decree ------------------
 @app.route("/api/decree")
 def api_decree():
-    roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
-    )
-    bundle = {
-        "head_coach": team_logic.run_head_coach_logic(roster, odds, weather, None),
-        "gm": general_manager_logic.run_general_manager_logic(roster, odds, weather),
-        "waiver": waiver_logic.run_waiver_logic(roster, odds, weather),
-        "scout": scout_logic.run_scout_logic(roster, odds, weather),
-        "trade": __import__("trade_logic").run_trade_logic(roster, odds, weather),
-        "defense": {"role": "defense", "strategy": "Contain top WR, blitz selectively"},
-        "psycho": {"role": "psychoanalyst", "opponent_tendencies": "Overconfident in RB usage"},
-        "learning": learning.refine_strategy(),
-    }
-    council = consult_council("time_keepers", bundle)
-    decree = {"timestamp": datetime.utcnow().isoformat(), "bundle": bundle, "decree": council}
-    save_run_to_db("decree", decree)
+    team = _team()
+    bundle, timings = role_graph.run(team=team)
+    bundle["defense"] = {"role": "defense", "strategy": "Contain top WR, blitz selectively"}
+    bundle["psycho"] = {"role": "psychoanalyst", "opponent_tendencies": "Overconfident in RB usage"}
+    fp = role_graph.fingerprint(bundle)
+    name = role_graph.cache_name("decree", team)
+    council = role_graph.load_cached(name, fp)
+    hit = council is not None
+    metrics.inc("role_cache_total", role="decree", result="hit" if hit else "miss")
+    if not hit:
+        council = consult_council("time_keepers", bundle)
+        role_graph.store_cached(name, fp, council)
+    decree = _with_team({"timestamp": datetime.utcnow().isoformat(), "bundle": bundle, "decree": council}, team)
+    if not hit:
+        save_run_to_db("decree", decree)
+    roles_hit = [r for r in role_graph.ROLES if timings[r]["cached"]]
+    decree["_cache"] = {"hit": hit, "roles_hit": roles_hit, **role_graph.cache_stats()}
     return jsonify(decree)
 
 # ------------------ Utility ------------------
@@ -179,40 +283,54 @@ def api_history():
     history = [{"ts": str(r[0]), "kind": r[1], "payload": r[2]} for r in rows]
     return jsonify(history)
 
+@app.route("/api/analytics/<kind>")
+def api_analytics(kind):
+    column = request.args.get("column")
+    if not column:
+        return jsonify({"error": "column is required"}), 400
+    agg = request.args.get("agg", "mean")
+    if agg not in ("mean", "median", "min", "max", "sum", "count"):
+        return jsonify({"error": f"unsupported agg {agg}"}), 400
+    table = request.args.get("table", "runs")
+    if table not in analytics_export.TABLES:
+        return jsonify({"error": f"unknown table {table}"}), 400
+    try:
+        trend = analytics_export.trend(kind, column, table, agg, request.args.get("by"))
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": e.args[0] if e.args else str(e)}), 400
+    return jsonify({"kind": kind, "column": column, "agg": agg, "weeks": trend})
+
 @app.route("/api/season")
 def api_season():
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT payload FROM runs WHERE kind='head_coach' ORDER BY ts DESC LIMIT 100"
+    sims = request.args.get("sims", default=season_sim.N_SIMS, type=int)
+    sims = max(1, min(sims, season_sim.MAX_SIMS))
+    outlook = season_sim.season_outlook(
+        n_sims=sims, scoreboards=season_sim.stored_scoreboards()
     )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    win_probs = [
-        r[0].get("logic", {}).get("win_prob", 0.5)
-        for r in rows
-        if isinstance(r[0], dict)
-    ]
-    if not win_probs:
-        return jsonify({"error": "no data"})
-    avg_win = float(np.mean(win_probs))
-    outlook = {
-        "games_sampled": len(win_probs),
-        "avg_win_prob": avg_win,
-        "playoff_odds": min(1.0, avg_win * 1.2),
-        "champ_odds": min(1.0, avg_win * 0.8),
-    }
-    save_run_to_db("season", outlook)
+    if not outlook.get("from_cache") and "error" not in outlook:
+        save_run_to_db("season", outlook)
     return jsonify(outlook)
 
 @app.route("/api/scheduler")
 def api_scheduler():
     from logic_runner import run_all
-    result = run_all()
+    team = _team()
+    result = _with_team(run_all(team=team), team)
     save_run_to_db("scheduler", result)
     return jsonify(result)
 
+@app.route("/api/scheduler/teams")
+def api_scheduler_teams():
+    from logic_runner import run_teams
+    result = run_teams()
+    for team_key, results in result.items():
+        save_run_to_db("scheduler", {**results, "team": team_key})
+    return jsonify(result)
+
+@app.route("/api/teams")
+def api_teams():
+    return jsonify([{"team": t.key, "league": t.league} for t in leagues.configured()])
+
 @app.route("/api/panic")
 def api_panic():
     out = subprocess.run(["bash", "panic.sh"], capture_output=True, text=True)
@@ -220,27 +338,37 @@ def api_panic():
 
 @app.route("/api/refresh_tokens")
 def api_refresh_tokens():
-    out = subprocess.run(
-        ["python", "refresh_yahoo_token.py"], capture_output=True, text=True
-    )
-    return jsonify({"stdout": out.stdout, "stderr": out.stderr, "code": out.returncode})
+    result = yahoo_auth.provider(utils_core.YAHOO_TOKEN_FILE).refresh()
+    return jsonify(result), (502 if "error" in result else 200)
 
 @app.route("/api/data_ingest")
 def api_data_ingest():
+    team = _team()
     roster, odds, weather = (
-        utils_core.load_roster(),
-        utils_core.fetch_odds(),
-        utils_core.fetch_weather_data(),
+        utils_core.load_roster(team_key=team and team.key),
+        role_graph.shared_input("odds"),
+        role_graph.shared_input("weather"),
     )
-    payload = {"roster": roster, "odds": odds, "weather": weather}
+    payload = _with_team({"roster": roster, "odds": odds, "weather": weather}, team)
     save_run_to_db("data_ingest", payload)
     return jsonify(payload)
 
 @app.route("/api/alerts")
 def api_alerts():
-    result = notifications.get_alerts()
+    team = _team()
+    result = _with_team(notifications.get_alerts(team_key=team and team.key), team)
     save_run_to_db("alerts", result)
     return jsonify(result)
 
+@app.route("/api/news")
+def api_news():
+    """Recent stories per player: ``?players=Name,Name&hours=24``."""
+    names = [n.strip() for n in request.args.get("players", "").split(",") if n.strip()]
+    hours = request.args.get("hours", default=24, type=float)
+    news.refresh()
+    if not names:
+        return jsonify({**news.summary(), "recent": news.recent(hours)})
+    return jsonify(news.for_players(names, hours))
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
@@ -1,15 +1,26 @@
-import os, logging
+import os, time, logging
 from openai import OpenAI
 import anthropic, requests
 
+import metrics, quota
+
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+
+def _tokens(prompt, max_tokens):
+    # Rough prompt size (4 characters a token) plus the completion budget.
+    return len(prompt) / 4 + max_tokens
 
 
 def _ask_claude(prompt, max_tokens=512):
     if not ANTHROPIC_API_KEY:
         return {"model": "claude", "error": "no_key"}
+    if not quota.acquire("claude", _tokens(prompt, max_tokens)):
+        return {"model": "claude", "error": "quota_exhausted"}
+    start = time.perf_counter()
     try:
         client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
         resp = client.messages.create(
@@ -17,14 +28,24 @@ def _ask_claude(prompt, max_tokens=512):
             max_tokens=max_tokens,
             messages=[{"role": "user", "content": prompt}],
         )
+        metrics.observe_llm(
+            "claude",
+            time.perf_counter() - start,
+            resp.usage.input_tokens,
+            resp.usage.output_tokens,
+        )
         return {"model": "claude", "text": resp.content[0].text}
     except Exception as e:
+        metrics.observe_llm("claude", time.perf_counter() - start, error=True)
         return {"model": "claude", "error": str(e)}
 
 
 def _ask_openai(prompt, max_tokens=512):
     if not OPENAI_API_KEY:
         return {"model": "openai", "error": "no_key"}
+    if not quota.acquire("openai", _tokens(prompt, max_tokens)):
+        return {"model": "openai", "error": "quota_exhausted"}
+    start = time.perf_counter()
     try:
         client = OpenAI(api_key=OPENAI_API_KEY)
         resp = client.chat.completions.create(
@@ -32,24 +53,42 @@ def _ask_openai(prompt, max_tokens=512):
             messages=[{"role": "user", "content": prompt}],
             max_tokens=max_tokens,
         )
+        metrics.observe_llm(
+            "openai",
+            time.perf_counter() - start,
+            resp.usage.prompt_tokens,
+            resp.usage.completion_tokens,
+        )
         return {"model": "openai", "text": resp.choices[0].message.content}
     except Exception as e:
+        metrics.observe_llm("openai", time.perf_counter() - start, error=True)
         return {"model": "openai", "error": str(e)}
 
 
 def _ask_ollama(prompt, max_tokens=512):
+    start = time.perf_counter()
     try:
         r = requests.post(
-            "http://localhost:11434/api/generate",
+            f"{OLLAMA_HOST}/api/generate",
             json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
         )
         if r.ok:
-            return {"model": "ollama", "text": r.json().get("response", "")}
+            body = r.json()
+            metrics.observe_llm(
+                "ollama",
+                time.perf_counter() - start,
+                body.get("prompt_eval_count", 0),
+                body.get("eval_count", 0),
+            )
+            return {"model": "ollama", "text": body.get("response", "")}
+        metrics.observe_llm("ollama", time.perf_counter() - start, error=True)
         return {"model": "ollama", "error": r.text}
     except Exception as e:
+        metrics.observe_llm("ollama", time.perf_counter() - start, error=True)
         return {"model": "ollama", "error": str(e)}
 
 
+@metrics.timed("council")
 def consult_council(role, bundle):
     prompt = f"You are the {role}. Inputs:\n{bundle}\nGive final decree JSON with keys: decision, rationale."
     results = []
@@ -1,26 +1,35 @@
-import utils_core
+import utils_core, metrics, yahoo_parse, projections
 import numpy as np
 from datetime import datetime
 
 
+@metrics.timed("trade")
 def run_trade_logic(roster, odds, weather, free_agents=None, opponents=None):
     try:
         fa = free_agents if free_agents else utils_core.fetch_free_agents()
         opps = opponents if opponents else utils_core.load_opponents()
 
+        # Raw Yahoo responses are flattened once (and cached) by yahoo_parse,
+        # and valued as rest-of-season points from the shared projections
+        proj = projections.current(odds, weather)
+        roster = proj.annotate(yahoo_parse.player_dicts(roster))
+        fa = proj.annotate(yahoo_parse.player_dicts(fa))
+        opps = yahoo_parse.opponent_rosters(opps)
+
         # Baseline valuations
-        roster_vals = {p["id"]: _player_value(p, odds, weather) for p in roster}
-        fa_vals = {p["id"]: _player_value(p, odds, weather) for p in fa}
+        roster_vals = {p["id"]: p["ros"] for p in roster}
+        fa_vals = {p["id"]: p["ros"] for p in fa}
+        roster_mean = np.mean(list(roster_vals.values())) if roster_vals else 0.0
 
         # Opponent roster needs
-        opp_gaps = {o["team"]: _assess_needs(o["roster"], odds, weather) for o in opps}
+        opp_gaps = {o["team"]: _assess_needs(proj.annotate(o["roster"])) for o in opps}
 
         proposals = []
         for o in opps:
             needs = opp_gaps[o["team"]]
             for pid, val in roster_vals.items():
                 pos = _pos_from_id(pid)
-                if pos in needs and val < np.mean(list(roster_vals.values())):
+                if pos in needs and val < roster_mean:
                     target = _find_upgrade(fa_vals, pos)
                     if target:
                         proposals.append(
@@ -43,30 +52,12 @@ def run_trade_logic(roster, odds, weather, free_agents=None, opponents=None):
         return {"error": str(e)}
 
 
-def _player_value(player, odds, weather):
-    base = player.get("projection", 0.0)
-    opp = player.get("opponent", "")
-    odds_boost, weather_penalty = 0.0, 0.0
-
-    if opp in odds:
-        line = odds[opp].get("line", 0)
-        odds_boost = line * 0.01
-    if opp in weather and weather[opp].get("wind", 0) > 20:
-        weather_penalty = 0.1 * base
-
-    return base + odds_boost - weather_penalty
-
-
-def _assess_needs(roster, odds, weather):
-    vals = [_player_value(p, odds, weather) for p in roster]
-    if not vals:
+def _assess_needs(roster):
+    vals = np.array([p["ros"] for p in roster])
+    if not len(vals):
         return set()
-    avg_val = np.mean(vals)
-    needs = []
-    for p in roster:
-        if _player_value(p, odds, weather) < 0.7 * avg_val:
-            needs.append(_pos_from_id(p["id"]))
-    return set(needs)
+    weak = vals < 0.7 * vals.mean()
+    return {_pos_from_id(p["id"]) for p, w in zip(roster, weak) if w}
 
 
 def _find_upgrade(fa_vals, pos):
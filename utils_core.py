@@ -1,12 +1,22 @@
-import os, json, time, requests
-from functools import lru_cache
+import os, json, time, hashlib, requests
+from datetime import datetime, timedelta, timezone
+import threading
+from functools import wraps
+
+import metrics, quota, yahoo_auth, yahoo_parse, news, sleeper_mirror
+from nfl_teams import TEAM_ABBR, ABBR_ALIASES, team_abbr
 
 YAHOO_TEAM_KEY = os.getenv("YAHOO_TEAM_KEY")
+# League key ("461.l.881883"); defaults to the league part of the team key.
+YAHOO_LEAGUE_ID = os.getenv("YAHOO_LEAGUE_ID") or (
+    YAHOO_TEAM_KEY.rsplit(".t.", 1)[0] if YAHOO_TEAM_KEY else None
+)
 YAHOO_TOKEN_FILE = os.getenv("YAHOO_TOKEN_FILE", "yahoo_token.json")
 
 ODDS_PRIMARY = os.getenv("ODDS_PRIMARY", "sportsgameodds").lower()
 SPORTSGAMEODDS_API_KEY = os.getenv("SPORTSGAMEODDS_API_KEY")
 SPORTSDATAIO_API_KEY = os.getenv("SPORTSDATAIO_API_KEY")
+SPORTSDATAIO_SEASON = os.getenv("SPORTSDATAIO_SEASON")  # e.g. "2025REG"; default from SEASON_START
 ODDS_API_KEY = os.getenv("ODDS_API_KEY")
 
 TOMORROWIO_API_KEY = os.getenv("TOMORROWIO_API_KEY")
@@ -14,6 +24,45 @@ VISUALCROSSING_API_KEY = os.getenv("VISUALCROSSING_API_KEY")
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 STORMGLASS_API_KEY = os.getenv("STORMGLASS_API_KEY")
 
+# Upstream base URLs; overridable so benchmarks can point at a local stub server.
+YAHOO_API_BASE = os.getenv("YAHOO_API_BASE", "https://fantasysports.yahooapis.com/fantasy/v2")
+VISUALCROSSING_API_BASE = os.getenv("VISUALCROSSING_API_BASE", "https://weather.visualcrossing.com")
+TOMORROWIO_API_BASE = os.getenv("TOMORROWIO_API_BASE", "https://api.tomorrow.io")
+OPENWEATHER_API_BASE = os.getenv("OPENWEATHER_API_BASE", "https://api.openweathermap.org")
+STORMGLASS_API_BASE = os.getenv("STORMGLASS_API_BASE", "https://api.stormglass.io")
+SPORTSGAMEODDS_API_BASE = os.getenv("SPORTSGAMEODDS_API_BASE", "https://api.sportsgameodds.com")
+SPORTSDATAIO_API_BASE = os.getenv("SPORTSDATAIO_API_BASE", "https://api.sportsdata.io")
+ODDS_API_BASE = os.getenv("ODDS_API_BASE", "https://api.the-odds-api.com")
+# Same freshness as role_graph's shared inputs.
+WEATHER_TTL = float(os.getenv("SHARED_INPUT_TTL", "300"))
+YAHOO_PLAYER_PAGES = int(os.getenv("YAHOO_PLAYER_PAGES", "8"))  # 25 players each
+
+
+def ttl_cache(ttl, maxsize=256, error_ttl=0):
+    """Memoize by arguments for ``ttl`` seconds; error payloads only ``error_ttl``."""
+    def decorate(fn):
+        entries, lock = {}, threading.Lock()
+
+        @wraps(fn)
+        def wrapper(*args):
+            now = time.monotonic()
+            with lock:
+                hit = entries.get(args)
+            if hit and hit[0] > now:
+                return hit[1]
+            value = fn(*args)
+            keep = error_ttl if isinstance(value, dict) and "error" in value else ttl
+            if keep > 0:
+                with lock:
+                    if len(entries) >= maxsize:
+                        entries.clear()
+                    entries[args] = (now + keep, value)
+            return value
+
+        wrapper.cache_clear = entries.clear
+        return wrapper
+    return decorate
+
 
 def _retry(call, tries=3, delay=0.75):
     for i in range(tries):
@@ -25,24 +74,70 @@ def _retry(call, tries=3, delay=0.75):
             time.sleep(delay * (2**i))
 
 
-def load_roster(week=1):
-    if not os.path.exists(YAHOO_TOKEN_FILE):
-        return {"error": "no_token"}
-    with open(YAHOO_TOKEN_FILE, "r") as f:
-        token_data = json.load(f)
-    access_token = token_data.get("access_token")
-    if not access_token or not YAHOO_TEAM_KEY:
-        return {"error": "missing_token_or_team"}
-    url = f"https://fantasysports.yahooapis.com/fantasy/v2/team/{YAHOO_TEAM_KEY}/roster;week={week}?format=json"
-    headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
+def _yahoo_request(path, timeout=12, headers=None):
+    """GET with the shared token and one retry on 401; raises on failure."""
+    tokens = yahoo_auth.provider(YAHOO_TOKEN_FILE)
+    access_token = tokens.token()
+    if not access_token:
+        raise RuntimeError("no_token")
+    url = f"{YAHOO_API_BASE}/{path}?format=json"
+    for attempt in range(2):
+        resp = requests.get(
+            url,
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Accept": "application/json",
+                **(headers or {}),
+            },
+            timeout=timeout,
+        )
+        if resp.status_code == 401 and attempt == 0:
+            metrics.inc("yahoo_unauthorized_total")
+            fresh = tokens.invalidate(access_token)
+            if fresh and fresh != access_token:
+                access_token = fresh
+                continue
+        if resp.status_code != 304:
+            resp.raise_for_status()
+        return resp
+
+
+def yahoo_get(path, timeout=12):
+    """GET a Yahoo Fantasy resource with the shared token; one retry on 401."""
     try:
-        resp = requests.get(url, headers=headers, timeout=12)
-        resp.raise_for_status()
-        return resp.json()
+        return _yahoo_request(path, timeout).json()
     except Exception as e:
         return {"error": str(e)}
 
 
+def yahoo_get_if_changed(path, etag=None, digest=None, timeout=12):
+    """``(payload, etag, digest)``; ``payload`` is None when nothing changed.
+
+    Sends ``If-None-Match`` when an ETag is known and, for responses Yahoo
+    does not tag, compares a hash of the body with ``digest`` so unchanged
+    payloads are never parsed.  Raises on failure.
+    """
+    resp = _yahoo_request(path, timeout, {"If-None-Match": etag} if etag else None)
+    if resp.status_code == 304:
+        return None, etag, digest
+    fresh = hashlib.blake2b(resp.content, digest_size=16).hexdigest()
+    etag = resp.headers.get("ETag")
+    return (None if fresh == digest else resp.json()), etag, fresh
+
+
+@metrics.timed_upstream("yahoo_roster")
+def load_roster(week=None, team_key=None, stats=False):
+    """This team's roster for ``week``; ``stats`` adds the week's player points."""
+    team_key = team_key or YAHOO_TEAM_KEY
+    if not team_key:
+        return {"error": "missing_token_or_team"}
+    week = week or current_week(league_key=team_key.split(".t.")[0])
+    path = f"team/{team_key}/roster;week={week}"
+    if stats:
+        path += f"/players/stats;type=week;week={week}"
+    return yahoo_get(path)
+
+
 TEAM_ZIP = {
     "Arizona Cardinals": "85305",
     "Atlanta Falcons": "30313",
@@ -78,8 +173,92 @@ TEAM_ZIP = {
     "Washington Commanders": "20785",
 }
 
+# Recorded Yahoo league settings: season dates and week range when Yahoo
+# cannot be reached.  Live league metadata is refreshed every LEAGUE_META_TTL
+# seconds per league; a failed fetch is retried after LEAGUE_META_RETRY.
+LEAGUE_SETTINGS_FILE = os.path.join("out", "settings_raw.json")
+LEAGUE_META_TTL = float(os.getenv("LEAGUE_META_TTL", "3600"))
+LEAGUE_META_RETRY = float(os.getenv("LEAGUE_META_RETRY", "300"))
+
 
-@lru_cache(maxsize=256)
+def _league_meta():
+    try:
+        with open(LEAGUE_SETTINGS_FILE, "r", encoding="utf-8") as f:
+            league = json.load(f)["fantasy_content"]["league"]
+        return league[0] if isinstance(league, list) else league
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        return {}
+
+
+def _week_one(start_date):
+    # NFL weeks run Tuesday to Monday: week 1 starts the Tuesday on or before
+    # the league's first game day.
+    day = datetime.fromisoformat(start_date).replace(tzinfo=timezone.utc)
+    return day - timedelta(days=(day.weekday() - 1) % 7)
+
+
+LEAGUE_META = _league_meta()
+SEASON_START = _week_one(os.getenv("SEASON_START") or LEAGUE_META.get("start_date") or "2025-09-02")
+START_WEEK = int(LEAGUE_META.get("start_week") or 1)
+END_WEEK = int(LEAGUE_META.get("end_week") or 17)
+
+
+@ttl_cache(LEAGUE_META_TTL, error_ttl=LEAGUE_META_RETRY)
+def _fetch_league_meta(league_key):
+    raw = yahoo_get(f"league/{league_key}")
+    if "error" in raw:
+        return raw
+    league = raw.get("fantasy_content", {}).get("league")
+    meta = league[0] if isinstance(league, list) and league else league
+    if not isinstance(meta, dict) or not meta.get("start_date"):
+        return {"error": "no_league_meta"}
+    return meta
+
+
+def league_meta(league_key=None):
+    """Yahoo's metadata for a league (default ours): season dates and weeks.
+
+    Cached per league for LEAGUE_META_TTL; the recorded settings stand in
+    while Yahoo cannot be reached.
+    """
+    league_key = league_key or YAHOO_LEAGUE_ID
+    meta = _fetch_league_meta(league_key) if league_key else {"error": "missing_league"}
+    return LEAGUE_META if "error" in meta else meta
+
+
+def season(league_key=None):
+    """``(week one start, first week, last week)`` of a league's season."""
+    meta = league_meta(league_key)
+    if meta is LEAGUE_META:
+        return SEASON_START, START_WEEK, END_WEEK
+    start = _week_one(os.getenv("SEASON_START") or meta["start_date"])
+    return start, int(meta.get("start_week") or 1), int(meta.get("end_week") or 17)
+
+
+def nfl_week(ts=None, league_key=None):
+    """League week for a UTC timestamp (default now); 0 before the season, at most its last week."""
+    ts = ts or datetime.now(timezone.utc)
+    start, first, last = season(league_key)
+    if ts < start:
+        return 0
+    return min(last, (ts - start).days // 7 + first)
+
+
+def current_week(ts=None, league_key=None):
+    """Week to act on: ``nfl_week`` within the league's week range.
+
+    Without ``ts`` the league's own ``current_week`` wins when it is ahead
+    (Yahoo advances it on its own schedule).
+    """
+    _, first, last = season(league_key)
+    week = nfl_week(ts, league_key)
+    if ts is None:
+        week = max(week, int(league_meta(league_key).get("current_week") or 0))
+    return min(last, max(first, week))
+
+
+@ttl_cache(WEATHER_TTL)
+@metrics.timed("weather")
 def fetch_weather_data(team="Buffalo Bills"):
     for p in [
         _fetch_visualcrossing,
@@ -96,11 +275,13 @@ def fetch_weather_data(team="Buffalo Bills"):
     return {"team": team, "error": "all_weather_failed"}
 
 
+@quota.limited("visualcrossing")
+@metrics.timed_upstream("visualcrossing")
 def _fetch_visualcrossing(team):
     if not VISUALCROSSING_API_KEY:
         return {"error": "missing_VISUALCROSSING_API_KEY"}
     zip_code = TEAM_ZIP.get(team, "10001")
-    url = f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{zip_code}?unitGroup=us&key={VISUALCROSSING_API_KEY}&contentType=json"
+    url = f"{VISUALCROSSING_API_BASE}/VisualCrossingWebServices/rest/services/timeline/{zip_code}?unitGroup=us&key={VISUALCROSSING_API_KEY}&contentType=json"
     resp = requests.get(url, timeout=8)
     resp.raise_for_status()
     d = resp.json().get("currentConditions", {})
@@ -113,11 +294,13 @@ def _fetch_visualcrossing(team):
     }
 
 
+@quota.limited("tomorrowio")
+@metrics.timed_upstream("tomorrowio")
 def _fetch_tomorrowio(team):
     if not TOMORROWIO_API_KEY:
         return {"error": "missing_TOMORROWIO_API_KEY"}
     zip_code = TEAM_ZIP.get(team, "10001")
-    url = f"https://api.tomorrow.io/v4/weather/realtime?location={zip_code}&apikey={TOMORROWIO_API_KEY}"
+    url = f"{TOMORROWIO_API_BASE}/v4/weather/realtime?location={zip_code}&apikey={TOMORROWIO_API_KEY}"
     resp = requests.get(url, timeout=8)
     resp.raise_for_status()
     vals = resp.json().get("data", {}).get("values", {})
@@ -130,11 +313,13 @@ def _fetch_tomorrowio(team):
     }
 
 
+@quota.limited("openweather")
+@metrics.timed_upstream("openweather")
 def _fetch_openweather(team):
     if not OPENWEATHER_API_KEY:
         return {"error": "missing_OPENWEATHER_API_KEY"}
     zip_code = TEAM_ZIP.get(team, "10001")
-    url = f"https://api.openweathermap.org/data/2.5/weather?zip={zip_code},US&appid={OPENWEATHER_API_KEY}&units=imperial"
+    url = f"{OPENWEATHER_API_BASE}/data/2.5/weather?zip={zip_code},US&appid={OPENWEATHER_API_KEY}&units=imperial"
     resp = requests.get(url, timeout=8)
     resp.raise_for_status()
     d = resp.json()
@@ -147,10 +332,12 @@ def _fetch_openweather(team):
     }
 
 
+@quota.limited("stormglass")
+@metrics.timed_upstream("stormglass")
 def _fetch_stormglass(team):
     if not STORMGLASS_API_KEY:
         return {"error": "missing_STORMGLASS_API_KEY"}
-    url = "https://api.stormglass.io/v2/weather/point?lat=40.71&lng=-74.01&params=airTemperature,windSpeed"
+    url = f"{STORMGLASS_API_BASE}/v2/weather/point?lat=40.71&lng=-74.01&params=airTemperature,windSpeed"
     headers = {"Authorization": STORMGLASS_API_KEY}
     resp = requests.get(url, headers=headers, timeout=8)
     resp.raise_for_status()
@@ -164,6 +351,7 @@ def _fetch_stormglass(team):
     }
 
 
+@metrics.timed("odds")
 def fetch_odds():
     if ODDS_PRIMARY == "sportsgameodds":
         data = fetch_sportsgameodds()
@@ -183,10 +371,12 @@ def fetch_odds():
     return {"error": "invalid_ODDS_PRIMARY"}
 
 
+@quota.limited("sportsgameodds")
+@metrics.timed_upstream("sportsgameodds")
 def fetch_sportsgameodds():
     if not SPORTSGAMEODDS_API_KEY:
         return {"error": "missing_SPORTSGAMEODDS_API_KEY"}
-    url = "https://api.sportsgameodds.com/v1/sports/nfl/odds"
+    url = f"{SPORTSGAMEODDS_API_BASE}/v1/sports/nfl/odds"
     headers = {"X-API-Key": SPORTSGAMEODDS_API_KEY}
     try:
         resp = requests.get(url, headers=headers, timeout=12)
@@ -196,10 +386,14 @@ def fetch_sportsgameodds():
         return {"error": str(e)}
 
 
-def fetch_sportsdataio():
+@quota.limited("sportsdataio")
+@metrics.timed_upstream("sportsdataio")
+def fetch_sportsdataio(week=None):
     if not SPORTSDATAIO_API_KEY:
         return {"error": "missing_SPORTSDATAIO_API_KEY"}
-    url = "https://api.sportsdata.io/v3/nfl/odds/json/GameOddsByWeek/2025REG/1"
+    year = SPORTSDATAIO_SEASON or f"{season()[0].year}REG"
+    week = week or current_week()
+    url = f"{SPORTSDATAIO_API_BASE}/v3/nfl/odds/json/GameOddsByWeek/{year}/{week}"
     headers = {"Ocp-Apim-Subscription-Key": SPORTSDATAIO_API_KEY}
     try:
         resp = requests.get(url, headers=headers, timeout=12)
@@ -209,10 +403,12 @@ def fetch_sportsdataio():
         return {"error": str(e)}
 
 
+@quota.limited("oddsapi")
+@metrics.timed_upstream("oddsapi")
 def fetch_oddsapi():
     if not ODDS_API_KEY:
         return {"error": "missing_ODDS_API_KEY"}
-    url = "https://api.the-odds-api.com/v4/sports/americanfootball_nfl/odds"
+    url = f"{ODDS_API_BASE}/v4/sports/americanfootball_nfl/odds"
     params = {"apiKey": ODDS_API_KEY, "regions": "us,uk,eu", "markets": "totals"}
     try:
         resp = requests.get(url, params=params, timeout=12)
@@ -222,63 +418,114 @@ def fetch_oddsapi():
         return {"error": str(e)}
 
 
-def fetch_free_agents(week=1):
-    if not os.path.exists(YAHOO_TOKEN_FILE):
-        return {"error": "no_token"}
-    with open(YAHOO_TOKEN_FILE, "r") as f:
-        token_data = json.load(f)
-    access_token = token_data.get("access_token")
-    if not access_token or not YAHOO_LEAGUE_ID:
+@metrics.timed_upstream("yahoo_free_agents")
+def fetch_free_agents(week=None, league_key=None, stats=False):
+    """Top free agents; ``stats`` adds their points for ``week``."""
+    league_key = league_key or YAHOO_LEAGUE_ID
+    if not league_key:
         return {"error": "missing_token_or_league"}
-    url = f"https://fantasysports.yahooapis.com/fantasy/v2/league/{YAHOO_LEAGUE_ID}/players;status=FA;count=50?format=json"
-    headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
-    try:
-        resp = requests.get(url, headers=headers, timeout=12)
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as e:
-        return {"error": str(e)}
+    path = f"league/{league_key}/players;status=FA;count=50"
+    if stats:
+        path += f"/stats;type=week;week={week or current_week(league_key=league_key)}"
+    return yahoo_get(path)
+
+
+@metrics.timed_upstream("yahoo_players")
+def fetch_yahoo_players(league_key=None, pages=YAHOO_PLAYER_PAGES, count=25):
+    """League players Yahoo knows (taken or not), flattened to dicts.
+    Pages of ``count`` (Yahoo's maximum) are read until a short one or
+    ``pages`` of them; ``pages=None`` reads the whole universe, one request
+    per page, so keep it out of the per-tick snapshot."""
+    league_key = league_key or YAHOO_LEAGUE_ID
+    if not league_key:
+        return {"error": "missing_token_or_league"}
+    players, page = [], 0
+    while pages is None or page < pages:
+        raw = yahoo_get(f"league/{league_key}/players;start={page * count};count={count}")
+        page += 1
+        if raw.get("error"):
+            return raw if not players else {"players": players, "error": raw["error"]}
+        batch = yahoo_parse.player_dicts(raw)
+        players.extend(batch)
+        if len(batch) < count:
+            break
+    return {"players": players}
+
+
+@metrics.timed_upstream("yahoo_transactions")
+def fetch_yahoo_transactions(league_key=None, count=25):
+    league_key = league_key or YAHOO_LEAGUE_ID
+    if not league_key:
+        return {"error": "missing_token_or_league"}
+    return yahoo_get(f"league/{league_key}/transactions;count={count}")
 
 
-def lookup_player(player_id):
-    return {"id": player_id, "name": player_id.split("_")[-1]}
+def fetch_news(hours=24):
+    """Stories from the configured news feeds in the last ``hours``, newest first."""
+    news.refresh()
+    return news.recent(hours)
 
 
-def fetch_free_agents(week=1):
-    if not os.path.exists(YAHOO_TOKEN_FILE):
-        return {"error": "no_token"}
-    with open(YAHOO_TOKEN_FILE, "r") as f:
-        token_data = json.load(f)
-    access_token = token_data.get("access_token")
-    if not access_token or not YAHOO_LEAGUE_ID:
-        return {"error": "missing_token_or_league"}
-    url = f"https://fantasysports.yahooapis.com/fantasy/v2/league/{YAHOO_LEAGUE_ID}/players;status=FA;count=50?format=json"
-    headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
-    try:
-        resp = requests.get(url, headers=headers, timeout=12)
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as e:
-        return {"error": str(e)}
+def fetch_sleeper_players(force=False):
+    """Refresh the local Sleeper mirror (at most daily); returns its summary."""
+    return sleeper_mirror.sync(force=force)
 
 
 def lookup_player(player_id):
-    return {"id": player_id, "name": player_id.split("_")[-1]}
-
-def load_opponents(week=1):
-    import os, json, requests
-    if not os.path.exists(YAHOO_TOKEN_FILE):
-        return {"error": "no_token"}
-    with open(YAHOO_TOKEN_FILE, "r") as f:
-        token_data = json.load(f)
-    access_token = token_data.get("access_token")
-    if not access_token or not YAHOO_TEAM_KEY:
+    """Player dict for a Yahoo-style id, resolved from the local mirror."""
+    p = sleeper_mirror.player(yahoo_id=sleeper_mirror.yahoo_id(player_id))
+    if p is None:
+        return {"id": player_id, "name": player_id.split("_")[-1]}
+    return {
+        "id": player_id,
+        "name": p["name"],
+        "team": p["team"],
+        "position": p["position"],
+        "status": p["injury_status"],
+    }
+
+
+@metrics.timed_upstream("yahoo_matchups")
+def load_opponents(week=None, team_key=None):
+    """Every other team's roster for ``week`` (default current), its opponent first."""
+    team_key = team_key or YAHOO_TEAM_KEY
+    if not team_key:
         return {"error": "missing_token_or_team"}
-    url = f"https://fantasysports.yahooapis.com/fantasy/v2/team/{YAHOO_TEAM_KEY}/matchups;week={week}?format=json"
-    headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
-    try:
-        resp = requests.get(url, headers=headers, timeout=12)
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as e:
-        return {"error": str(e)}
+    league_key = team_key.split(".t.")[0]
+    week = week or current_week(league_key=league_key)
+    rosters = load_league_rosters(week, league_key)
+    if "error" in rosters:
+        return rosters
+    matchup = yahoo_get(f"team/{team_key}/matchups;weeks={week}")
+    first = None if "error" in matchup else yahoo_parse.matchup_opponent(matchup, team_key)
+    return yahoo_parse.opponent_rosters(rosters, team_key, first)
+
+
+def load_league_rosters(week, league_key=None, stats=False):
+    """Every team's roster for ``week`` in one call; ``stats`` adds week points."""
+    league_key = league_key or YAHOO_LEAGUE_ID
+    if not league_key:
+        return {"error": "missing_league"}
+    path = f"league/{league_key}/teams/roster;week={week}"
+    if stats:
+        path += f"/players/stats;type=week;week={week}"
+    return yahoo_get(path)
+
+
+@metrics.timed_upstream("yahoo_scoreboard")
+def fetch_scoreboard(week, league_key=None):
+    """The league scoreboard (every matchup, with team points) for ``week``."""
+    league_key = league_key or YAHOO_LEAGUE_ID
+    if not league_key:
+        return {"error": "missing_league"}
+    return yahoo_get(f"league/{league_key}/scoreboard;week={week}")
+
+
+@metrics.timed_upstream("yahoo_matchups")
+def load_matchup(week=None, team_key=None):
+    """This team's matchup for ``week`` (default the current NFL week)."""
+    team_key = team_key or YAHOO_TEAM_KEY
+    if not team_key:
+        return {"error": "missing_token_or_team"}
+    week = week or current_week(league_key=team_key.split(".t.")[0])
+    return yahoo_get(f"team/{team_key}/matchups;weeks={week}")
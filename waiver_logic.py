@@ -1,16 +1,373 @@
-import utils_core, random
+import os, json, utils_core, metrics, yahoo_parse, projections, news
+import numpy as np
+from draft_engine import FLEX, league_roster
 
+SETTINGS_FILE = os.path.join("out", "settings_raw.json")
+PER_POSITION = 4  # free agents kept per position after need pruning
+BID_STEPS = 20  # FAAB bid grid resolution
+DEFAULT_BUDGET = 100
+# Without bid history: the week's best free agent goes for ~30% of a budget.
+DEFAULT_TOP_PRICE = 0.30
+DEFAULT_INTEREST = 0.5  # chance a rival claims the week's best free agent
+# Share of this week's best claim each later week is expected to offer; it
+# prices a FAAB dollar by what it could still buy before the season ends.
+FUTURE_CLAIM_SHARE = 0.5
+DEFAULT_WEEKS_LEFT = 8  # planning horizon when the caller does not know it
+NEWS_HOURS = 24
+NEWS_PER_PLAYER = 2  # headlines attached to each add/drop
 
-def run_waiver_logic(roster, odds, weather):
+_settings = None
+
+
+def _league_settings():
+    global _settings
+    if _settings is None:
+        try:
+            with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except Exception:
+            payload = None
+        slots, num_teams = league_roster(payload)
+        league = (payload or {}).get("fantasy_content", {}).get("league", [])
+        meta = league[0] if league else {}
+        settings = (league[1].get("settings") or [{}])[0] if len(league) > 1 else {}
+        _settings = {
+            "slots": slots,
+            "num_teams": num_teams,
+            "faab": str(settings.get("uses_faab", "1")) == "1",
+            "end_week": int(meta.get("end_week") or 17),
+        }
+    return _settings
+
+
+def league():
+    """``(roster slots, num_teams, uses_faab)`` from the recorded settings."""
+    s = _league_settings()
+    return s["slots"], s["num_teams"], s["faab"]
+
+
+# ------------------ lineup ------------------
+def _positions(player):
+    """Eligible positions in Yahoo's listed order, primary first."""
+    pos = (player.get("position") or player.get("id", "").split("_")[0]).upper()
+    return tuple(dict.fromkeys("DEF" if p == "DST" else p for p in pos.split(",") if p))
+
+
+def _value(player):
+    # Projections already carry injury status (see projections.STATUS).
+    return player.get("projection", 0.0)
+
+
+def starting_slots(slots):
+    """Starting slots as ``(name, eligible positions)``, dedicated ones first.
+
+    Flex slots follow from narrowest to widest, which keeps the greedy fill
+    optimal: a player only reaches a wider slot once every narrower slot he
+    fits is taken by someone at least as good.
+    """
+    dedicated = [
+        (s, {s})
+        for s, n in slots.items()
+        if s not in FLEX and s not in ("BN", "IR")
+        for _ in range(n)
+    ]
+    flex = [
+        (s, set(FLEX[s]))
+        for s in sorted((s for s in slots if s in FLEX), key=lambda s: len(FLEX[s]))
+        for _ in range(slots[s])
+    ]
+    return dedicated + flex
+
+
+def best_lineup(players, starting):
+    """``(points, {slot index: player})`` for the highest-scoring lineup."""
+    pool = sorted(players, key=_value, reverse=True)
+    used, lineup = set(), {}
+    for k, (_, eligible) in enumerate(starting):
+        for p in pool:
+            if p["id"] not in used and not eligible.isdisjoint(_positions(p)):
+                used.add(p["id"])
+                lineup[k] = p
+                break
+    return sum(_value(p) for p in lineup.values()), lineup
+
+
+def position_floors(lineup, starting):
+    """Weakest starter each position could displace; 0 for an open slot."""
+    floors = {}
+    for k, (_, eligible) in enumerate(starting):
+        v = _value(lineup[k]) if k in lineup else 0.0
+        for pos in eligible:
+            floors[pos] = min(floors.get(pos, v), v)
+    return floors
+
+
+def marginal_gains(roster, free_agents, starting, roster_size):
+    """Lineup gain of adding each free agent, after pruning by position need.
+
+    A free agent who cannot beat the weakest starter at any slot he fits adds
+    nothing to the lineup, so only the best ``PER_POSITION`` survivors per
+    position get a full lineup re-optimization.  Each candidate lists the
+    players it could release, weakest first (``None`` while the roster has
+    room); ``plan_claims`` assigns the drops across claims.
+    """
+    base, lineup = best_lineup(roster, starting)
+    floors = position_floors(lineup, starting)
+    by_pos = {}
+    for fa in free_agents:
+        v = _value(fa)
+        for pos in _positions(fa):
+            if v > floors.get(pos, float("inf")):
+                by_pos.setdefault(pos, []).append(fa)
+                break
+    candidates = []
+    for pos, fas in by_pos.items():
+        fas.sort(key=_value, reverse=True)
+        for fa in fas[:PER_POSITION]:
+            total, new_lineup = best_lineup(roster + [fa], starting)
+            if total <= base:
+                continue
+            starters = {p["id"] for p in new_lineup.values()}
+            bench = sorted((p for p in roster if p["id"] not in starters), key=_value)
+            drops = ([None] if len(roster) < roster_size else []) + bench
+            if not drops:
+                continue
+            candidates.append(
+                {
+                    "player": fa,
+                    "position": pos,
+                    "gain": total - base,
+                    "drop": drops[0],
+                    "drops": drops,
+                }
+            )
+    pruned = len(free_agents) - sum(len(v) for v in by_pos.values())
+    return candidates, base, lineup, pruned
+
+
+# ------------------ competing claims ------------------
+def bid_history(transactions, my_team_key=None):
+    """Winning FAAB bids and the number of active rivals, from league adds."""
+    bids, rivals = [], set()
+    for t in yahoo_parse.transactions(transactions) if transactions else ():
+        if t.status != "successful" or t.type not in ("add", "add/drop"):
+            continue
+        for m in t.moves:
+            if m.type == "add" and m.destination != my_team_key:
+                rivals.add(m.destination)
+                if t.faab_bid:
+                    bids.append(t.faab_bid)
+    return np.sort(np.asarray(bids, dtype=np.float64)), len(rivals)
+
+
+def competing_price(quantile, bids, budget):
+    """Expected winning rival bid for a free agent at this value quantile.
+
+    The week's best free agent is priced like the league's top historical
+    winning bids, and lesser ones like correspondingly lower bids.
+    """
+    if len(bids) >= 3:
+        return float(np.quantile(bids, quantile))
+    return DEFAULT_TOP_PRICE * budget * quantile**2
+
+
+def win_probability(bid, price, spread):
+    return float(1.0 / (1.0 + np.exp(-(bid - price) / spread)))
+
+
+# ------------------ claim plan ------------------
+def dollar_cost(gains, budget, weeks_left):
+    """Lineup points a FAAB dollar is worth if kept for later weeks.
+
+    Each remaining week is assumed to offer a claim worth
+    ``FUTURE_CLAIM_SHARE`` of this week's best, bought with the budget
+    spread evenly; in the last week unspent dollars are worth nothing.
+    """
+    if budget <= 0 or weeks_left <= 0 or not len(gains):
+        return 0.0
+    return FUTURE_CLAIM_SHARE * float(np.max(gains)) * weeks_left / budget
+
+
+def _release(candidate, released, opened, open_slots):
+    """A claim's drop: an open spot, else its weakest unreleased player.
+
+    False when it has none left.  A released player never starts in the
+    claim's lineup, so every choice gives the same gain and the weakest is
+    the one to let go.
+    """
+    for drop in candidate.get("drops") or [candidate.get("drop")]:
+        if drop is None:
+            if open_slots is None or opened < open_slots:
+                return None
+        elif drop["id"] not in released:
+            return drop
+    return False
+
+
+def plan_claims(
+    candidates,
+    budget,
+    max_claims,
+    faab,
+    bids=(),
+    rivals_ahead=0,
+    activity=1.0,
+    weeks_left=DEFAULT_WEEKS_LEFT,
+    open_slots=None,
+):
+    """Pick claims, bids and drops that maximize expected net lineup gain.
+
+    A multiple-choice knapsack over FAAB dollars: one claim per position
+    (two claims at one slot mostly double-count the same gain), each with a
+    bid on a ``BID_STEPS`` grid, at most ``max_claims`` claims in total.  A
+    won bid costs its dollars at ``dollar_cost``, so the plan only outbids
+    the expected price where the gain pays for it.  Rolling-priority leagues
+    bid nothing and succeed when no rival ahead in the order claims the
+    player first; ``activity`` is the share of rivals who actually work the
+    wire.
+
+    Drops are assigned jointly: a claim fills one of ``open_slots`` open
+    roster spots (unlimited when ``None``) or releases the weakest of its
+    ``drops`` that no other chosen claim releases.  Each returned claim
+    carries the ``drop`` it was assigned.
+    """
+    if not candidates or max_claims <= 0:
+        return []
+    gains = np.array([c["gain"] for c in candidates])
+    cost = dollar_cost(gains, budget, weeks_left) if faab else 0.0
+    quantiles = np.argsort(np.argsort(gains)) / max(len(gains) - 1, 1)
+    step = max(1, int(budget) // BID_STEPS) if faab else 1
+    levels = int(budget) // step if faab else 0
+    spread = max(1.0, float(np.std(bids)) / 2 if len(bids) >= 3 else budget * 0.05)
+
+    groups = {}
+    for c, q in zip(candidates, quantiles.tolist()):
+        options = []
+        if faab:
+            price = competing_price(q, bids, budget)
+            for lvl in range(levels + 1):
+                p = win_probability(lvl * step, price, spread)
+                options.append((lvl, lvl * step, p))
+        else:
+            interest = DEFAULT_INTEREST * activity * q
+            options.append((0, 0, (1.0 - interest) ** rivals_ahead))
+        groups.setdefault(c["position"], []).append((c, options))
+
+    # best[k][(b, released, opened)]: (expected net gain, chosen claims) using
+    # k claims, b units, the ids of players already released and the number
+    # of open spots filled.
+    best = [{} for _ in range(max_claims + 1)]
+    best[0][(0, frozenset(), 0)] = (0.0, ())
+    for members in groups.values():
+        nxt = [dict(row) for row in best]
+        for k in range(max_claims):
+            for (b, released, opened), (value, chosen) in best[k].items():
+                for c, options in members:
+                    drop = _release(c, released, opened, open_slots)
+                    if drop is False:
+                        continue
+                    if drop is None:
+                        state = (released, opened + 1)
+                    else:
+                        state = (released | {drop["id"]}, opened)
+                    claim = {**c, "drop": drop}
+                    for lvl, bid, p in options:
+                        if b + lvl > levels:
+                            break
+                        cand = value + (c["gain"] - cost * bid) * p
+                        key = (b + lvl,) + state
+                        if cand > nxt[k + 1].get(key, (-np.inf,))[0]:
+                            nxt[k + 1][key] = (cand, chosen + ((claim, bid, p),))
+        best = nxt
+    _, chosen = max((cell for row in best for cell in row.values()), key=lambda x: x[0])
+    return sorted(
+        (x for x in chosen if x[0]["gain"] > cost * x[1]),
+        key=lambda x: -x[0]["gain"] * x[2],
+    )
+
+
+@metrics.timed("waiver")
+def run_waiver_logic(
+    roster, odds, weather, free_agents=None, transactions=None, budget=None
+):
+    fa = free_agents if free_agents else utils_core.fetch_free_agents()
+    me = yahoo_parse.team(roster) if isinstance(roster, dict) else None
+    slots, num_teams, faab = league()
+    starting = starting_slots(slots)
+    roster_size = sum(n for s, n in slots.items() if s != "IR")
+    if budget is None:
+        budget = me.faab_balance if me and me.faab_balance else DEFAULT_BUDGET
+
+    proj = projections.current(odds, weather)
+    roster = proj.annotate(yahoo_parse.player_dicts(roster))
+    owned = {p["id"] for p in roster}
+    fa = proj.annotate(p for p in yahoo_parse.player_dicts(fa) if p["id"] not in owned)
+    candidates, base, lineup, pruned = marginal_gains(roster, fa, starting, roster_size)
+
+    if isinstance(transactions, dict) and "error" in transactions:
+        transactions = None
+    bids, rivals = bid_history(transactions, me.key if me else None)
+    # Unknown priority: assume mid-order.  Without history, every rival is
+    # assumed active.
+    if me and me.waiver_priority:
+        ahead = me.waiver_priority - 1
+    else:
+        ahead = (num_teams - 1) // 2
+    activity = rivals / (num_teams - 1) if transactions and num_teams > 1 else 1.0
+    max_claims = roster_size - len(lineup)
+    weeks_left = max(0, _league_settings()["end_week"] - proj.current_week)
+    plan = plan_claims(
+        candidates,
+        budget,
+        max_claims,
+        faab,
+        bids,
+        ahead,
+        min(activity, 1.0),
+        weeks_left,
+        max(0, roster_size - len(roster)),
+    )
+
+    # Last day's headlines for every add and drop, from the shared news index.
+    names = [
+        x["name"]
+        for c, _, _ in plan
+        for x in (c["player"], c["drop"])
+        if x and x.get("name")
+    ]
+    headlines = news.for_players(names, NEWS_HOURS)
     recs = []
-    if odds and "data" in odds:
-        recs.append({"player": "FA_BoomWR", "score": random.uniform(0.6, 0.9)})
-    if weather and weather.get("wind") and weather["wind"] > 20:
-        recs.append({"player": "FA_RB_Grinder", "score": random.uniform(0.5, 0.7)})
+    for priority, (c, bid, p) in enumerate(plan, 1):
+        player, drop = c["player"], c["drop"]
+        recs.append(
+            {
+                "priority": priority,
+                "player": player["name"] if player.get("name") else player["id"],
+                "position": c["position"],
+                "add": player["id"],
+                "drop": drop["id"] if drop else None,
+                "bid": bid if faab else None,
+                "gain": round(c["gain"], 2),
+                "win_prob": round(p, 3),
+                "score": round(c["gain"] * p, 2),
+                "news": [
+                    n["title"]
+                    for x in (player, drop)
+                    if x
+                    for n in headlines.get(x.get("name"), ())[:NEWS_PER_PLAYER]
+                ],
+            }
+        )
     if not recs:
-        recs.append({"player": "Hold", "score": 0.5})
+        recs.append({"player": "Hold", "score": 0.0})
     return {
         "role": "waiver",
+        "mode": "faab" if faab else "rolling",
+        "budget": budget if faab else None,
+        "lineup_points": round(base, 2),
+        "evaluated": len(candidates),
+        "pruned": pruned,
         "waiver_recs": recs,
-        "rationale": "Rune scoring system rates FA pickups and decoy claims",
+        "rationale": f"{len(candidates)} of {len(fa)} free agents improve the "
+        f"lineup; claims ranked by expected gain",
     }
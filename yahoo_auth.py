@@ -0,0 +1,123 @@
+"""In-process Yahoo OAuth token provider shared by every upstream call.
+
+The token is read from ``YAHOO_TOKEN_FILE`` once and kept in memory; the file
+is only re-read when its mtime changes (another worker refreshed it).  Shortly
+before ``expires_in`` runs out the token is refreshed under an exclusive
+``flock`` on ``<token file>.lock``, so across gunicorn workers only one
+refresh hits Yahoo and the rest pick up the new file.
+"""
+
+import os, json, time, fcntl, threading
+from contextlib import contextmanager
+
+import metrics, refresh_yahoo_token
+
+REFRESH_MARGIN = float(os.getenv("YAHOO_REFRESH_MARGIN_SECS", "300"))
+RETRY_AFTER = 60.0  # back-off after a failed refresh
+DEFAULT_LIFETIME = 3600.0
+
+
+class TokenProvider:
+    def __init__(self, token_file):
+        self.token_file = token_file
+        self.lock_file = f"{token_file}.lock"
+        self._lock = threading.Lock()
+        self._data = None
+        self._mtime = None
+        self._retry_at = 0.0
+
+    # ---------- file state ----------
+    def _read(self):
+        """Reload the token file if it changed since we last read it."""
+        try:
+            st = os.stat(self.token_file)
+        except OSError:
+            self._data, self._mtime = None, None
+            return
+        if st.st_mtime_ns == self._mtime:
+            return
+        try:
+            with open(self.token_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if "expires_at" not in data:
+            lifetime = float(data.get("expires_in") or DEFAULT_LIFETIME)
+            data["expires_at"] = st.st_mtime + lifetime
+        self._data, self._mtime = data, st.st_mtime_ns
+
+    def _fresh(self):
+        return (
+            self._data is not None
+            and self._data.get("access_token")
+            and time.time() < self._data["expires_at"] - REFRESH_MARGIN
+        )
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.lock_file, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---------- public ----------
+    def token(self):
+        """Current access token, refreshing it first when it is about to expire."""
+        with self._lock:
+            if self._fresh():
+                return self._data["access_token"]
+            self._read()
+            if not self._fresh() and time.time() >= self._retry_at:
+                stale = self._data.get("access_token") if self._data else None
+                self._refresh_locked(stale)
+            return self._data.get("access_token") if self._data else None
+
+    def invalidate(self, stale):
+        """Called after a 401: refresh unless another worker already has."""
+        with self._lock:
+            self._read()
+            if self._data is None or self._data.get("access_token") == stale:
+                self._refresh_locked(stale)
+            return self._data.get("access_token") if self._data else None
+
+    def refresh(self):
+        with self._lock:
+            self._read()
+            stale = self._data.get("access_token") if self._data else None
+            return self._refresh_locked(stale, force=True)
+
+    def _refresh_locked(self, stale, force=False):
+        with self._file_lock():
+            # Another worker may have refreshed while we waited for the lock.
+            self._read()
+            current = self._data.get("access_token") if self._data else None
+            if not force and current and current != stale and self._fresh():
+                return {"status": "ok", "refreshed_by": "peer"}
+            result = refresh_yahoo_token.refresh(
+                self.token_file,
+                refresh_token=(self._data or {}).get("refresh_token"),
+            )
+            metrics.inc(
+                "yahoo_token_refresh_total",
+                result="error" if "error" in result else "ok",
+            )
+            if "error" in result:
+                # Keep serving the old token; Yahoo may still accept it.
+                self._retry_at = time.time() + RETRY_AFTER
+                return result
+            self._mtime = None
+            self._read()
+            return {"status": "ok", "saved_to": result["saved_to"]}
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def provider(token_file):
+    with _providers_lock:
+        if token_file not in _providers:
+            _providers[token_file] = TokenProvider(token_file)
+        return _providers[token_file]
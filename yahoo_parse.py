@@ -0,0 +1,419 @@
+"""Single-pass parser for Yahoo ``fantasy_content`` responses.
+
+Yahoo nests every resource as lists of single-key dicts
+(``"team": [[{"team_key": ...}, {"team_id": ...}, [], ...], {"roster": ...}]``)
+and every collection as ``{"0": {...}, "1": {...}, "count": n}``.  The helpers
+here flatten those into compact, frozen slotted records, drop logo/URL noise,
+and cache the parsed result by a hash of the payload's content so each
+response is parsed once no matter how many roles read it.
+"""
+
+import json, hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+
+NOISE_KEYS = {
+    "url",
+    "team_logos",
+    "image_url",
+    "headshot",
+    "logo_url",
+    "editorial_player_key",
+    "editorial_team_key",
+    "editorial_team_url",
+    "uniform_number",
+    "is_undroppable",
+    "has_player_notes",
+    "player_notes_last_timestamp",
+    "guid",
+}
+CACHE_SIZE = 64
+
+
+@dataclass(frozen=True, slots=True)
+class Player:
+    key: str
+    id: str
+    name: str
+    team: str = ""
+    position: str = ""
+    eligible: tuple = ()
+    status: str = ""
+    bye: int = 0
+    selected_position: str = ""
+    points: float = 0.0
+    projection: float = 0.0
+    owner_team_key: str = ""
+
+    def as_dict(self):
+        return asdict(self)
+
+
+@dataclass(frozen=True, slots=True)
+class Team:
+    key: str
+    id: str
+    name: str
+    manager: str = ""
+    waiver_priority: int = 0
+    faab_balance: float = 0.0
+    moves: int = 0
+    trades: int = 0
+    points: float = 0.0
+    projected_points: float = 0.0
+    win_probability: float = 0.0
+    rank: int = 0
+    wins: int = 0
+    losses: int = 0
+    ties: int = 0
+    points_for: float = 0.0
+    points_against: float = 0.0
+    players: tuple = ()
+
+
+@dataclass(frozen=True, slots=True)
+class Matchup:
+    week: int
+    status: str
+    is_playoffs: bool
+    teams: tuple = ()
+
+
+@dataclass(frozen=True, slots=True)
+class Move:
+    player_key: str
+    name: str
+    position: str
+    type: str
+    source: str
+    destination: str
+
+
+@dataclass(frozen=True, slots=True)
+class Transaction:
+    key: str
+    type: str
+    status: str
+    timestamp: int
+    moves: tuple = ()
+    faab_bid: int = 0
+
+
+# ------------------ flattening ------------------
+def _merge(parts, out=None):
+    """Merge Yahoo's list of single-key dicts into one dict, skipping noise."""
+    out = {} if out is None else out
+    for part in parts:
+        if isinstance(part, list):
+            _merge(part, out)
+        elif isinstance(part, dict):
+            for k, v in part.items():
+                if k not in NOISE_KEYS:
+                    out[k] = v
+    return out
+
+
+def _items(collection, name):
+    """Yield ``collection[i][name]`` for Yahoo's ``{"0": ..., "count": n}``."""
+    if isinstance(collection, list):
+        collection = _merge(collection)
+    if not isinstance(collection, dict):
+        return
+    for k, v in collection.items():
+        if k.isdigit() and isinstance(v, dict) and name in v:
+            yield v[name]
+
+
+def _num(value, cast=float):
+    try:
+        return cast(value) if value not in (None, "") else cast()
+    except (TypeError, ValueError):
+        return cast()
+
+
+def _total(node):
+    return _num(node.get("total")) if isinstance(node, dict) else 0.0
+
+
+def parse_player(node):
+    d = _merge(node)
+    name = d.get("name")
+    bye = d.get("bye_weeks") or {}
+    selected = d.get("selected_position")
+    if isinstance(selected, list):
+        selected = _merge(selected).get("position", "")
+    ownership = d.get("ownership") or {}
+    return Player(
+        key=d.get("player_key", ""),
+        id=str(d.get("player_id", "")),
+        name=name.get("full", "") if isinstance(name, dict) else (name or ""),
+        team=(d.get("editorial_team_abbr") or "").upper(),
+        position=d.get("display_position") or d.get("primary_position") or "",
+        eligible=tuple(
+            e.get("position", "") for e in d.get("eligible_positions") or []
+        ),
+        status=d.get("status") or "",
+        bye=_num(bye.get("week"), int),
+        selected_position=selected or "",
+        points=_total(d.get("player_points")),
+        projection=_total(d.get("player_projected_points")),
+        owner_team_key=ownership.get("owner_team_key", ""),
+    )
+
+
+def _players(node):
+    return tuple(parse_player(p) for p in _items(node, "player"))
+
+
+def parse_team(node):
+    d = _merge(node)
+    managers = d.get("managers") or []
+    manager = managers[0].get("manager", {}) if managers else {}
+    standings = d.get("team_standings") or {}
+    totals = standings.get("outcome_totals") or {}
+    roster = d.get("roster") or {}
+    players = _players(roster.get("0", {}).get("players", {})) if roster else ()
+    if not players and "players" in d:
+        players = _players(d["players"])
+    return Team(
+        key=d.get("team_key", ""),
+        id=str(d.get("team_id", "")),
+        name=d.get("name", ""),
+        manager=manager.get("nickname", ""),
+        waiver_priority=_num(d.get("waiver_priority"), int),
+        faab_balance=_num(d.get("faab_balance")),
+        moves=_num(d.get("number_of_moves"), int),
+        trades=_num(d.get("number_of_trades"), int),
+        points=_total(d.get("team_points")),
+        projected_points=_total(d.get("team_projected_points")),
+        win_probability=_num(d.get("win_probability")),
+        rank=_num(standings.get("rank"), int),
+        wins=_num(totals.get("wins"), int),
+        losses=_num(totals.get("losses"), int),
+        ties=_num(totals.get("ties"), int),
+        points_for=_num(standings.get("points_for")),
+        points_against=_num(standings.get("points_against")),
+        players=players,
+    )
+
+
+def parse_matchup(node):
+    teams = node.get("0", {}).get("teams", {})
+    return Matchup(
+        week=_num(node.get("week"), int),
+        status=node.get("status", ""),
+        is_playoffs=str(node.get("is_playoffs", "0")) == "1",
+        teams=tuple(parse_team(t) for t in _items(teams, "team")),
+    )
+
+
+def parse_transaction(node):
+    d = _merge(node)
+    moves = []
+    for p in _items(d.get("players", {}), "player"):
+        player = parse_player(p[0] if isinstance(p[0], list) else p)
+        data = _merge(p[1:]).get("transaction_data", {})
+        for td in data if isinstance(data, list) else [data]:
+            moves.append(
+                Move(
+                    player_key=player.key,
+                    name=player.name,
+                    position=player.position,
+                    type=td.get("type", ""),
+                    source=td.get("source_team_key") or td.get("source_type", ""),
+                    destination=td.get("destination_team_key")
+                    or td.get("destination_type", ""),
+                )
+            )
+    return Transaction(
+        key=d.get("transaction_key", ""),
+        type=d.get("type", ""),
+        status=d.get("status", ""),
+        timestamp=_num(d.get("timestamp"), int),
+        moves=tuple(moves),
+        faab_bid=_num(d.get("faab_bid"), int),
+    )
+
+
+# ------------------ cached entry points ------------------
+_cache = OrderedDict()
+
+
+def _digest(payload):
+    if isinstance(payload, (bytes, str)):
+        raw = payload.encode("utf-8") if isinstance(payload, str) else payload
+    else:
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _content(payload):
+    if isinstance(payload, (bytes, str)):
+        payload = json.loads(payload)
+    if not isinstance(payload, dict):
+        return {}
+    return payload.get("fantasy_content", {})
+
+
+def _cached(kind, payload, fn):
+    if not payload or (isinstance(payload, dict) and "error" in payload):
+        return ()
+    key = (kind, _digest(payload))
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    result = fn(_content(payload))
+    _cache[key] = result
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
+
+
+def _resource(content, name):
+    """Yahoo wraps a single resource as ``[meta, {sub-resource}, ...]``."""
+    node = content.get(name)
+    return node if isinstance(node, list) else []
+
+
+def team(payload):
+    """The team resource (``/team/{key}/...``), including its roster."""
+    return _cached(
+        "team",
+        payload,
+        lambda c: parse_team(_resource(c, "team")) if c.get("team") else None,
+    )
+
+
+def roster(payload):
+    """Players of a ``/team/{key}/roster`` or ``/league/{key}/players`` response."""
+
+    def parse(c):
+        if c.get("team"):
+            return parse_team(_resource(c, "team")).players
+        return _players(_merge(_resource(c, "league")).get("players", {}))
+
+    return _cached("roster", payload, parse)
+
+
+players = roster
+
+
+def matchups(payload):
+    """Matchups of a ``/team/{key}/matchups`` or league scoreboard response."""
+
+    def parse(c):
+        if c.get("team"):
+            node = _merge(_resource(c, "team")).get("matchups", {})
+        else:
+            node = _merge(_resource(c, "league")).get("scoreboard", {})
+            node = node.get("0", {}).get("matchups", {})
+        return tuple(parse_matchup(m) for m in _items(node, "matchup"))
+
+    return _cached("matchups", payload, parse)
+
+
+def standings(payload):
+    def parse(c):
+        node = _merge(_resource(c, "league")).get("standings", [])
+        return tuple(
+            parse_team(t) for t in _items(_merge(node).get("teams", {}), "team")
+        )
+
+    return _cached("standings", payload, parse)
+
+
+def teams(payload):
+    def parse(c):
+        node = _merge(_resource(c, "league")).get("teams", {})
+        return tuple(parse_team(t) for t in _items(node, "team"))
+
+    return _cached("teams", payload, parse)
+
+
+def transactions(payload):
+    def parse(c):
+        node = _merge(_resource(c, "league")).get("transactions", {})
+        return tuple(parse_transaction(t) for t in _items(node, "transaction"))
+
+    return _cached("transactions", payload, parse)
+
+
+# ------------------ legacy shapes ------------------
+def player_id(p):
+    """Roster id roles key players by: primary position and Yahoo id."""
+    return f"{p.position.split(',')[0] or 'FLEX'}_{p.id}"
+
+
+def player_dicts(payload):
+    """Players as the flat ``{"id", "projection", ...}`` dicts roles expect.
+
+    Lists are passed through, so callers can hand in either a raw Yahoo
+    response or an already-flat roster.
+    """
+    if isinstance(payload, list):
+        return payload
+    return [
+        {
+            "id": player_id(p),
+            "key": p.key,
+            "name": p.name,
+            "position": p.position,
+            "team": p.team,
+            "status": p.status,
+            "bye": p.bye,
+            "projection": p.projection,
+        }
+        for p in roster(payload)
+    ]
+
+
+def opponent_rosters(payload, my_team_key=None, first=None):
+    """``[{"team", "key", "roster"}]`` for every other team in the league.
+
+    ``payload`` is a league ``teams/roster`` response (or a matchups
+    response, which names the teams but carries no rosters).  ``first``
+    moves that team, usually this week's opponent, to the front.
+    """
+    if isinstance(payload, list):
+        return payload
+    if my_team_key is None:
+        me = team(payload)
+        my_team_key = me.key if me else None
+    if _content(payload).get("league"):
+        league = teams(payload)
+    else:
+        league = [t for m in matchups(payload) for t in m.teams]
+    seen, out = set(), []
+    for t in league:
+        if t.key == my_team_key or t.key in seen:
+            continue
+        seen.add(t.key)
+        out.append(
+            {
+                "team": t.name,
+                "key": t.key,
+                "manager": t.manager,
+                "roster": [
+                    {
+                        "id": player_id(p),
+                        "name": p.name,
+                        "position": p.position,
+                        "team": p.team,
+                        "status": p.status,
+                        "projection": p.projection,
+                    }
+                    for p in t.players
+                ],
+            }
+        )
+    out.sort(key=lambda o: o["key"] != first)
+    return out
+
+
+def matchup_opponent(payload, my_team_key):
+    """Team key of ``my_team_key``'s opponent in a matchups response."""
+    for m in matchups(payload):
+        keys = [t.key for t in m.teams]
+        if my_team_key in keys:
+            return next((k for k in keys if k != my_team_key), None)
+    return None